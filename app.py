@@ -1,9 +1,26 @@
+import atexit
+import os
+import time
+import uuid
 import streamlit as st
 import pandas as pd
-import numpy as np
-import joblib
 from datetime import datetime
 
+from novapay.audit import AuditWriter
+from novapay.corridor import CORRIDOR_PATH, CorridorIndex
+from novapay.drift import shared_monitor
+from novapay.entity_graph import GRAPH_PATH, EntityGraph
+from novapay.explain_jobs import ExplanationPool, PoolFull
+from novapay.feature_store import STORE_PATH, FeatureStore
+from novapay.features import compute_derived_features, derive_time_features
+from novapay.fraud_aggregates import AGGREGATES_PATH, FraudAggregates
+from novapay.registry import MODEL_DIR, SEGMENTS_DIR, ModelRegistry, SegmentedRegistry
+from novapay.rules import RULES_VERSION, RuleEngine
+from novapay.scoring import score_transactions
+from novapay.shadow import CHALLENGER_DIR, ShadowScorer, load_challengers
+from novapay.shap_aggregates import save_periodically, shared_aggregator
+from novapay.similar_cases import INDEX_PATH as SIMILAR_CASES_PATH, SimilarCaseIndex
+
 # Lazy import for SHAP to avoid import errors at startup
 try:
     import shap
@@ -942,40 +959,112 @@ st.markdown("""
 """, unsafe_allow_html=True)
 
 @st.cache_resource
-def load_model():
-    """Load the trained model pipeline"""
+def load_model_registry():
+    """Start the model registry that hot-reloads new model versions"""
     try:
-        model = joblib.load("Model/rf_fraud_pipeline.pkl")
-        return model
+        return ModelRegistry(MODEL_DIR).start()
     except Exception as e:
-        st.error(f"Error loading model: {str(e)}")
+        st.error(f"Error starting model registry: {str(e)}")
         return None
 
-@st.cache_data
-def load_feature_names():
-    """Load the feature names used by the model"""
+@st.cache_resource
+def load_feature_store():
+    """Open the customer/device feature store if it has been built"""
+    if not os.path.exists(STORE_PATH):
+        return None
     try:
-        feature_df = pd.read_csv("Data/rf_shap_feature_names.csv")
-        return feature_df["feature_name"].values
+        return FeatureStore(STORE_PATH)
     except Exception as e:
-        st.error(f"Error loading feature names: {str(e)}")
+        st.warning(f"Feature store not available: {str(e)}")
         return None
 
 @st.cache_resource
-def create_shap_explainer(_model):
-    """Create SHAP explainer for the model"""
-    if not SHAP_AVAILABLE:
+def load_shadow_scorer():
+    """Start shadow scoring if challenger models are present in Model/challengers"""
+    challengers = load_challengers(CHALLENGER_DIR)
+    if not challengers:
         return None
     try:
-        # Get the preprocessor and model from pipeline
-        preprocessor = _model.named_steps["preprocess"]
-        rf_model = _model.named_steps["model"]
-        
-        # Create explainer
-        explainer = shap.TreeExplainer(rf_model)
-        return explainer
+        return ShadowScorer(challengers)
+    except Exception as e:
+        st.warning(f"Shadow scoring not available: {str(e)}")
+        return None
+
+@st.cache_resource
+def load_audit_writer():
+    """Start the background writer for the decision audit log"""
+    try:
+        writer = AuditWriter()
+        atexit.register(writer.close)
+        return writer
+    except Exception as e:
+        st.warning(f"Audit log not available: {str(e)}")
+        return None
+
+@st.cache_resource
+def load_similar_cases():
+    """Load the nearest-neighbour index of past fraud cases if it has been built"""
+    if not os.path.exists(SIMILAR_CASES_PATH):
+        return None
+    try:
+        return SimilarCaseIndex.load(SIMILAR_CASES_PATH)
+    except Exception as e:
+        st.warning(f"Similar cases not available: {str(e)}")
+        return None
+
+@st.cache_resource
+def load_entity_graph():
+    """Load the customer/device/IP link graph if it has been built"""
+    if not os.path.exists(GRAPH_PATH):
+        return None
+    try:
+        return EntityGraph.load(GRAPH_PATH)
+    except Exception as e:
+        st.warning(f"Entity graph not available: {str(e)}")
+        return None
+
+@st.cache_resource
+def load_corridor_index():
+    """Load the corridor-risk index per currency pair if it has been built"""
+    if not os.path.exists(CORRIDOR_PATH):
+        return None
+    try:
+        return CorridorIndex.load(CORRIDOR_PATH)
+    except Exception as e:
+        st.warning(f"Corridor index not available: {str(e)}")
+        return None
+
+@st.cache_resource
+def open_fraud_aggregates():
+    """Open the fraud-rate aggregate table"""
+    try:
+        return FraudAggregates(AGGREGATES_PATH)
+    except Exception as e:
+        st.warning(f"Fraud aggregates not available: {str(e)}")
+        return None
+
+def load_fraud_aggregates():
+    """Fraud-rate aggregate table once it has been built (checked per run, so a build from the analytics page is picked up)"""
+    if not os.path.exists(AGGREGATES_PATH):
+        return None
+    return open_fraud_aggregates()
+
+@st.cache_resource
+def load_segment_registry():
+    """Route transactions to per-segment models when any are installed"""
+    registry = load_model_registry()
+    if registry is None or not os.path.isdir(SEGMENTS_DIR):
+        return None
+    return SegmentedRegistry(registry, SEGMENTS_DIR)
+
+@st.cache_data
+def load_feature_names():
+    """Load the feature names used by the model"""
+    try:
+        feature_df = pd.read_csv("Data/rf_shap_feature_names.csv")
+        return feature_df["feature_name"].values
     except Exception as e:
-        st.error(f"Error creating SHAP explainer: {str(e)}")
+        st.error(f"Error loading feature names: {str(e)}")
         return None
 
 def clean_feature_name(raw_name):
@@ -1022,43 +1111,31 @@ FEATURE_EXPLANATIONS = {
     "amount src": "Transaction amount in source currency",
 }
 
-def shap_top_reasons_for_ui(model, explainer, X_row, feature_names, top_k=8):
-    """Returns top SHAP reasons for fraud prediction (class 1)"""
-    if not SHAP_AVAILABLE or explainer is None:
-        return None
-    try:
-        # Transform input row exactly as the model sees it
-        X_row_trans = model.named_steps["preprocess"].transform(X_row)
-        
-        # Get SHAP values
-        exp = explainer(X_row_trans)
-        
-        # Extract SHAP values for fraud class (class index = 1)
-        shap_vals = exp.values[0, :, 1]
-        base_val = exp.base_values[0, 1]
-        
-        # Model predicted probability
-        proba = model.predict_proba(X_row)[0, 1]
-        
-        # Top contributing features
-        idx = np.argsort(np.abs(shap_vals))[::-1][:top_k]
-        
-        reasons = [
-            {
-                "feature": feature_names[j],
-                "shap_value": float(shap_vals[j])
-            }
-            for j in idx
-        ]
-        
-        return {
-            "fraud_probability": float(proba),
-            "base_value": float(base_val),
-            "top_reasons": reasons
-        }
-    except Exception as e:
-        st.error(f"Error computing SHAP values: {str(e)}")
-        return None
+@st.cache_resource
+def load_explanation_pool():
+    """Background workers that compute SHAP explanations off the decision path"""
+    return ExplanationPool(max_workers=2, max_queue=32)
+
+def top_risk_reasons(ui_payload, top_k=3):
+    """Raw (feature, SHAP value) pairs of the strongest risk-increasing factors"""
+    return [(r["feature"], r["shap_value"]) for r in ui_payload["top_reasons"] if r["shap_value"] > 0][:top_k]
+
+def render_risk_factors(ui_payload):
+    """Show the Top 3 risk-increasing factors of a SHAP payload"""
+    human_readable = shap_reasons_to_text(ui_payload)
+    
+    # Get only risk-increasing factors and take top 3
+    risk_factors = [e for e in human_readable if e["impact_type"] == "risk"][:3]
+    
+    if risk_factors:
+        st.markdown("### ⚠️ Fraud risk factor")
+        for i, factor in enumerate(risk_factors, 1):
+            st.markdown(f"""
+                <div class="explanation-box">
+                    <strong>{i}. {factor['feature']}</strong><br>
+                    {factor['message']}
+                </div>
+            """, unsafe_allow_html=True)
 
 def shap_reasons_to_text(ui_payload):
     """Convert SHAP reasons into readable text"""
@@ -1097,49 +1174,6 @@ def shap_reasons_to_text(ui_payload):
     
     return explanations
 
-def compute_derived_features(input_data):
-    """Compute derived features from input data"""
-    df = input_data.copy()
-    
-    # Velocity ratio
-    df["velocity_ratio"] = df["txn_velocity_1h"] / (df["txn_velocity_24h"] + 1)
-    
-    # Fee ratio
-    df["fee_ratio"] = df["fee"] / (df["amount_usd"] + 1e-6)  # Avoid division by zero
-    
-    # Amount velocity interaction
-    df["amount_velocity_interaction"] = df["amount_usd"] * df["velocity_ratio"]
-    
-    # Device IP risk
-    df["device_ip_risk"] = df["device_trust_score"] * df["ip_risk_score"]
-    
-    # New device velocity
-    df["new_device_velocity"] = df["new_device"] * df["txn_velocity_1h"]
-    
-    # High risk device
-    df["High risk device"] = df["new_device"].astype(int) * (1 - df["device_trust_score"])
-    
-    # Amount capped (99th percentile cap - using a reasonable default)
-    df["amount_usd_capped"] = df["amount_usd"].clip(upper=df["amount_usd"].quantile(0.99) if len(df) > 1 else df["amount_usd"].max())
-    
-    # Log transforms
-    df["log_amount_usd"] = np.log1p(df["amount_usd_capped"].clip(lower=0))
-    df["log_fee"] = np.log1p(df["fee"].clip(lower=0))
-    
-    # New device high velocity
-    df["new_device_high_velocity"] = ((df["new_device"] == 1) & (df["txn_velocity_1h"] >= 3)).astype(int)
-    
-    # Young account high amount
-    df["young_account_high_amount"] = ((df["account_age_days"] < 30) & (df["amount_usd"] > 500)).astype(int)
-    
-    # IP location risk
-    df["ip_location_risk"] = ((df["ip_risk_score"] > 0.7) & (df["location_mismatch"] == 1)).astype(int)
-    
-    # IP usage count (set to 1 as default since we don't have historical data)
-    df["ip_usage_count"] = 1
-    
-    return df
-
 def main():
     # Header without dark brown background box - compact and at absolute top
     # Main title - 3D plastic raised effect with all caps
@@ -1190,16 +1224,29 @@ def main():
     st.markdown('<hr class="header-separator" style="margin: 0.1rem 0;">', unsafe_allow_html=True)
     
     # Load model and resources
-    model = load_model()
+    # Take one model bundle for the whole request so a hot reload cannot mix versions
+    registry = load_model_registry()
+    bundle = registry.current() if registry is not None else None
     feature_names = load_feature_names()
     
-    if model is None or feature_names is None:
+    if feature_names is None:
         st.error("Failed to load model or feature names. Please check the file paths.")
         return
     
-    explainer = create_shap_explainer(model)
-    if explainer is None and SHAP_AVAILABLE:
-        st.warning("SHAP explainer not available. Explanations will be limited.")
+    if bundle is None:
+        # Keep deciding with the rules baseline until a model loads
+        st.warning("⚠️ Model unavailable. Decisions come from the rules-based fallback engine.")
+        if registry is not None and registry.last_error:
+            st.error(f"Error loading model: {registry.last_error}")
+        model = None
+        explainer = None
+        model_version = RULES_VERSION
+    else:
+        model = bundle.pipeline
+        explainer = bundle.explainer
+        model_version = bundle.version
+        if explainer is None and SHAP_AVAILABLE:
+            st.warning("SHAP explainer not available. Explanations will be limited.")
     
     # SIDEBAR: Transaction Information
     with st.sidebar:
@@ -1210,6 +1257,8 @@ def main():
         account_age_days = st.number_input("Account Age (Days)", min_value=0, value=100, step=1, key="account_age")
         kyc_tier = st.selectbox("KYC Tier", ["STANDARD", "ENHANCED", "LOW", "Not_Verified"], key="kyc_tier")
         chargeback_history_count = st.number_input("Chargeback History Count", min_value=0, value=0, step=1, key="chargeback")
+        customer_id = st.text_input("Customer ID (optional)", value="", key="customer_id", help="Fills account and device fields from history when found in the feature store")
+        device_id = st.text_input("Device ID (optional)", value="", key="device_id")
         
         st.markdown("---")
         
@@ -1238,7 +1287,8 @@ def main():
         location_mismatch = st.selectbox("Location Mismatch", [0, 1], format_func=lambda x: "Yes" if x == 1 else "No", key="location_mismatch")
         txn_velocity_1h = st.number_input("Transactions in Last 1 Hour", min_value=0, value=0, step=1, key="velocity_1h")
         txn_velocity_24h = st.number_input("Transactions in Last 24 Hours", min_value=0, value=0, step=1, key="velocity_24h")
-        transaction_hour = st.number_input("Transaction Hour", min_value=0, max_value=23, value=12, step=1, key="transaction_hour")
+        transaction_date = st.date_input("Transaction Date (UTC)", value=datetime.utcnow().date(), key="transaction_date")
+        transaction_time = st.time_input("Transaction Time (UTC)", value=datetime.utcnow().time().replace(second=0, microsecond=0), key="transaction_time")
         
         st.markdown("---")
         
@@ -1246,7 +1296,16 @@ def main():
         st.markdown("### ⚠️ Risk Indicators")
         ip_risk_score = st.slider("IP Risk Score", 0.0, 1.0, 0.3, 0.01, key="ip_risk")
         risk_score_internal = st.slider("Internal Risk Score", 0.0, 1.0, 0.3, 0.01, key="internal_risk")
-        corridor_risk = st.slider("Corridor Risk", 0.0, 1.0, 0.0, 0.01, key="corridor_risk")
+        # Corridor risk comes from the currency pair; the slider is only the fallback without an index
+        corridor_index = load_corridor_index()
+        if corridor_index is None:
+            corridor_risk = st.slider("Corridor Risk", 0.0, 1.0, 0.0, 0.01, key="corridor_risk")
+        else:
+            corridor = corridor_index.lookup(f"{source_currency}_{dest_currency}")
+            corridor_risk = corridor_index.risk(f"{source_currency}_{dest_currency}")
+            st.metric("Corridor Risk", f"{corridor_risk:.2f}",
+                      help=f"Smoothed corridor fraud rate {corridor['fraud_rate']:.1%} "
+                           f"over {corridor['transactions']:,} labelled transactions")
         device_trust_score = st.slider("Device Trust Score", 0.0, 1.0, 0.7, 0.01, key="device_trust")
         
         st.markdown("---")
@@ -1254,19 +1313,13 @@ def main():
         # Predict button
         predict_button = st.button("🔍 Analyze Transaction", type="primary", use_container_width=True)
     
-    # Set default values for removed time features (always set these)
-    day_of_week = 0
-    is_weekend = 0
-    is_night = 0
-    # Map transaction hour (0-23) to time_of_day categories
-    if 6 <= transaction_hour < 12:
-        time_of_day = "morning"
-    elif 12 <= transaction_hour < 18:
-        time_of_day = "afternoon"
-    elif 18 <= transaction_hour < 22:
-        time_of_day = "evening"
-    else:
-        time_of_day = "late_night"
+    # Derive time features from the transaction timestamp (training-time definitions)
+    timestamp = datetime.combine(transaction_date, transaction_time)
+    time_features = derive_time_features(timestamp)
+    day_of_week = time_features["day_of_week"][0]
+    is_weekend = time_features["is_weekend"][0]
+    is_night = time_features["is_night"][0]
+    time_of_day = time_features["time_of_day"][0]
     
     # MAIN AREA: Prediction Results
     st.markdown('<h2 style="font-size: 1.5rem; margin-bottom: 1rem;">📊 Prediction Results</h2>', unsafe_allow_html=True)
@@ -1308,17 +1361,37 @@ def main():
             "currency_pair": [currency_pair]
         })
         
+        # Populate account and device risk fields from history when IDs are given
+        feature_store = load_feature_store()
+        if feature_store is not None and customer_id.strip() and device_id.strip():
+            input_data["customer_id"] = customer_id.strip()
+            input_data["device_id"] = device_id.strip()
+            try:
+                input_data = feature_store.enrich(input_data, as_of=timestamp)
+            except Exception as e:
+                st.warning(f"Feature store lookup failed: {str(e)}")
+        
         # Compute derived features
         input_data = compute_derived_features(input_data)
         
+        # Use the segment model for this home country / channel when one is installed, else the global bundle
+        segments = load_segment_registry() if bundle is not None else None
+        if segments is not None:
+            bundle = segments.bundle_for(input_data.iloc[0], fallback=bundle)
+            model, explainer, model_version = bundle.pipeline, bundle.explainer, bundle.version
+        
         # Make prediction
         try:
-            fraud_prob = model.predict_proba(input_data)[0, 1]
-            fraud_prediction = model.predict(input_data)[0]
+            if model is not None:
+                result = score_transactions(model, input_data).iloc[0]
+            else:
+                result = RuleEngine().score(input_data).iloc[0]
+            fraud_prob = result["fraud_probability"]
+            decision = result["decision"]
+            fraud_prediction = 1 if decision == "DECLINE" else 0
             
             # Display results in the main area - all metrics inside the container
-            risk_level = "HIGH" if fraud_prob > 0.7 else "MEDIUM" if fraud_prob > 0.3 else "LOW"
-            decision = "DECLINE" if fraud_prediction == 1 else "ALLOW"
+            risk_level = result["risk_level"]
             decision_color = "#D32F2F" if fraud_prediction == 1 else "#388E3C"
             prediction_text = "🚨 FRAUD" if fraud_prediction == 1 else "✅ LEGITIMATE"
             
@@ -1386,6 +1459,8 @@ def main():
             </div>
             ''', unsafe_allow_html=True)
             
+            st.caption(f"Model version: {model_version}")
+            
             # Alert box
             if fraud_prediction == 1:
                 st.markdown("""
@@ -1403,34 +1478,121 @@ def main():
                 """, unsafe_allow_html=True)
             
             # SHAP Explanations - Only show for fraudulent transactions, Top 3 Risk-Increasing Factors
+            # TreeSHAP runs on a background pool; the panel is filled in once the job finishes
+            explanation_handle = None
             if fraud_prediction == 1 and explainer is not None:  # Only show for fraud
                 st.markdown("## 🔍 Explanation")
                 st.markdown("The following factors contributed to this prediction:")
-                
-                # Get SHAP explanations - get more to filter for risk factors only
-                ui_payload = shap_top_reasons_for_ui(model, explainer, input_data, feature_names, top_k=10)
-                
-                if ui_payload:
-                    human_readable = shap_reasons_to_text(ui_payload)
-                    
-                    # Get only risk-increasing factors and take top 3
-                    risk_factors = [e for e in human_readable if e["impact_type"] == "risk"][:3]
-                    
-                    if risk_factors:
-                        st.markdown("### ⚠️ Fraud risk factor")
-                        for i, factor in enumerate(risk_factors, 1):
-                            st.markdown(f"""
-                                <div class="explanation-box">
-                                    <strong>{i}. {factor['feature']}</strong><br>
-                                    {factor['message']}
-                                </div>
-                            """, unsafe_allow_html=True)
+                explanation_slot = st.empty()
+                try:
+                    # Get more reasons than shown to filter for risk factors only
+                    explanation_handle = load_explanation_pool().submit(
+                        model, explainer, input_data, feature_names, top_k=10
+                    )
+                    explanation_slot.info("⏳ Computing explanation...")
+                except PoolFull:
+                    explanation_slot.warning("⚠️ Explanation service is busy. Please retry in a moment.")
+            elif fraud_prediction == 1 and model is None:
+                st.markdown("## 🔍 Explanation")
+                st.markdown("The following rules flagged this transaction:")
+                fired = [name for name in result["rules_fired"].split(", ") if name]
+                for i, description in enumerate(RuleEngine().describe(fired), 1):
+                    st.markdown(f"""
+                        <div class="explanation-box">
+                            <strong>{i}. {description}</strong>
+                        </div>
+                    """, unsafe_allow_html=True)
             elif fraud_prediction == 1 and explainer is None:
                 st.warning("⚠️ SHAP explanations are not available. Please ensure SHAP is properly installed.")
             
+            # Most similar historical fraud cases for the analyst
+            similar_cases = load_similar_cases() if fraud_prediction == 1 else None
+            if similar_cases is not None:
+                st.markdown("### 🗂️ Similar Past Cases")
+                similar = similar_cases.query(input_data, k=5)[0]
+                st.dataframe(similar, use_container_width=True, hide_index=True)
+            
+            # Accounts linked to this customer / device through shared devices and IPs
+            entity_graph = load_entity_graph() if (customer_id.strip() or device_id.strip()) else None
+            if entity_graph is not None:
+                ring = entity_graph.component(customer_id.strip() or None, device_id.strip() or None)
+                if ring["customers"] > 0 or ring["devices"] > 0:
+                    st.markdown("### 🕸️ Linked Accounts")
+                    ring_col1, ring_col2, ring_col3, ring_col4 = st.columns(4)
+                    ring_col1.metric("Customers in Group", ring["customers"])
+                    ring_col2.metric("Devices in Group", ring["devices"])
+                    ring_col3.metric("IPs in Group", ring["ips"])
+                    ring_col4.metric("Frauds in Group", ring["frauds"])
+            
             # Show input summary
             with st.expander("📋 View Transaction Summary"):
                 st.dataframe(input_data.T, use_container_width=True)
+            
+            # One ID joins the audit record and the shadow agreement log for this decision
+            transaction_id = uuid.uuid4().hex
+            
+            # Persist the decision for compliance (queued, written in the background)
+            audit_writer = load_audit_writer()
+            if audit_writer is not None:
+                audit_record = {
+                    # Decision time, not the time the explanation job or the writer gets to it
+                    "timestamp": time.time(),
+                    "transaction_id": transaction_id,
+                    "model_version": model_version,
+                    "fraud_probability": float(fraud_prob),
+                    "decision": decision,
+                    "risk_level": risk_level,
+                    "reasons": [],
+                }
+                if explanation_handle is None:
+                    audit_writer.log(audit_record)
+                else:
+                    # Logged with its SHAP reasons once the explanation job finishes
+                    def log_with_reasons(handle, writer=audit_writer, record=audit_record):
+                        if handle.status == "done":
+                            record["reasons"] = top_risk_reasons(handle.result())
+                        writer.log(record)
+                    explanation_handle.add_done_callback(log_with_reasons)
+            
+            # Running SHAP drivers by channel / corridor / decision (Risk Drivers page)
+            if explanation_handle is not None:
+                def aggregate_drivers(handle, segments={"channel": channel, "currency_pair": currency_pair,
+                                                        "decision": decision}):
+                    if handle.status == "done":
+                        aggregator = shared_aggregator(list(feature_names))
+                        aggregator.update(handle.result()["shap_values"], segments)
+                        # Kept across restarts; written at most once a minute
+                        save_periodically(aggregator)
+                explanation_handle.add_done_callback(aggregate_drivers)
+            
+            # Track live inputs against the training distribution (Drift Monitor page)
+            try:
+                shared_monitor().update(input_data)
+            except Exception as e:
+                st.warning(f"Drift monitor not updated: {str(e)}")
+            
+            # Count the transaction in the fraud-rate aggregates (Fraud Analytics page); labels arrive later
+            fraud_aggregates = load_fraud_aggregates()
+            if fraud_aggregates is not None:
+                try:
+                    fraud_aggregates.record(input_data, timestamps=timestamp)
+                except Exception as e:
+                    st.warning(f"Fraud aggregates not updated: {str(e)}")
+            
+            # Challenger models score in the background once the decision is shown
+            shadow = load_shadow_scorer() if model is not None else None
+            if shadow is not None:
+                shadow.submit(input_data, result.to_frame().T, transaction_keys=[transaction_id],
+                              model_version=model_version, preprocess=model.named_steps["preprocess"])
+            
+            # Fill in the explanation panel now that everything else is on screen
+            if explanation_handle is not None:
+                try:
+                    ui_payload = explanation_handle.result(timeout=120)
+                    with explanation_slot.container():
+                        render_risk_factors(ui_payload)
+                except Exception as e:
+                    explanation_slot.error(f"Error computing SHAP values: {str(e)}")
                 
         except Exception as e:
             st.error(f"Error making prediction: {str(e)}")
@@ -0,0 +1 @@
+"""NovaPay fraud scoring toolkit shared by the Streamlit app and offline tools"""
@@ -0,0 +1,316 @@
+"""asyncio scoring orchestrator with concurrent enrichment and deadlines.
+
+A scoring request needs several independent lookups before the forest runs:
+customer history (feature store), velocity counts and IP usage (stream state)
+and corridor risk. ``AsyncScorer.score`` starts them all at once and waits at
+most ``deadline_ms``. A lookup that is late or fails is cancelled and its
+fields fall back to defaults (``ip_usage_count = 1`` as in
+``compute_derived_features``, zero velocity, the request's own values
+otherwise); the result lists which lookups fell back.
+
+Feature derivation and the pipeline call are CPU-bound, so they run on an
+executor instead of the event loop. Requests that reach the model within
+``batch_window_ms`` of each other share one ``predict_proba`` call, which
+matters because a call has a fixed cost of tens of ms whatever its size.
+
+Benchmark (lookups given a simulated remote latency):
+    python -m novapay.async_scoring --concurrency 1 8 32 --lookup-ms 5
+"""
+import argparse
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from novapay.corridor import CorridorIndex
+from novapay.features import MODEL_COLUMNS, prepare_features
+from novapay.feature_store import STORE_PATH, FeatureStore
+from novapay.replay import StreamState, load_history
+from novapay.scoring import DECISION_THRESHOLD, MODEL_PATH, load_pipeline, score_transactions
+
+# Values used when a lookup misses its deadline; request fields take precedence
+FALLBACKS = {
+    "customer_history": {},
+    "velocity": {"txn_velocity_1h": 0, "txn_velocity_24h": 0},
+    "ip_usage": {"ip_usage_count": 1},
+    "corridor_risk": {"corridor_risk": 0.0},
+}
+
+
+# -- lookups ----------------------------------------------------------------
+
+def default_lookups(state, corridors, feature_store=None, io_executor=None):
+    """The standard enrichment lookups as ``{name: async fn(request) -> fields}``"""
+
+    async def velocity(request):
+        v1h, v24h = state.velocity([request["customer_id"]], [request["timestamp"]])
+        return {"txn_velocity_1h": int(v1h[0]), "txn_velocity_24h": int(v24h[0])}
+
+    async def ip_usage(request):
+        return {"ip_usage_count": int(state.ip_usage([request["ip_address"]])[0])}
+
+    async def corridor_risk(request):
+        risk = corridors.risk(f"{request['source_currency']}_{request['dest_currency']}", None)
+        return {} if risk is None else {"corridor_risk": risk}
+
+    lookups = {"velocity": velocity, "ip_usage": ip_usage, "corridor_risk": corridor_risk}
+
+    if feature_store is not None:
+        async def customer_history(request):
+            # SQLite is blocking, so the query runs on a thread
+            loop = asyncio.get_running_loop()
+            found = await loop.run_in_executor(
+                io_executor, feature_store.lookup, [request["customer_id"]], [request["device_id"]]
+            )
+            fields = {"new_device": int(found["new_device"][0])}
+            if not np.isnan(found["account_age_days"][0]):
+                for col in ["account_age_days", "chargeback_history_count"]:
+                    fields[col] = int(found[col][0])
+                fields["kyc_tier"] = found["kyc_tier"][0]
+            if not np.isnan(found["device_trust_score"][0]):
+                fields["device_trust_score"] = float(found["device_trust_score"][0])
+            return fields
+
+        lookups = {"customer_history": customer_history, **lookups}
+    return lookups
+
+
+def with_latency(lookups, median_ms, sigma=0.5, seed=42):
+    """Wrap lookups with a log-normal delay, standing in for remote services"""
+    rng = np.random.default_rng(seed)
+
+    def delayed(fn):
+        async def lookup(request):
+            await asyncio.sleep(median_ms / 1e3 * rng.lognormal(0.0, sigma))
+            return await fn(request)
+        return lookup
+
+    return {name: delayed(fn) for name, fn in lookups.items()}
+
+
+# -- model batching ---------------------------------------------------------
+
+def score_rows(model, rows, threshold=DECISION_THRESHOLD):
+    """Derive features for enriched request rows and score them in one pipeline call"""
+    df = prepare_features(pd.DataFrame(rows))
+    df["ip_usage_count"] = [row.get("ip_usage_count", 1) for row in rows]
+    return score_transactions(model, df[MODEL_COLUMNS], threshold)
+
+
+class _ModelBatcher:
+    """Coalesce concurrent requests into shared pipeline calls on an executor"""
+
+    def __init__(self, model, executor, window_ms, max_batch, max_in_flight, threshold):
+        self.model = model
+        self.executor = executor
+        self.window_s = window_ms / 1e3
+        self.max_batch = max_batch
+        self.threshold = threshold
+        self.queue = asyncio.Queue()
+        self.in_flight = asyncio.Semaphore(max_in_flight)
+        self.batch_sizes = []
+        self.task = asyncio.get_running_loop().create_task(self._run())
+
+    async def score(self, row):
+        future = asyncio.get_running_loop().create_future()
+        await self.queue.put((row, future))
+        return await future
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self.queue.get()]
+            deadline = loop.time() + self.window_s
+            while len(batch) < self.max_batch:
+                remaining = deadline - loop.time()
+                try:
+                    if remaining <= 0:
+                        batch.append(self.queue.get_nowait())
+                    else:
+                        batch.append(await asyncio.wait_for(self.queue.get(), remaining))
+                except (asyncio.QueueEmpty, asyncio.TimeoutError):
+                    break
+            await self.in_flight.acquire()
+            loop.create_task(self._score(batch))
+
+    async def _score(self, batch):
+        try:
+            rows = [row for row, _ in batch]
+            result = await asyncio.get_running_loop().run_in_executor(
+                self.executor, score_rows, self.model, rows, self.threshold
+            )
+            self.batch_sizes.append(len(batch))
+            for (_, future), (_, outcome) in zip(batch, result.iterrows()):
+                if not future.done():
+                    future.set_result(outcome)
+        except Exception as e:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+        finally:
+            self.in_flight.release()
+
+    def close(self):
+        self.task.cancel()
+
+
+# -- orchestrator -----------------------------------------------------------
+
+class AsyncScorer:
+    """Fan out enrichment under a deadline, then score on an executor.
+
+    Create and use it inside a running event loop. ``fan_out=False`` awaits
+    the lookups one after another with no deadline (the sequential baseline).
+    """
+
+    def __init__(self, model, lookups, deadline_ms=50.0, cpu_workers=1, batch_window_ms=2.0, max_batch=256,
+                 fan_out=True, threshold=DECISION_THRESHOLD):
+        self.lookups = lookups
+        self.deadline_s = deadline_ms / 1e3
+        self.fan_out = fan_out
+        self.executor = ThreadPoolExecutor(cpu_workers, thread_name_prefix="score")
+        self.batcher = _ModelBatcher(model, self.executor, batch_window_ms, max_batch, cpu_workers, threshold)
+        self.fallback_counts = dict.fromkeys(lookups, 0)
+        self.requests = 0
+
+    async def enrich(self, request):
+        """Request fields merged with lookup results; names of lookups that fell back"""
+        results, failed = {}, []
+        if self.fan_out:
+            tasks = {asyncio.ensure_future(fn(request)): name for name, fn in self.lookups.items()}
+            done, pending = await asyncio.wait(tasks, timeout=self.deadline_s)
+            for task in pending:
+                task.cancel()
+                failed.append(tasks[task])
+            for task in done:
+                if task.exception() is None:
+                    results[tasks[task]] = task.result()
+                else:
+                    failed.append(tasks[task])
+        else:
+            for name, fn in self.lookups.items():
+                try:
+                    results[name] = await fn(request)
+                except Exception:
+                    failed.append(name)
+
+        row = dict(request)
+        for name in failed:
+            for field, value in FALLBACKS.get(name, {}).items():
+                row.setdefault(field, value)
+            self.fallback_counts[name] += 1
+        for fields in results.values():
+            row.update(fields)
+        return row, sorted(failed)
+
+    async def score(self, request):
+        """Score one transaction dict; returns the decision with timing and fallbacks"""
+        start = time.perf_counter()
+        row, fallbacks = await self.enrich(request)
+        enriched = time.perf_counter()
+        outcome = await self.batcher.score(row)
+        self.requests += 1
+        return {
+            "transaction_id": request.get("transaction_id"),
+            "fraud_probability": float(outcome["fraud_probability"]),
+            "decision": outcome["decision"],
+            "risk_level": outcome["risk_level"],
+            "fallbacks": fallbacks,
+            "enrich_ms": (enriched - start) * 1e3,
+            "total_ms": (time.perf_counter() - start) * 1e3,
+        }
+
+    def close(self):
+        self.batcher.close()
+        self.executor.shutdown(wait=False)
+
+
+# -- benchmark --------------------------------------------------------------
+
+async def run_load(scorer, requests, concurrency):
+    """Score requests with ``concurrency`` in flight at any time"""
+    results = []
+    pending = iter(requests)
+
+    async def worker():
+        for request in pending:
+            results.append(await scorer.score(request))
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return results, time.perf_counter() - start
+
+
+def bench_requests(history, n):
+    """Hold out the last n cleaned transactions as requests, without the fields lookups provide"""
+    requests = history.iloc[-n:].drop(columns=["txn_velocity_1h", "txn_velocity_24h", "corridor_risk", "is_fraud"])
+    return history.iloc[:-n], requests.to_dict("records")
+
+
+async def bench(args):
+    model = load_pipeline(args.model)
+    history = load_history()
+    warmup, requests = bench_requests(history, args.requests)
+    corridors = CorridorIndex.from_history(warmup)
+    try:
+        store = FeatureStore(args.store)
+        store.lookup(["warm"], ["up"])
+    except (FileNotFoundError, ValueError) as e:
+        print(f"{e}; benchmarking without feature-store lookups.")
+        store = None
+    io_executor = ThreadPoolExecutor(8, thread_name_prefix="lookup")
+
+    rows = []
+    for mode, fan_out, window in [("sequential", False, 0.0), ("concurrent", True, args.batch_window_ms)]:
+        for concurrency in args.concurrency:
+            state = StreamState()
+            state.apply(warmup)
+            lookups = default_lookups(state, corridors, store, io_executor)
+            if args.lookup_ms:
+                lookups = with_latency(lookups, args.lookup_ms)
+            scorer = AsyncScorer(model, lookups, deadline_ms=args.deadline_ms, cpu_workers=args.cpu_workers,
+                                 batch_window_ms=window, max_batch=args.max_batch if fan_out else 1,
+                                 fan_out=fan_out)
+            await scorer.score(requests[0])  # warm up
+            results, elapsed = await run_load(scorer, requests, concurrency)
+            scorer.close()
+            total = np.array([r["total_ms"] for r in results])
+            enrich = np.array([r["enrich_ms"] for r in results])
+            rows.append({
+                "mode": mode,
+                "concurrency": concurrency,
+                "p50_ms": np.percentile(total, 50),
+                "p99_ms": np.percentile(total, 99),
+                "enrich_p50_ms": np.percentile(enrich, 50),
+                "enrich_p99_ms": np.percentile(enrich, 99),
+                "fallback_rate": np.mean([bool(r["fallbacks"]) for r in results]),
+                "mean_batch": np.mean(scorer.batcher.batch_sizes) if scorer.batcher.batch_sizes else 0.0,
+                "txn_per_s": len(results) / elapsed,
+            })
+    io_executor.shutdown()
+    return pd.DataFrame(rows)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Latency of async scoring with concurrent enrichment")
+    parser.add_argument("--model", default=MODEL_PATH)
+    parser.add_argument("--store", default=STORE_PATH)
+    parser.add_argument("--requests", type=int, default=400)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8, 32])
+    parser.add_argument("--lookup-ms", type=float, default=5.0, help="Median simulated latency per lookup (0 = none)")
+    parser.add_argument("--deadline-ms", type=float, default=20.0)
+    parser.add_argument("--cpu-workers", type=int, default=1)
+    parser.add_argument("--batch-window-ms", type=float, default=2.0)
+    parser.add_argument("--max-batch", type=int, default=256)
+    args = parser.parse_args()
+
+    report = asyncio.run(bench(args))
+    pd.set_option("display.width", 200)
+    print(f"{args.requests} requests, lookups ~{args.lookup_ms:g} ms each, enrichment deadline {args.deadline_ms:g} ms")
+    print(report.to_string(index=False, float_format=lambda v: f"{v:.2f}"))
+
+
+if __name__ == "__main__":
+    main()
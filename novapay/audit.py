@@ -0,0 +1,359 @@
+"""Append-only decision audit log.
+
+``AuditWriter.log`` only puts the record on an in-memory queue. A background
+thread drains the queue, encodes records in batches and writes each batch with
+a single ``write`` call to a rotated binary log under ``Data/audit/``.
+
+File layout::
+
+    b"NPAUDIT1"                                    file magic
+    [<uint32 length><uint32 crc32><payload>] ...   one frame per decision
+
+Payload: ``<d d B B H H B>`` (timestamp, fraud_probability, decision,
+risk_level, len(transaction_id), len(model_version), n_reasons), then the two
+UTF-8 strings, then per reason ``<H f>`` (len(feature), shap_value) and the
+feature name. A torn frame at the end of a file (crash mid-write) fails its
+CRC and is ignored by the reader.
+
+fsync policies:
+
+* ``"batch"``    - fsync after every flushed batch (nothing acknowledged is lost)
+* ``"interval"`` - fsync at most every ``fsync_seconds``
+* ``"never"``    - leave it to the OS
+
+Usage:
+    python -m novapay.audit bench --records 500000 --fsync batch
+    python -m novapay.audit read --decision DECLINE --since 2026-10-01
+"""
+import argparse
+import os
+import queue
+import struct
+import tempfile
+import threading
+import time
+import zlib
+from datetime import datetime, timezone
+
+import numpy as np
+import pandas as pd
+
+AUDIT_DIR = "Data/audit"
+MAGIC = b"NPAUDIT1"
+FSYNC_POLICIES = ["batch", "interval", "never"]
+DECISIONS = ["ALLOW", "DECLINE"]
+RISK_LEVELS = ["LOW", "MEDIUM", "HIGH"]
+
+_FRAME = struct.Struct("<II")
+_HEADER = struct.Struct("<ddBBHHB")
+_REASON = struct.Struct("<Hf")
+
+
+def encode_record(record):
+    """Encode one decision record as a length-prefixed, checksummed frame"""
+    transaction_id = str(record.get("transaction_id", "")).encode()
+    model_version = str(record.get("model_version") or "").encode()
+    reasons = record.get("reasons") or []
+    parts = [
+        _HEADER.pack(
+            record.get("timestamp", time.time()),
+            record["fraud_probability"],
+            DECISIONS.index(record["decision"]),
+            RISK_LEVELS.index(record["risk_level"]),
+            len(transaction_id),
+            len(model_version),
+            len(reasons),
+        ),
+        transaction_id,
+        model_version,
+    ]
+    for feature, shap_value in reasons:
+        name = feature.encode()
+        parts.append(_REASON.pack(len(name), shap_value))
+        parts.append(name)
+    payload = b"".join(parts)
+    return _FRAME.pack(len(payload), zlib.crc32(payload)) + payload
+
+
+def iter_records(path):
+    """Yield decoded records from one log file, stopping at a torn tail"""
+    with open(path, "rb") as f:
+        data = f.read()
+    if not data.startswith(MAGIC):
+        raise ValueError(f"{path} is not an audit log")
+
+    offset = len(MAGIC)
+    end = len(data)
+    while offset + _FRAME.size <= end:
+        length, crc = _FRAME.unpack_from(data, offset)
+        start = offset + _FRAME.size
+        payload = data[start:start + length]
+        if len(payload) < length or zlib.crc32(payload) != crc:
+            break
+        offset = start + length
+
+        ts, prob, decision, risk, id_len, version_len, n_reasons = _HEADER.unpack_from(payload)
+        pos = _HEADER.size
+        transaction_id = payload[pos:pos + id_len].decode()
+        pos += id_len
+        model_version = payload[pos:pos + version_len].decode()
+        pos += version_len
+        reasons = []
+        for _ in range(n_reasons):
+            name_len, shap_value = _REASON.unpack_from(payload, pos)
+            pos += _REASON.size
+            reasons.append((payload[pos:pos + name_len].decode(), shap_value))
+            pos += name_len
+        yield {
+            "timestamp": ts,
+            "transaction_id": transaction_id,
+            "model_version": model_version,
+            "fraud_probability": prob,
+            "decision": DECISIONS[decision],
+            "risk_level": RISK_LEVELS[risk],
+            "reasons": reasons,
+        }
+
+
+def log_files(directory=AUDIT_DIR):
+    """Audit log files in write order"""
+    if not os.path.isdir(directory):
+        return []
+    return [
+        os.path.join(directory, name)
+        for name in sorted(os.listdir(directory))
+        if name.startswith("audit-") and name.endswith(".bin")
+    ]
+
+
+def _file_start(path):
+    """First write time encoded in a log file name"""
+    stamp = os.path.basename(path).split("-")[1]
+    return datetime.strptime(stamp, "%Y%m%dT%H%M%S%f").replace(tzinfo=timezone.utc).timestamp()
+
+
+def read_audit_log(directory=AUDIT_DIR, since=None, until=None, decision=None, transaction_id=None):
+    """Load audit records into a DataFrame, optionally filtered"""
+    since_ts = pd.Timestamp(since, tz="UTC").timestamp() if since is not None else None
+    until_ts = pd.Timestamp(until, tz="UTC").timestamp() if until is not None else None
+
+    paths = log_files(directory)
+    starts = [_file_start(path) for path in paths]
+    rows = []
+    for i, path in enumerate(paths):
+        # Records in a file are older than the next file's first write, so files ending before since are skipped.
+        # A file's own first write does not bound its oldest record (decisions are stamped before queueing),
+        # so until is checked per record only.
+        if since_ts is not None and i + 1 < len(paths) and starts[i + 1] < since_ts:
+            continue
+        for record in iter_records(path):
+            if since_ts is not None and record["timestamp"] < since_ts:
+                continue
+            if until_ts is not None and record["timestamp"] >= until_ts:
+                continue
+            if decision is not None and record["decision"] != decision:
+                continue
+            if transaction_id is not None and record["transaction_id"] != transaction_id:
+                continue
+            rows.append(record)
+
+    df = pd.DataFrame(rows, columns=[
+        "timestamp", "transaction_id", "model_version", "fraud_probability", "decision", "risk_level", "reasons",
+    ])
+    df["timestamp"] = pd.to_datetime(df["timestamp"], unit="s", utc=True)
+    return df
+
+
+class AuditWriter:
+    """Buffer decision records and flush them to rotated log files in a background thread"""
+
+    def __init__(self, directory=AUDIT_DIR, fsync="batch", fsync_seconds=1.0, flush_records=1024,
+                 flush_seconds=0.2, max_file_bytes=64 * 1024 * 1024, queue_size=100_000):
+        if fsync not in FSYNC_POLICIES:
+            raise ValueError(f"fsync must be one of {FSYNC_POLICIES}, got {fsync!r}")
+        self.directory = directory
+        self.fsync = fsync
+        self.fsync_seconds = fsync_seconds
+        self.flush_records = flush_records
+        self.flush_seconds = flush_seconds
+        self.max_file_bytes = max_file_bytes
+        self.records_written = 0
+        self.bytes_written = 0
+        self.batches = 0
+        self.files = 0
+        self.last_error = None
+        self._queue = queue.Queue(queue_size)
+        self._file = None
+        self._file_bytes = 0
+        self._last_fsync = time.monotonic()
+        self._closed = False
+        self._close_lock = threading.Lock()
+
+        os.makedirs(directory, exist_ok=True)
+        self._thread = threading.Thread(target=self._run, name="audit-writer", daemon=True)
+        self._thread.start()
+
+    def log(self, record):
+        """Queue one decision record; blocks only if the writer is a whole queue behind"""
+        # Stamp the decision time here, not when the writer thread gets to the record
+        record.setdefault("timestamp", time.time())
+        # Under the lock so no record can be queued behind close()'s sentinel
+        with self._close_lock:
+            if self._closed:
+                raise RuntimeError("AuditWriter is closed")
+            self._queue.put(record)
+
+    def _open_next_file(self):
+        if self._file is not None:
+            self._sync(force=True)
+            self._file.close()
+        stamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%S%f")
+        path = os.path.join(self.directory, f"audit-{stamp}-{self.files:06d}.bin")
+        self._file = open(path, "ab", buffering=0)
+        self._file.write(MAGIC)
+        self._file_bytes = len(MAGIC)
+        self.files += 1
+
+    def _sync(self, force=False):
+        if self.fsync == "never" and not force:
+            return
+        now = time.monotonic()
+        if force or self.fsync == "batch" or now - self._last_fsync >= self.fsync_seconds:
+            os.fsync(self._file.fileno())
+            self._last_fsync = now
+
+    def _write_batch(self, batch):
+        data = b"".join(encode_record(record) for record in batch)
+        if self._file is None or self._file_bytes + len(data) > self.max_file_bytes:
+            self._open_next_file()
+        self._file.write(data)
+        self._file_bytes += len(data)
+        self._sync()
+        self.records_written += len(batch)
+        self.bytes_written += len(data)
+        self.batches += 1
+
+    def _run(self):
+        stop = False
+        while not stop:
+            # Wait for the first record, then take whatever else arrives within flush_seconds
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self.flush_seconds
+            while len(batch) < self.flush_records:
+                timeout = deadline - time.monotonic()
+                try:
+                    batch.append(self._queue.get(timeout=timeout) if timeout > 0 else self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            if batch[-1] is None:
+                batch.pop()
+                stop = True
+            if batch:
+                try:
+                    self._write_batch(batch)
+                except Exception as e:
+                    self.last_error = str(e)
+            for _ in range(len(batch) + stop):
+                self._queue.task_done()
+
+        if self._file is not None:
+            self._sync(force=True)
+            self._file.close()
+            self._file = None
+
+    def flush(self):
+        """Block until every queued record has been written"""
+        self._queue.join()
+
+    def close(self):
+        """Write everything still queued, fsync and stop the writer thread"""
+        with self._close_lock:
+            if self._closed:
+                return
+            self._closed = True
+            self._queue.put(None)
+        self._thread.join()
+
+    def stats(self):
+        return {
+            "records_written": self.records_written,
+            "bytes_written": self.bytes_written,
+            "batches": self.batches,
+            "files": self.files,
+            "queued": self._queue.qsize(),
+            "last_error": self.last_error,
+        }
+
+
+def _bench(args):
+    rng = np.random.default_rng(42)
+    features = ["num__ip_risk_score", "num__device_ip_risk", "cat__channel_WEB", "num__new_device_velocity"]
+    probs = rng.random(args.records)
+    records = [
+        {
+            "timestamp": time.time(),
+            "transaction_id": f"bench-{i:09d}",
+            "model_version": "bench",
+            "fraud_probability": float(p),
+            "decision": "DECLINE" if p > 0.5 else "ALLOW",
+            "risk_level": "HIGH" if p > 0.7 else "MEDIUM" if p > 0.3 else "LOW",
+            "reasons": [(f, float(p) / (k + 1)) for k, f in enumerate(features[:3])] if p > 0.5 else [],
+        }
+        for i, p in enumerate(probs)
+    ]
+
+    directory = args.dir or tempfile.mkdtemp(prefix="audit_bench_")
+    writer = AuditWriter(directory, fsync=args.fsync, max_file_bytes=args.max_file_mb * 1024 * 1024)
+    log_seconds = []
+    start = time.perf_counter()
+    for record in records:
+        t0 = time.perf_counter()
+        writer.log(record)
+        log_seconds.append(time.perf_counter() - t0)
+    writer.close()
+    elapsed = time.perf_counter() - start
+    stats = writer.stats()
+    log_us = np.array(log_seconds) * 1e6
+    print(
+        f"fsync={args.fsync}: {stats['records_written']} records in {elapsed:.2f}s "
+        f"({stats['records_written'] / elapsed:,.0f} records/s sustained), "
+        f"{stats['bytes_written'] / stats['records_written']:.1f} bytes/record, "
+        f"{stats['batches']} batches, {stats['files']} files"
+    )
+    print(f"log() latency: p50 {np.percentile(log_us, 50):.1f} us  p99 {np.percentile(log_us, 99):.1f} us")
+
+    start = time.perf_counter()
+    df = read_audit_log(directory)
+    elapsed = time.perf_counter() - start
+    print(f"read back {len(df)} records in {elapsed:.2f}s ({len(df) / elapsed:,.0f} records/s)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Decision audit log tools")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    bench = sub.add_parser("bench", help="Measure sustained write throughput")
+    bench.add_argument("--dir", default=None, help="Log directory (default: a fresh temp directory)")
+    bench.add_argument("--records", type=int, default=200_000)
+    bench.add_argument("--fsync", choices=FSYNC_POLICIES, default="batch")
+    bench.add_argument("--max-file-mb", type=int, default=64)
+
+    read = sub.add_parser("read", help="Print audit records")
+    read.add_argument("--dir", default=AUDIT_DIR)
+    read.add_argument("--since", default=None)
+    read.add_argument("--until", default=None)
+    read.add_argument("--decision", choices=DECISIONS, default=None)
+    read.add_argument("--transaction-id", default=None)
+    args = parser.parse_args()
+
+    if args.command == "bench":
+        _bench(args)
+    else:
+        df = read_audit_log(args.dir, args.since, args.until, args.decision, args.transaction_id)
+        pd.set_option("display.width", 200)
+        pd.set_option("display.max_colwidth", 120)
+        print(df.to_string(index=False))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+"""Low-memory batch preprocessing and inference.
+
+The fitted ColumnTransformer produces a dense float64 matrix (89 columns, most
+of them one-hot zeros) and the forest then makes a float32 copy of it. The
+matrix modes here build the forest's input directly instead:
+
+* ``"dense"``   - the pipeline's own ``predict_proba`` (reference)
+* ``"float32"`` - dense float32 built block by block, no float64 intermediate
+* ``"sparse"``  - float32 CSR with the one-hot block kept sparse
+
+All modes give identical probabilities because the trees compare float32
+values either way. ``chunk_rows`` bounds peak memory further.
+
+Benchmark:
+    python -m novapay.batch_scoring --rows 1000000
+"""
+import argparse
+import copy
+import time
+import tracemalloc
+
+import joblib
+import numpy as np
+from scipy import sparse
+from sklearn.preprocessing import FunctionTransformer, OneHotEncoder
+
+from novapay.features import load_labelled_frame
+
+MATRIX_MODES = ["dense", "float32", "sparse"]
+
+
+def _blocks(preprocess, X, as_sparse):
+    """Yield float32 blocks in the ColumnTransformer's output column order"""
+    for _, transformer, columns in preprocess.transformers_:
+        if transformer == "drop" or len(columns) == 0:
+            continue
+        if transformer == "passthrough" or (
+            isinstance(transformer, FunctionTransformer) and transformer.func is None
+        ):
+            block = X[columns].to_numpy(dtype=np.float32)
+            yield sparse.csr_matrix(block) if as_sparse else block
+        elif isinstance(transformer, OneHotEncoder):
+            encoder = copy.copy(transformer)
+            encoder.sparse_output = as_sparse
+            encoder.dtype = np.float32
+            yield encoder.transform(X[columns])
+        else:
+            block = transformer.transform(X[columns])
+            if as_sparse:
+                yield sparse.csr_matrix(block, dtype=np.float32)
+            else:
+                yield np.asarray(block.toarray() if sparse.issparse(block) else block, dtype=np.float32)
+
+
+def transform_float32(preprocess, X):
+    """Dense float32 equivalent of preprocess.transform(X)"""
+    blocks = list(_blocks(preprocess, X, as_sparse=False))
+    out = np.empty((len(X), sum(b.shape[1] for b in blocks)), dtype=np.float32)
+    start = 0
+    for block in blocks:
+        out[:, start:start + block.shape[1]] = block
+        start += block.shape[1]
+    return out
+
+
+def transform_sparse(preprocess, X):
+    """float32 CSR equivalent of preprocess.transform(X)"""
+    return sparse.hstack(list(_blocks(preprocess, X, as_sparse=True)), format="csr", dtype=np.float32)
+
+
+def batch_predict_proba(model, X, matrix="sparse", chunk_rows=None):
+    """Fraud-class probabilities for X using the chosen matrix mode"""
+    if matrix not in MATRIX_MODES:
+        raise ValueError(f"matrix must be one of {MATRIX_MODES}, got {matrix!r}")
+    if chunk_rows:
+        return np.concatenate([
+            batch_predict_proba(model, X.iloc[start:start + chunk_rows], matrix)
+            for start in range(0, len(X), chunk_rows)
+        ])
+
+    if matrix == "dense":
+        return model.predict_proba(X)[:, 1]
+
+    preprocess = model.named_steps["preprocess"]
+    rf = model.named_steps["model"]
+    X_trans = transform_sparse(preprocess, X) if matrix == "sparse" else transform_float32(preprocess, X)
+    fraud_idx = int(np.flatnonzero(rf.classes_ == 1)[0])
+    return rf.predict_proba(X_trans)[:, fraud_idx]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark dense vs float32 vs sparse batch scoring")
+    parser.add_argument("--model", default="Model/rf_fraud_pipeline.pkl")
+    parser.add_argument("--data", default="Data/Nova_CleanedEDA_df.csv")
+    parser.add_argument("--rows", type=int, default=200_000)
+    parser.add_argument("--chunk-rows", type=int, default=None)
+    args = parser.parse_args()
+
+    model = joblib.load(args.model)
+    X, _ = load_labelled_frame(args.data)
+    rng = np.random.default_rng(42)
+    X = X.iloc[rng.integers(0, len(X), args.rows)].reset_index(drop=True)
+    print(f"Rows: {len(X)}  chunk_rows: {args.chunk_rows}")
+
+    reference = None
+    for matrix in MATRIX_MODES:
+        tracemalloc.start()
+        start = time.perf_counter()
+        proba = batch_predict_proba(model, X, matrix, args.chunk_rows)
+        elapsed = time.perf_counter() - start
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        if reference is None:
+            reference = proba
+        identical = np.array_equal(proba, reference)
+        print(
+            f"{matrix:>8}: peak {peak / 1e6:8.1f} MB  {elapsed:7.2f}s  "
+            f"{len(X) / elapsed:9.0f} rows/s  identical to dense: {identical}"
+        )
+
+
+if __name__ == "__main__":
+    main()
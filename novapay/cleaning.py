@@ -0,0 +1,113 @@
+"""Vectorized port of the notebook 01 cleaning steps for raw transactions.
+
+One deliberate deviation: notebook 01 strips thousands separators with
+``.str.replace`` on the concatenated ``amount_src`` column. Only the main
+file stores amounts as text, so every numeric value (the
+``nova_pay_fraud_boost.csv`` rows) became NaN there and was backfilled as
+``amount_usd / exchange_rate_src_to_dest``. That is the value the model was
+trained on, e.g. 2.04 instead of 2267.24. ``clean_transactions`` keeps real
+numeric amounts by default, which is right for live inputs. Pass
+``notebook_amounts=True`` to reproduce the training values when replaying
+the raw CSVs, as the replay / backtest engine does.
+"""
+import numpy as np
+import pandas as pd
+
+# Training-time medians used by notebook 01 to fill missing values
+FEE_MEDIAN = 3.53
+DEVICE_TRUST_MEDIAN = 0.6545
+
+# Known spelling and spacing variants, keyed on the stripped lower-case value
+COUNTRY_VARIANTS = {"us": "US", "uk": "UK", "ca": "CA", "unknown": np.nan, "nan": np.nan}
+CHANNEL_VARIANTS = {
+    "atm": "ATM",
+    "mobile": "MOBILE",
+    "mobille": "MOBILE",
+    "web": "WEB",
+    "weeb": "WEB",
+    "unknown": np.nan,
+}
+KYC_VARIANTS = {
+    "standard": "STANDARD",
+    "standrd": "STANDARD",
+    "enhanced": "ENHANCED",
+    "enhancd": "ENHANCED",
+    "low": "LOW",
+    "unknown": np.nan,
+    "nan": np.nan,
+}
+
+SCORE_COLUMNS = ["ip_risk_score", "device_trust_score", "risk_score_internal", "corridor_risk"]
+VELOCITY_COLUMNS = ["txn_velocity_1h", "txn_velocity_24h"]
+FLAG_COLUMNS = ["new_device", "location_mismatch"]
+
+
+def normalize_category(series, variants):
+    """Map known variants to their canonical value; other values pass through"""
+    key = series.astype("string").str.strip().str.lower()
+    known = key.isin(list(variants)).to_numpy()
+    return pd.Series(
+        np.where(known, key.map(variants).to_numpy(dtype=object), series.to_numpy(dtype=object)),
+        index=series.index,
+        dtype=object,
+    )
+
+
+def to_flag(series):
+    """Convert booleans or 'True'/'False'/'1'/'0' strings to 0/1 integers"""
+    if series.dtype == bool:
+        return series.astype(int)
+    text = series.astype("string").str.strip().str.lower()
+    return text.isin(["true", "1", "1.0", "yes"]).astype(int)
+
+
+def _notebook_amounts(series):
+    """amount_src as notebook 01 parses it: non-text values come out NaN"""
+    if not (pd.api.types.is_object_dtype(series) or pd.api.types.is_string_dtype(series)):
+        return pd.Series(np.nan, index=series.index)
+    return pd.to_numeric(series.str.replace(",", ""), errors="coerce")
+
+
+def clean_transactions(df, drop_duplicates=False, notebook_amounts=False):
+    """Apply the notebook 01 cleaning to raw transactions (one pass, no row loops)"""
+    df = df.copy()
+    if drop_duplicates:
+        df = df.drop_duplicates()
+
+    # Types
+    df["timestamp"] = pd.to_datetime(df["timestamp"], errors="coerce", utc=True, format="mixed")
+    if notebook_amounts:
+        df["amount_src"] = _notebook_amounts(df["amount_src"])
+    else:
+        df["amount_src"] = pd.to_numeric(df["amount_src"].astype("string").str.replace(",", ""), errors="coerce")
+    for col in FLAG_COLUMNS:
+        df[col] = to_flag(df[col])
+
+    # Category disparities
+    df["home_country"] = normalize_category(df["home_country"], COUNTRY_VARIANTS)
+    df["ip_country"] = normalize_category(df["ip_country"], COUNTRY_VARIANTS)
+    df["channel"] = normalize_category(df["channel"], CHANNEL_VARIANTS)
+    df["kyc_tier"] = normalize_category(df["kyc_tier"], KYC_VARIANTS)
+
+    # Ranges
+    for col in ["amount_src", "amount_usd", "fee"]:
+        df[col] = pd.to_numeric(df[col], errors="coerce").mask(lambda s: s < 0)
+    for col in SCORE_COLUMNS:
+        df[col] = pd.to_numeric(df[col], errors="coerce").clip(lower=0.0, upper=1.0)
+    for col in VELOCITY_COLUMNS:
+        df[col] = pd.to_numeric(df[col], errors="coerce").clip(lower=0).fillna(0).astype(int)
+
+    # Missing values
+    df = df.dropna(subset=["timestamp"])
+    df["amount_usd"] = df["amount_usd"].fillna(df["amount_src"] * df["exchange_rate_src_to_dest"])
+    df["fee"] = df["fee"].fillna(FEE_MEDIAN)
+    df["ip_address"] = df["ip_address"].fillna("MISSING")
+    df["ip_country"] = df["ip_country"].fillna("Unknown")
+    df["kyc_tier"] = df["kyc_tier"].fillna("Not_Verified")
+    df["device_trust_score"] = df["device_trust_score"].fillna(DEVICE_TRUST_MEDIAN)
+    df["amount_src"] = df["amount_src"].fillna(df["amount_usd"] / df["exchange_rate_src_to_dest"])
+    df = df.dropna(subset=["amount_src", "amount_usd"], how="all")
+    df["home_country"] = df["home_country"].fillna("Unknown")
+    df["channel"] = df["channel"].fillna("Unknown")
+
+    return df
@@ -0,0 +1,245 @@
+"""Forest compaction: build smaller drop-in replacements for the fitted pipeline.
+
+Three techniques are combined, all applied to the already fitted trees:
+
+* leaf merging - subtrees whose leaves all give the same fraud fraction
+  (within ``merge_tolerance``) collapse into one leaf; at 0 only exactly
+  redundant splits go, so fully grown trees need a tolerance above 0 to shrink
+* depth capping - nodes below ``max_depth`` are cut and the node at the cap
+  becomes a leaf carrying the class distribution it saw during training
+* tree subset selection - trees are ordered greedily by how much they reduce
+  the Brier score of the growing ensemble and the best prefix is kept
+
+Usage:
+    python -m novapay.compaction --max-latency-ms 15 --output Model/rf_fraud_pipeline.pkl
+"""
+import argparse
+import copy
+import pickle
+import time
+
+import joblib
+import numpy as np
+import pandas as pd
+from sklearn.metrics import precision_score, recall_score
+from sklearn.model_selection import train_test_split
+from sklearn.pipeline import Pipeline
+from sklearn.tree._tree import Tree
+
+from novapay.features import load_labelled_frame, train_holdout_split
+from novapay.early_exit import transform_for_trees
+
+TREE_COUNTS = [500, 300, 200, 100, 50, 25]
+DEPTH_CAPS = [None, 20, 15, 12, 10, 8]
+
+
+def _rebuild_tree(estimator, keep_as_leaf):
+    """Copy a fitted decision tree, turning nodes flagged in keep_as_leaf into leaves"""
+    tree = estimator.tree_
+    state = tree.__getstate__()
+    nodes, values = state["nodes"], state["values"]
+
+    # Walk the kept part of the tree in pre-order, as sklearn numbers its nodes
+    new_ids = {}
+    order = []
+    stack = [(0, 0)]
+    max_depth = 0
+    while stack:
+        node, depth = stack.pop()
+        new_ids[node] = len(order)
+        order.append(node)
+        max_depth = max(max_depth, depth)
+        left, right = nodes["left_child"][node], nodes["right_child"][node]
+        if left != -1 and not keep_as_leaf[node]:
+            stack.append((right, depth + 1))
+            stack.append((left, depth + 1))
+
+    order = np.array(order)
+    new_nodes = nodes[order].copy()
+    for i, node in enumerate(order):
+        left = nodes["left_child"][node]
+        if left == -1 or keep_as_leaf[node]:
+            new_nodes["left_child"][i] = -1
+            new_nodes["right_child"][i] = -1
+            new_nodes["feature"][i] = -2
+            new_nodes["threshold"][i] = -2.0
+        else:
+            new_nodes["left_child"][i] = new_ids[left]
+            new_nodes["right_child"][i] = new_ids[nodes["right_child"][node]]
+
+    new_tree = Tree(tree.n_features, np.atleast_1d(tree.n_classes), tree.n_outputs)
+    new_tree.__setstate__({
+        "max_depth": max_depth,
+        "node_count": len(order),
+        "nodes": new_nodes,
+        "values": np.ascontiguousarray(values[order]),
+    })
+
+    compacted = copy.copy(estimator)
+    compacted.tree_ = new_tree
+    return compacted
+
+
+def _node_depths(tree):
+    depth = np.zeros(tree.node_count, dtype=np.int64)
+    for node in range(tree.node_count):
+        for child in (tree.children_left[node], tree.children_right[node]):
+            if child != -1:
+                depth[child] = depth[node] + 1
+    return depth
+
+
+def _fraud_fraction(tree, fraud_idx):
+    values = tree.value[:, 0, :]
+    return values[:, fraud_idx] / values.sum(axis=1)
+
+
+def compact_tree(estimator, fraud_idx, max_depth=None, merge_tolerance=0.0):
+    """Depth-cap and leaf-merge one fitted decision tree"""
+    tree = estimator.tree_
+    left, right = tree.children_left, tree.children_right
+    fraction = _fraud_fraction(tree, fraud_idx)
+
+    # Children always have larger ids than their parent, so a reverse sweep is post-order
+    lo = fraction.copy()
+    hi = fraction.copy()
+    for node in range(tree.node_count - 1, -1, -1):
+        if left[node] != -1:
+            lo[node] = min(lo[left[node]], lo[right[node]])
+            hi[node] = max(hi[left[node]], hi[right[node]])
+
+    keep_as_leaf = (hi - lo) <= merge_tolerance
+    if max_depth is not None:
+        keep_as_leaf |= _node_depths(tree) >= max_depth
+    return _rebuild_tree(estimator, keep_as_leaf)
+
+
+def greedy_tree_order(tree_probs, y):
+    """Order trees so every prefix greedily minimises the ensemble Brier score"""
+    n_trees = tree_probs.shape[0]
+    remaining = list(range(n_trees))
+    running = np.zeros(tree_probs.shape[1])
+    order = []
+    for k in range(1, n_trees + 1):
+        candidates = tree_probs[remaining]
+        brier = (((running + candidates) / k - y) ** 2).mean(axis=1)
+        best = int(np.argmin(brier))
+        order.append(remaining.pop(best))
+        running += candidates[best]
+    return order
+
+
+def build_compact_pipeline(model, trees):
+    """Wrap compacted trees in a pipeline that is a drop-in for the original"""
+    rf = copy.copy(model.named_steps["model"])
+    rf.estimators_ = list(trees)
+    rf.n_estimators = len(trees)
+    return Pipeline(steps=[("preprocess", model.named_steps["preprocess"]), ("model", rf)])
+
+
+def measure(model, X_eval, y_eval, threshold=0.5, latency_rows=50):
+    """Size, latency, throughput, recall and precision of a pipeline"""
+    size_mb = len(pickle.dumps(model, protocol=pickle.HIGHEST_PROTOCOL)) / 1e6
+    rf = model.named_steps["model"]
+
+    timings = []
+    for i in range(min(latency_rows, len(X_eval))):
+        row = X_eval.iloc[[i]]
+        start = time.perf_counter()
+        model.predict_proba(row)
+        timings.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    prob = model.predict_proba(X_eval)[:, 1]
+    batch_time = time.perf_counter() - start
+    pred = (prob > threshold).astype(int)
+
+    return {
+        "trees": len(rf.estimators_),
+        "total_nodes": int(sum(e.tree_.node_count for e in rf.estimators_)),
+        "size_mb": round(size_mb, 2),
+        "latency_ms_p50": round(float(np.median(timings)) * 1e3, 3),
+        "throughput_rows_s": round(len(X_eval) / batch_time),
+        "recall": round(recall_score(y_eval, pred, zero_division=0), 4),
+        "precision": round(precision_score(y_eval, pred, zero_division=0), 4),
+    }
+
+
+def compaction_report(model, X_select, y_select, X_eval, y_eval, tree_counts=TREE_COUNTS,
+                      depth_caps=DEPTH_CAPS, merge_tolerance=0.0, threshold=0.5):
+    """Evaluate compacted candidates; returns (report DataFrame, {name: pipeline})"""
+    rf = model.named_steps["model"]
+    fraud_idx = int(np.flatnonzero(rf.classes_ == 1)[0])
+    X_select_trans = transform_for_trees(model, X_select)
+
+    rows, candidates = [], {}
+    for depth in depth_caps:
+        trees = [compact_tree(e, fraud_idx, depth, merge_tolerance) for e in rf.estimators_]
+        tree_probs = np.vstack([
+            t.predict_proba(X_select_trans, check_input=False)[:, fraud_idx] for t in trees
+        ])
+        order = greedy_tree_order(tree_probs, y_select)
+        for count in tree_counts:
+            if count > len(trees):
+                continue
+            name = f"trees={count},depth={depth or 'full'}"
+            candidate = build_compact_pipeline(model, [trees[i] for i in order[:count]])
+            candidates[name] = candidate
+            rows.append({"candidate": name, **measure(candidate, X_eval, y_eval, threshold)})
+
+    report = pd.DataFrame(rows)
+    return report, candidates
+
+
+def rank_within_budget(report, max_latency_ms=None, max_size_mb=None):
+    """Keep candidates inside the budget, best recall then precision then size first"""
+    within = pd.Series(True, index=report.index)
+    if max_latency_ms is not None:
+        within &= report["latency_ms_p50"] <= max_latency_ms
+    if max_size_mb is not None:
+        within &= report["size_mb"] <= max_size_mb
+    return report[within].sort_values(
+        ["recall", "precision", "size_mb"], ascending=[False, False, True]
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compact the fitted random forest pipeline")
+    parser.add_argument("--model", default="Model/rf_fraud_pipeline.pkl")
+    parser.add_argument("--data", default="Data/Nova_CleanedEDA_df.csv")
+    parser.add_argument("--output", default="Model/rf_fraud_pipeline_compact.pkl")
+    parser.add_argument("--report", default=None, help="Optional CSV path for the ranked table")
+    parser.add_argument("--max-latency-ms", type=float, default=None)
+    parser.add_argument("--max-size-mb", type=float, default=None)
+    parser.add_argument("--merge-tolerance", type=float, default=0.0)
+    args = parser.parse_args()
+
+    model = joblib.load(args.model)
+    X, y = load_labelled_frame(args.data)
+    _, X_test, _, y_test = train_holdout_split(X, y)
+
+    # Select trees on one half of the holdout, report on the other half
+    X_select, X_eval, y_select, y_eval = train_test_split(
+        X_test, y_test, test_size=0.5, random_state=42, stratify=y_test
+    )
+
+    report, candidates = compaction_report(
+        model, X_select, y_select, X_eval, y_eval, merge_tolerance=args.merge_tolerance
+    )
+    ranked = rank_within_budget(report, args.max_latency_ms, args.max_size_mb)
+
+    pd.set_option("display.width", 200)
+    print(ranked.to_string(index=False))
+    if args.report:
+        ranked.to_csv(args.report, index=False)
+
+    if ranked.empty:
+        print("No candidate fits the budget; nothing written.")
+        return
+    best = ranked.iloc[0]["candidate"]
+    joblib.dump(candidates[best], args.output)
+    print(f"\nWrote {best} to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
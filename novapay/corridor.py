@@ -0,0 +1,225 @@
+"""Corridor-risk index keyed by currency pair.
+
+``corridor_risk`` in the training data is a per-corridor constant: every
+``currency_pair`` carries one value (0.25 for USD_NGN, 0.10 for USD_PHP, 0.0
+for most pairs), apart from a few dozen boosted fraud rows with 0.0. The index
+stores that value, the most common one in history, as the model input for
+each pair, so the app no longer needs a manual slider for it.
+
+Next to it the index keeps labelled transaction and fraud counts per pair.
+These are updated incrementally as labels arrive and read as an empirical-Bayes
+smoothed fraud rate, ``(frauds + k * global_rate) / (transactions + k)``. A
+corridor with a handful of transactions then stays near the global rate
+instead of swinging to 0% or 100%. The smoothed rate is shown to analysts and
+flags corridors whose published risk looks out of date. It is not fed to the
+model, which was trained on the published values.
+
+``risk`` is a dict lookup; ``join`` maps a whole column of pairs to risks in
+one vectorized ``get_indexer`` call for batch scoring.
+
+Usage:
+    python -m novapay.corridor build
+    python -m novapay.corridor bench --rows 1000000
+"""
+import argparse
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+CORRIDOR_PATH = "Data/corridor_index.npz"
+
+# Most training pairs carry no corridor risk, so unknown pairs default to it
+DEFAULT_RISK = 0.0
+PRIOR_STRENGTH = 50.0
+
+
+def currency_pairs(df):
+    """currency_pair column, or source_dest when only the currencies are present"""
+    if "currency_pair" in df.columns:
+        return df["currency_pair"]
+    return df["source_currency"] + "_" + df["dest_currency"]
+
+
+class CorridorIndex:
+    """Published corridor risk plus labelled counts per currency pair"""
+
+    def __init__(self, pairs=(), risk=(), transactions=(), frauds=(), prior_strength=PRIOR_STRENGTH):
+        self.pairs = list(pairs)
+        self.prior_strength = prior_strength
+        self._slots = {pair: i for i, pair in enumerate(self.pairs)}
+        self._risk = np.asarray(risk, dtype=float)
+        self._transactions = np.asarray(transactions, dtype=np.int64)
+        self._frauds = np.asarray(frauds, dtype=np.int64)
+        self._total_transactions = int(self._transactions.sum())
+        self._total_frauds = int(self._frauds.sum())
+        self._index = None
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_history(cls, history, prior_strength=PRIOR_STRENGTH):
+        """Bulk-build from cleaned transactions with corridor_risk (and is_fraud when labelled)"""
+        frame = pd.DataFrame({"pair": currency_pairs(history).to_numpy(),
+                              "risk": history["corridor_risk"].to_numpy()})
+        frame["is_fraud"] = history["is_fraud"].to_numpy() if "is_fraud" in history.columns else 0
+        labelled = int("is_fraud" in history.columns)
+
+        # Most common published value per pair (ties go to the higher risk)
+        modes = (frame.dropna(subset=["risk"]).groupby(["pair", "risk"]).size().rename("n").reset_index()
+                 .sort_values(["pair", "n", "risk"]).drop_duplicates("pair", keep="last").set_index("pair")["risk"])
+        counts = frame.groupby("pair")["is_fraud"].agg(["size", "sum"])
+        pairs = counts.index.tolist()
+        return cls(pairs, modes.reindex(pairs).to_numpy(), counts["size"].to_numpy() * labelled,
+                   counts["sum"].to_numpy(), prior_strength)
+
+    def _slot(self, pair):
+        """Slot of a pair, adding an unpublished entry for pairs not seen before"""
+        slot = self._slots.get(pair)
+        if slot is None:
+            slot = self._slots[pair] = len(self.pairs)
+            self.pairs.append(pair)
+            self._risk = np.append(self._risk, np.nan)
+            self._transactions = np.append(self._transactions, 0)
+            self._frauds = np.append(self._frauds, 0)
+            self._index = None
+        return slot
+
+    @property
+    def global_rate(self):
+        return self._total_frauds / self._total_transactions if self._total_transactions else 0.0
+
+    def risk(self, pair, default=DEFAULT_RISK):
+        """Published corridor risk of one pair, or ``default`` when it has none"""
+        slot = self._slots.get(pair)
+        if slot is None or np.isnan(self._risk[slot]):
+            return default
+        return float(self._risk[slot])
+
+    def fraud_rate(self, pair):
+        """Smoothed fraud rate of one pair (the global rate for unseen pairs)"""
+        slot = self._slots.get(pair)
+        n, frauds = (0, 0) if slot is None else (self._transactions[slot], self._frauds[slot])
+        return float((frauds + self.prior_strength * self.global_rate) / (n + self.prior_strength))
+
+    def lookup(self, pair):
+        """Everything the index knows about one pair"""
+        slot = self._slots.get(pair)
+        return {
+            "corridor_risk": self.risk(pair, None),
+            "transactions": 0 if slot is None else int(self._transactions[slot]),
+            "frauds": 0 if slot is None else int(self._frauds[slot]),
+            "fraud_rate": self.fraud_rate(pair),
+        }
+
+    def join(self, pairs, default=DEFAULT_RISK):
+        """Published risk for a whole column of pairs in one vectorized lookup"""
+        index = self._index
+        if index is None:
+            index = self._index = pd.Index(self.pairs)
+        slots = index.get_indexer(pd.Index(pairs))
+        risk = np.append(self._risk, np.nan)[slots]
+        return np.where(np.isnan(risk), default, risk)
+
+    def fill(self, df, default=DEFAULT_RISK):
+        """Copy of ``df`` with corridor_risk from the index; unknown pairs keep an existing value"""
+        risk = self.join(currency_pairs(df), np.nan)
+        if "corridor_risk" in df.columns:
+            risk = np.where(np.isnan(risk), df["corridor_risk"].to_numpy(dtype=float), risk)
+        return df.assign(corridor_risk=np.where(np.isnan(risk), default, risk))
+
+    def update(self, pairs, is_fraud):
+        """Add labelled outcomes for transactions in the given pairs"""
+        pairs = [pairs] if isinstance(pairs, str) else list(pairs)
+        is_fraud = np.broadcast_to(np.asarray(is_fraud, dtype=np.int64), len(pairs))
+        with self._lock:
+            slots = np.fromiter((self._slot(p) for p in pairs), dtype=np.intp, count=len(pairs))
+            np.add.at(self._transactions, slots, 1)
+            np.add.at(self._frauds, slots, is_fraud)
+            self._total_transactions += len(pairs)
+            self._total_frauds += int(is_fraud.sum())
+
+    def publish(self, pair, risk):
+        """Set the corridor risk fed to the model for one pair"""
+        with self._lock:
+            self._risk[self._slot(pair)] = risk
+
+    def table(self):
+        """One row per pair, highest smoothed fraud rate first"""
+        n, frauds = self._transactions, self._frauds
+        return pd.DataFrame({
+            "currency_pair": self.pairs,
+            "corridor_risk": self._risk,
+            "transactions": n,
+            "frauds": frauds,
+            "raw_fraud_rate": frauds / np.maximum(n, 1),
+            "fraud_rate": (frauds + self.prior_strength * self.global_rate) / (n + self.prior_strength),
+        }).sort_values("fraud_rate", ascending=False, ignore_index=True)
+
+    def save(self, path=CORRIDOR_PATH):
+        with self._lock:
+            np.savez(path, pairs=np.array(self.pairs, dtype=str), risk=self._risk,
+                     transactions=self._transactions, frauds=self._frauds, prior_strength=self.prior_strength)
+
+    @classmethod
+    def load(cls, path=CORRIDOR_PATH):
+        with np.load(path) as data:
+            return cls(data["pairs"].tolist(), data["risk"], data["transactions"], data["frauds"],
+                       float(data["prior_strength"]))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build and benchmark the corridor-risk index")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    build = sub.add_parser("build", help="Build the index from labelled history")
+    build.add_argument("--data", default="Data/Nova_CleanedEDA_df.csv")
+    build.add_argument("--path", default=CORRIDOR_PATH)
+    build.add_argument("--prior-strength", type=float, default=PRIOR_STRENGTH)
+
+    bench = sub.add_parser("bench", help="Single lookups and the batch join vs a pandas merge")
+    bench.add_argument("--data", default="Data/Nova_CleanedEDA_df.csv")
+    bench.add_argument("--rows", type=int, default=1_000_000)
+    args = parser.parse_args()
+
+    history = pd.read_csv(args.data)
+    if args.command == "build":
+        start = time.perf_counter()
+        index = CorridorIndex.from_history(history, args.prior_strength)
+        index.save(args.path)
+        print(f"Indexed {len(index.pairs)} corridors in {(time.perf_counter() - start) * 1e3:.1f} ms -> {args.path}")
+        pd.set_option("display.width", 200)
+        print(index.table().to_string(index=False, float_format=lambda v: f"{v:.4f}"))
+        return
+
+    index = CorridorIndex.from_history(history)
+    pairs = currency_pairs(history)
+    mismatch = (index.join(pairs) != history["corridor_risk"].to_numpy()).mean()
+    print(f"{len(index.pairs)} corridors; published risk differs from the row value on {mismatch:.2%} of history")
+
+    sample = pairs.to_numpy()[:10_000]
+    start = time.perf_counter()
+    for pair in sample:
+        index.risk(pair)
+    print(f"single lookup: {(time.perf_counter() - start) / len(sample) * 1e6:.2f} us")
+
+    rng = np.random.default_rng(42)
+    batch = pd.DataFrame({"currency_pair": pairs.to_numpy()[rng.integers(0, len(pairs), args.rows)]})
+    start = time.perf_counter()
+    joined = index.join(batch["currency_pair"])
+    join_seconds = time.perf_counter() - start
+
+    lookup = index.table()[["currency_pair", "corridor_risk"]]
+    start = time.perf_counter()
+    merged = batch.merge(lookup, on="currency_pair", how="left")["corridor_risk"].fillna(DEFAULT_RISK)
+    merge_seconds = time.perf_counter() - start
+    assert np.array_equal(joined, merged.to_numpy())
+    print(f"batch join ({args.rows:,} rows): {join_seconds * 1e3:.1f} ms   pandas merge: {merge_seconds * 1e3:.1f} ms")
+
+    start = time.perf_counter()
+    index.update(batch["currency_pair"].to_numpy()[:100_000], rng.random(100_000) < 0.09)
+    print(f"incremental update (100,000 labels): {(time.perf_counter() - start) * 1e3:.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
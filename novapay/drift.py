@@ -0,0 +1,306 @@
+"""Streaming drift monitor over the model's input features.
+
+Each feature gets a fixed-size histogram: numeric features use bins cut at the
+training quantiles, categorical features one bin per training category plus an
+``__other__`` bin. ``update`` adds scored rows to the live histograms with a
+handful of vectorized NumPy operations, so memory is O(bins) per feature no
+matter how many transactions are seen. Older traffic is forgotten
+exponentially (``half_life`` transactions) so the monitor tracks the recent
+input distribution rather than everything since startup.
+
+PSI and a binned Kolmogorov-Smirnov statistic are read off the live and
+training histograms on demand.
+
+Benchmark / drift simulation:
+    python -m novapay.drift --shift ip_risk_score=0.2
+"""
+import argparse
+import json
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+from novapay.features import CATEGORICAL_COLUMNS, NUMERIC_COLUMNS, load_labelled_frame, train_holdout_split
+
+TRAINING_PATH = "Data/Nova_CleanedEDA_df.csv"
+STATE_PATH = "Data/drift_state.npz"
+OTHER = "__other__"
+
+# Conventional PSI bands
+PSI_MODERATE = 0.1
+PSI_SIGNIFICANT = 0.25
+
+# PSI on a handful of transactions is noise; report status only after this many
+MIN_SAMPLES = 200
+
+# Rescale accumulated weights before they overflow
+_MAX_WEIGHT = 1e100
+
+
+def psi(reference, live, eps=1e-4):
+    """Population stability index between two histograms"""
+    p = np.maximum(reference / max(reference.sum(), eps), eps)
+    q = np.maximum(live / max(live.sum(), eps), eps)
+    return float(np.sum((q - p) * np.log(q / p)))
+
+
+def binned_ks(reference, live):
+    """Largest gap between the two cumulative distributions at the bin edges"""
+    if live.sum() == 0 or reference.sum() == 0:
+        return 0.0
+    return float(np.max(np.abs(np.cumsum(reference) / reference.sum() - np.cumsum(live) / live.sum())))
+
+
+def drift_status(value):
+    if value >= PSI_SIGNIFICANT:
+        return "significant"
+    if value >= PSI_MODERATE:
+        return "moderate"
+    return "stable"
+
+
+class DriftMonitor:
+    """Fixed-size live histograms per feature compared against training histograms"""
+
+    def __init__(self, numeric_edges, categories, reference_counts, half_life=5000):
+        self.numeric_columns = list(numeric_edges)
+        self.categorical_columns = list(categories)
+        self.categories = {c: list(v) for c, v in categories.items()}
+        self.half_life = half_life
+
+        # All numeric edges in one (features, bins - 1) matrix padded with +inf,
+        # so one comparison bins every numeric feature of every row at once
+        self.n_numeric_bins = max(len(e) for e in numeric_edges.values()) + 1
+        self.edges = np.full((len(self.numeric_columns), self.n_numeric_bins - 1), np.inf)
+        for i, column in enumerate(self.numeric_columns):
+            self.edges[i, :len(numeric_edges[column])] = numeric_edges[column]
+        self.numeric_edges = {c: np.asarray(e, dtype=float) for c, e in numeric_edges.items()}
+
+        self.codes = {c: {v: i for i, v in enumerate(cats)} for c, cats in self.categories.items()}
+        self.reference = {c: np.asarray(v, dtype=float) for c, v in reference_counts.items()}
+
+        self._position_cache = {}
+        self._lock = threading.Lock()
+        self.reset()
+
+    @classmethod
+    def from_frame(cls, X, bins=20, half_life=5000):
+        """Build training reference histograms from a model-ready frame"""
+        numeric_edges = {}
+        categories = {}
+        reference = {}
+        quantiles = np.linspace(0, 1, bins + 1)[1:-1]
+        for column in NUMERIC_COLUMNS:
+            values = X[column].to_numpy(dtype=float)
+            edges = np.unique(np.quantile(values, quantiles))
+            numeric_edges[column] = edges
+            reference[column] = np.bincount(np.searchsorted(edges, values, side="left"),
+                                            minlength=len(edges) + 1)
+        for column in CATEGORICAL_COLUMNS:
+            counts = X[column].astype(str).value_counts()
+            categories[column] = list(counts.index) + [OTHER]
+            reference[column] = np.append(counts.to_numpy(), 0)
+        return cls(numeric_edges, categories, reference, half_life)
+
+    @classmethod
+    def from_training(cls, path=TRAINING_PATH, bins=20, half_life=5000):
+        """Reference histograms from the rows the model was trained on"""
+        X, y = load_labelled_frame(path)
+        X_train, _, _, _ = train_holdout_split(X, y)
+        return cls.from_frame(X_train, bins, half_life)
+
+    def reset(self):
+        """Forget all live traffic"""
+        with self._lock:
+            self.numeric_counts = np.zeros((len(self.numeric_columns), self.n_numeric_bins))
+            self.categorical_counts = {c: np.zeros(len(cats)) for c, cats in self.categories.items()}
+            self.seen = 0
+            self._weight = 1.0
+            self._decay = 2.0 ** (1.0 / self.half_life) if self.half_life else 1.0
+
+    def _positions(self, columns):
+        """Column positions of the monitored features, cached per column layout"""
+        key = tuple(columns)
+        positions = self._position_cache.get(key)
+        if positions is None:
+            positions = (columns.get_indexer(self.numeric_columns), columns.get_indexer(self.categorical_columns))
+            if (positions[0] < 0).any() or (positions[1] < 0).any():
+                missing = [c for c in self.numeric_columns + self.categorical_columns if c not in columns]
+                raise KeyError(f"Missing monitored columns: {missing}")
+            self._position_cache[key] = positions
+        return positions
+
+    def update(self, X):
+        """Add scored rows to the live histograms"""
+        n = len(X)
+        if n == 0:
+            return
+        # One conversion of the whole frame is much cheaper than per-column access for small batches
+        values = X.to_numpy()
+        numeric_positions, categorical_positions = self._positions(X.columns)
+        numeric = values[:, numeric_positions].astype(float)
+        numeric_bins = (numeric[:, :, None] > self.edges[None, :, :]).sum(axis=2)
+        categorical = {}
+        for column, position in zip(self.categorical_columns, categorical_positions):
+            codes = self.codes[column]
+            other = len(codes) - 1
+            categorical[column] = [codes.get(str(v), other) for v in values[:, position]]
+
+        with self._lock:
+            # Newer rows get exponentially larger weights instead of decaying every count
+            weights = self._weight * self._decay ** np.arange(n)
+            self._weight *= self._decay ** n
+
+            offsets = np.arange(len(self.numeric_columns)) * self.n_numeric_bins
+            flat = (numeric_bins + offsets[None, :]).ravel()
+            self.numeric_counts += np.bincount(
+                flat, weights=np.repeat(weights, len(self.numeric_columns)),
+                minlength=self.numeric_counts.size,
+            ).reshape(self.numeric_counts.shape)
+            for column, codes in categorical.items():
+                counts = self.categorical_counts[column]
+                counts += np.bincount(codes, weights=weights, minlength=len(counts))
+
+            self.seen += n
+            if self._weight > _MAX_WEIGHT:
+                self._rescale()
+
+    def _rescale(self):
+        scale = 1.0 / self._weight
+        self.numeric_counts *= scale
+        for counts in self.categorical_counts.values():
+            counts *= scale
+        self._weight = 1.0
+
+    def live_counts(self, column):
+        with self._lock:
+            if column in self.categorical_counts:
+                counts = self.categorical_counts[column].copy()
+            else:
+                i = self.numeric_columns.index(column)
+                counts = self.numeric_counts[i, :len(self.numeric_edges[column]) + 1].copy()
+            return counts / self._weight
+
+    def report(self, min_samples=MIN_SAMPLES):
+        """PSI / KS per feature, most drifted first"""
+        warming_up = self.seen < min_samples
+        rows = []
+        for column in self.numeric_columns + self.categorical_columns:
+            live = self.live_counts(column)
+            reference = self.reference[column]
+            is_numeric = column in self.numeric_edges
+            value = psi(reference, live) if live.sum() > 0 else 0.0
+            rows.append({
+                "feature": column,
+                "kind": "numeric" if is_numeric else "categorical",
+                "psi": value,
+                # KS needs an ordering, so it is only defined for numeric features
+                "ks": binned_ks(reference, live) if is_numeric else np.nan,
+                "status": "no data" if self.seen == 0 else "warming up" if warming_up else drift_status(value),
+            })
+        return pd.DataFrame(rows).sort_values("psi", ascending=False, ignore_index=True)
+
+    def distribution(self, column):
+        """Reference vs live bin shares for one feature, for plotting"""
+        reference = self.reference[column]
+        live = self.live_counts(column)
+        if column in self.numeric_edges:
+            edges = self.numeric_edges[column]
+            lower = np.concatenate([[-np.inf], edges])
+            upper = np.concatenate([edges, [np.inf]])
+            labels = [f"({lo:.4g}, {hi:.4g}]" for lo, hi in zip(lower, upper)]
+        else:
+            labels = self.categories[column]
+        return pd.DataFrame({
+            "bin": labels,
+            "training": reference / max(reference.sum(), 1e-12),
+            "live": live / max(live.sum(), 1e-12),
+        })
+
+    def save(self, path=STATE_PATH):
+        """Persist reference and live histograms (a few KB)"""
+        with self._lock:
+            meta = {
+                "numeric_columns": self.numeric_columns,
+                "categories": self.categories,
+                "half_life": self.half_life,
+                "seen": self.seen,
+            }
+            arrays = {f"edges__{c}": e for c, e in self.numeric_edges.items()}
+            arrays.update({f"reference__{c}": r for c, r in self.reference.items()})
+            arrays.update({f"live_categorical__{c}": v / self._weight for c, v in self.categorical_counts.items()})
+            np.savez(path, meta=json.dumps(meta), live_numeric=self.numeric_counts / self._weight, **arrays)
+
+    @classmethod
+    def load(cls, path=STATE_PATH):
+        with np.load(path) as data:
+            meta = json.loads(str(data["meta"]))
+            numeric_edges = {c: data[f"edges__{c}"] for c in meta["numeric_columns"]}
+            reference = {c: data[f"reference__{c}"] for c in meta["numeric_columns"] + list(meta["categories"])}
+            monitor = cls(numeric_edges, meta["categories"], reference, meta["half_life"])
+            monitor.numeric_counts = data["live_numeric"].copy()
+            for c in meta["categories"]:
+                monitor.categorical_counts[c] = data[f"live_categorical__{c}"].copy()
+            monitor.seen = meta["seen"]
+        return monitor
+
+
+_shared = None
+_shared_lock = threading.Lock()
+
+
+def shared_monitor(path=TRAINING_PATH):
+    """One monitor per process, shared by the app and the diagnostics page"""
+    global _shared
+    with _shared_lock:
+        if _shared is None:
+            _shared = DriftMonitor.from_training(path)
+        return _shared
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure drift monitor overhead and simulate drift")
+    parser.add_argument("--data", default=TRAINING_PATH)
+    parser.add_argument("--rows", type=int, default=20_000)
+    parser.add_argument("--shift", action="append", default=[],
+                        help="feature=delta added to a numeric feature of the simulated live traffic")
+    parser.add_argument("--save", default=None, help="Optional path for the resulting monitor state (.npz)")
+    args = parser.parse_args()
+
+    X, y = load_labelled_frame(args.data)
+    X_train, X_test, _, _ = train_holdout_split(X, y)
+    monitor = DriftMonitor.from_frame(X_train)
+
+    rng = np.random.default_rng(42)
+    live = X_test.iloc[rng.integers(0, len(X_test), args.rows)].reset_index(drop=True)
+    for spec in args.shift:
+        column, delta = spec.split("=")
+        live[column] = live[column] + float(delta)
+
+    # Per-transaction overhead, as the app calls it
+    timings = []
+    for i in range(2000):
+        row = live.iloc[[i]]
+        start = time.perf_counter()
+        monitor.update(row)
+        timings.append(time.perf_counter() - start)
+    timings = np.array(timings) * 1e6
+    print(f"single-row update: p50 {np.percentile(timings, 50):.1f} us  p99 {np.percentile(timings, 99):.1f} us")
+
+    monitor.reset()
+    start = time.perf_counter()
+    for offset in range(0, len(live), 256):
+        monitor.update(live.iloc[offset:offset + 256])
+    elapsed = time.perf_counter() - start
+    print(f"batched update: {len(live) / elapsed:,.0f} rows/s\n")
+
+    pd.set_option("display.width", 200)
+    print(monitor.report().head(15).to_string(index=False, float_format=lambda v: f"{v:.4f}"))
+    if args.save:
+        monitor.save(args.save)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,130 @@
+"""Early-exit random forest evaluation.
+
+Trees are evaluated in chunks. After each chunk the running vote sum bounds the
+final forest probability, and a transaction stops as soon as the trees that are
+still to come cannot move it across the decision threshold. With ``delta`` set,
+a Hoeffding bound on the mean of the remaining trees is used as well, so rows
+whose decision is very unlikely (probability < delta) to flip also stop early.
+
+Benchmark:
+    python -m novapay.early_exit --model Model/rf_fraud_pipeline.pkl
+"""
+import argparse
+import time
+
+import joblib
+import numpy as np
+
+from novapay.features import load_labelled_frame
+
+DEFAULT_CHUNK_SIZE = 25
+
+
+def transform_for_trees(model, X):
+    """Preprocess X and return the float32 matrix the fitted trees expect"""
+    X_trans = model.named_steps["preprocess"].transform(X)
+    return np.ascontiguousarray(X_trans, dtype=np.float32)
+
+
+def predict_early_exit(model, X, threshold=0.5, chunk_size=DEFAULT_CHUNK_SIZE, delta=None):
+    """Score X with early exit; returns a dict of per-row arrays.
+
+    ``decision`` is 1 (DECLINE) when the forest probability is above
+    ``threshold``, matching ``model.predict`` at the default of 0.5.
+    ``probability_lower``/``probability_upper`` bound the full-forest
+    probability (the statistical bound only holds with probability 1 - delta).
+    """
+    rf = model.named_steps["model"]
+    X_trans = transform_for_trees(model, X)
+    return _early_exit_from_transformed(rf, X_trans, threshold, chunk_size, delta)
+
+
+def _early_exit_from_transformed(rf, X_trans, threshold, chunk_size, delta):
+    trees = rf.estimators_
+    n_trees = len(trees)
+    fraud_idx = int(np.flatnonzero(rf.classes_ == 1)[0])
+    n_rows = X_trans.shape[0]
+
+    vote_sum = np.zeros(n_rows)
+    trees_evaluated = np.zeros(n_rows, dtype=np.int64)
+    lower = np.zeros(n_rows)
+    upper = np.ones(n_rows)
+    active = np.arange(n_rows)
+
+    for start in range(0, n_trees, chunk_size):
+        X_active = X_trans[active]
+        for tree in trees[start:start + chunk_size]:
+            vote_sum[active] += tree.predict_proba(X_active, check_input=False)[:, fraud_idx]
+
+        done = min(start + chunk_size, n_trees)
+        remaining = n_trees - done
+        trees_evaluated[active] = done
+        partial = vote_sum[active]
+
+        # Hard bounds: every remaining tree votes 0 or every remaining tree votes 1
+        lo = partial / n_trees
+        hi = (partial + remaining) / n_trees
+
+        # Statistical bound on the mean vote of the remaining trees
+        if delta is not None and remaining > 0:
+            eps = np.sqrt(np.log(2.0 / delta) / (2.0 * done))
+            mean = partial / done
+            lo = np.maximum(lo, (partial + remaining * np.clip(mean - eps, 0.0, 1.0)) / n_trees)
+            hi = np.minimum(hi, (partial + remaining * np.clip(mean + eps, 0.0, 1.0)) / n_trees)
+
+        lower[active] = lo
+        upper[active] = hi
+
+        settled = (lo > threshold) | (hi <= threshold)
+        active = active[~settled]
+        if active.size == 0:
+            break
+
+    # Point estimate: mean vote of the trees actually evaluated
+    probability = vote_sum / trees_evaluated
+    decision = lower > threshold
+
+    return {
+        "fraud_probability": probability,
+        "probability_lower": lower,
+        "probability_upper": upper,
+        "decision": decision.astype(int),
+        "trees_evaluated": trees_evaluated,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark early-exit forest evaluation")
+    parser.add_argument("--model", default="Model/rf_fraud_pipeline.pkl")
+    parser.add_argument("--data", default="Data/Nova_CleanedEDA_df.csv")
+    parser.add_argument("--threshold", type=float, default=0.5)
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE)
+    parser.add_argument("--delta", type=float, default=1e-3)
+    args = parser.parse_args()
+
+    model = joblib.load(args.model)
+    X, _ = load_labelled_frame(args.data)
+    n_trees = len(model.named_steps["model"].estimators_)
+
+    start = time.perf_counter()
+    full_prob = model.predict_proba(X)[:, 1]
+    full_time = time.perf_counter() - start
+    full_decision = (full_prob > args.threshold).astype(int)
+
+    print(f"Rows: {len(X)}  Trees: {n_trees}  Threshold: {args.threshold}")
+    print(f"Full forest: {full_time:.3f}s")
+    for delta in (None, args.delta):
+        start = time.perf_counter()
+        result = predict_early_exit(model, X, args.threshold, args.chunk_size, delta)
+        elapsed = time.perf_counter() - start
+        label = "exact" if delta is None else f"hoeffding delta={delta:g}"
+        agreement = (result["decision"] == full_decision).mean()
+        print(
+            f"Early exit ({label}): {elapsed:.3f}s  "
+            f"avg trees/txn {result['trees_evaluated'].mean():.1f}  "
+            f"decision agreement {agreement:.4%}"
+        )
+
+
+if __name__ == "__main__":
+    main()
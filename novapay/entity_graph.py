@@ -0,0 +1,307 @@
+"""Entity-link graph over customers, devices and IP addresses.
+
+Every transaction links its customer to its device and its IP address.
+Connected components of that graph are the candidate rings: many customers
+sharing a device or an IP end up in one component. Components are kept in a
+union-find (``parent`` array with path halving and union by size), and each
+root carries per-component counters (customers, devices, IPs, transactions,
+frauds), so component lookups are near-constant time.
+
+Bulk construction factorizes the ID columns and labels components with
+``scipy.sparse.csgraph.connected_components`` in one pass; afterwards
+``add_transactions`` links new transactions incrementally.
+
+Usage:
+    python -m novapay.entity_graph build
+    python -m novapay.entity_graph bench --entities 3000000
+"""
+import argparse
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+from scipy import sparse
+from scipy.sparse.csgraph import connected_components
+
+from novapay.replay import RAW_PATHS, load_history
+
+GRAPH_PATH = "Data/entity_graph.npz"
+ENTITY_TYPES = ["customer", "device", "ip"]
+COUNTERS = ["customers", "devices", "ips", "transactions", "frauds"]
+
+# Node ids and counters; int32 halves memory and still allows ~2 billion entities
+INDEX_DTYPE = np.int32
+
+
+def _missing(key):
+    return key is None or (isinstance(key, float) and np.isnan(key))
+
+
+class EntityGraph:
+    """Union-find over customer / device / IP nodes with per-component counters"""
+
+    def __init__(self, capacity=1024):
+        self.ids = {kind: {} for kind in ENTITY_TYPES}
+        self.parent = np.arange(capacity, dtype=INDEX_DTYPE)
+        self.counts = {name: np.zeros(capacity, dtype=INDEX_DTYPE) for name in COUNTERS}
+        self.n_nodes = 0
+
+    # -- node management ---------------------------------------------------
+
+    def _grow(self, needed):
+        capacity = len(self.parent)
+        if needed <= capacity:
+            return
+        new_capacity = max(needed, capacity * 2)
+        self.parent = np.concatenate([self.parent, np.arange(capacity, new_capacity, dtype=INDEX_DTYPE)])
+        for name in COUNTERS:
+            self.counts[name] = np.concatenate([self.counts[name], np.zeros(new_capacity - capacity, dtype=INDEX_DTYPE)])
+
+    def _node(self, kind, key):
+        ids = self.ids[kind]
+        node = ids.get(key)
+        if node is None:
+            node = self.n_nodes
+            self._grow(node + 1)
+            ids[key] = node
+            self.n_nodes += 1
+            self.counts[kind + "s"][node] = 1
+        return node
+
+    # -- union-find --------------------------------------------------------
+
+    def find(self, node):
+        parent = self.parent
+        node = int(node)
+        while True:
+            up = int(parent[node])
+            if up == node:
+                return node
+            parent[node] = parent[up]  # path halving
+            node = up
+
+    def union(self, a, b):
+        a, b = self.find(a), self.find(b)
+        if a == b:
+            return a
+        if self.counts["customers"][a] + self.counts["devices"][a] + self.counts["ips"][a] < \
+                self.counts["customers"][b] + self.counts["devices"][b] + self.counts["ips"][b]:
+            a, b = b, a
+        self.parent[b] = a
+        for counts in self.counts.values():
+            counts[a] += counts[b]
+        return a
+
+    # -- building ----------------------------------------------------------
+
+    @classmethod
+    def from_transactions(cls, df):
+        """Bulk-build from a frame with customer_id, device_id, ip_address (and optional is_fraud)"""
+        graph = cls(capacity=1)
+        codes = []
+        offset = 0
+        for kind, column in zip(ENTITY_TYPES, ["customer_id", "device_id", "ip_address"]):
+            # Missing IDs (e.g. no IP captured) get code -1 and link nothing
+            code, uniques = pd.factorize(df[column].to_numpy())
+            graph.ids[kind] = dict(zip(uniques.astype(str).tolist(), range(offset, offset + len(uniques))))
+            codes.append(np.where(code >= 0, code + offset, -1))
+            offset += len(uniques)
+        n = offset
+        customer, device, ip = codes
+        if (customer < 0).any():
+            raise ValueError("customer_id must not be missing")
+
+        # Components in one pass over the customer-device and customer-ip edges
+        linked_device, linked_ip = device >= 0, ip >= 0
+        rows = np.concatenate([customer[linked_device], customer[linked_ip]])
+        cols = np.concatenate([device[linked_device], ip[linked_ip]])
+        adjacency = sparse.coo_matrix((np.ones(len(rows), dtype=np.int8), (rows, cols)), shape=(n, n))
+        n_components, labels = connected_components(adjacency, directed=False)
+
+        # Point every node straight at one representative node of its component
+        representative = np.full(n_components, -1, dtype=INDEX_DTYPE)
+        representative[labels[::-1]] = np.arange(n - 1, -1, -1)
+        graph.parent = representative[labels]
+        graph.n_nodes = n
+
+        kinds = np.repeat(np.arange(3), [len(graph.ids[k]) for k in ENTITY_TYPES])
+        roots = graph.parent
+        graph.counts = {
+            name: np.bincount(roots[kinds == i], minlength=n).astype(INDEX_DTYPE)
+            for i, name in enumerate(["customers", "devices", "ips"])
+        }
+        graph.counts["transactions"] = np.bincount(roots[customer], minlength=n).astype(INDEX_DTYPE)
+        fraud = df["is_fraud"].to_numpy(dtype=bool) if "is_fraud" in df.columns else np.zeros(len(df), dtype=bool)
+        graph.counts["frauds"] = np.bincount(roots[customer[fraud]], minlength=n).astype(INDEX_DTYPE)
+        return graph
+
+    def add_transactions(self, customer_ids, device_ids, ip_addresses, is_fraud=None):
+        """Link new transactions into the graph"""
+        if is_fraud is None:
+            is_fraud = np.zeros(len(customer_ids), dtype=bool)
+        for customer, device, ip, fraud in zip(customer_ids, device_ids, ip_addresses, is_fraud):
+            root = self._node("customer", str(customer))
+            for kind, key in [("device", device), ("ip", ip)]:
+                if not _missing(key):
+                    root = self.union(root, self._node(kind, str(key)))
+            self.counts["transactions"][root] += 1
+            self.counts["frauds"][root] += int(fraud)
+
+    def mark_fraud(self, customer_ids):
+        """Record late fraud labels (e.g. chargebacks) for known customers"""
+        for customer in customer_ids:
+            node = self.ids["customer"].get(str(customer))
+            if node is not None:
+                self.counts["frauds"][self.find(node)] += 1
+
+    # -- scoring-time lookups ---------------------------------------------
+
+    def component(self, customer_id=None, device_id=None, ip_address=None):
+        """Counters of the component the given entities would form together (read-only)"""
+        roots = set()
+        for kind, key in zip(ENTITY_TYPES, [customer_id, device_id, ip_address]):
+            if not _missing(key):
+                node = self.ids[kind].get(str(key))
+                if node is not None:
+                    roots.add(self.find(node))
+        totals = dict.fromkeys(COUNTERS, 0)
+        for root in roots:
+            for name in COUNTERS:
+                totals[name] += int(self.counts[name][root])
+        return totals
+
+    def lookup(self, customer_ids, device_ids, ip_addresses=None):
+        """Component counters for a batch of transactions, as a DataFrame"""
+        if ip_addresses is None:
+            ip_addresses = [None] * len(customer_ids)
+        rows = [self.component(c, d, i) for c, d, i in zip(customer_ids, device_ids, ip_addresses)]
+        return pd.DataFrame(rows, columns=COUNTERS).add_prefix("ring_")
+
+    def n_components(self):
+        nodes = np.arange(self.n_nodes)
+        return int((self.parent[:self.n_nodes] == nodes).sum())
+
+    def largest_components(self, n=10):
+        """The biggest components by number of customers, then transactions"""
+        roots = np.flatnonzero(self.parent[:self.n_nodes] == np.arange(self.n_nodes))
+        order = roots[np.lexsort((-self.counts["transactions"][roots], -self.counts["customers"][roots]))[:n]]
+        return pd.DataFrame({name: self.counts[name][order] for name in COUNTERS})
+
+    # -- persistence -------------------------------------------------------
+
+    def flatten(self):
+        """Point every node directly at its root (vectorized pointer jumping)"""
+        parent = self.parent[:self.n_nodes]
+        while True:
+            grandparent = parent[parent]
+            if np.array_equal(grandparent, parent):
+                break
+            parent = grandparent
+        self.parent[:self.n_nodes] = parent
+
+    def save(self, path=GRAPH_PATH):
+        self.flatten()
+        n = self.n_nodes
+        arrays = {"parent": self.parent[:n]}
+        for kind in ENTITY_TYPES:
+            ids = self.ids[kind]
+            arrays[f"keys_{kind}"] = np.array(list(ids), dtype=str)
+            arrays[f"nodes_{kind}"] = np.fromiter(ids.values(), INDEX_DTYPE, len(ids))
+        arrays.update({f"count_{name}": self.counts[name][:n] for name in COUNTERS})
+        np.savez_compressed(path, **arrays)
+
+    @classmethod
+    def load(cls, path=GRAPH_PATH):
+        graph = cls(capacity=1)
+        with np.load(path) as data:
+            graph.parent = data["parent"].copy()
+            graph.n_nodes = len(graph.parent)
+            for kind in ENTITY_TYPES:
+                graph.ids[kind] = dict(zip(data[f"keys_{kind}"].tolist(), data[f"nodes_{kind}"].tolist()))
+            graph.counts = {name: data[f"count_{name}"].copy() for name in COUNTERS}
+        return graph
+
+    def memory_bytes(self):
+        """Approximate bytes held by the union-find arrays and by the ID -> node dicts"""
+        arrays = self.parent.nbytes + sum(c.nbytes for c in self.counts.values())
+        keys = sum(sys.getsizeof(ids) + sum(sys.getsizeof(k) for k in ids) for ids in self.ids.values())
+        return {"arrays": arrays, "keys": keys}
+
+
+def synthetic_transactions(n_transactions, n_customers, n_devices, n_ips, shared_rate=0.01, fraud_rate=0.02,
+                           seed=42):
+    """Random transactions for benchmarks: customers mostly keep to their own devices
+    and IPs, and ``shared_rate`` of transactions use a random one (the links rings form on)"""
+    rng = np.random.default_rng(seed)
+    customer = rng.integers(0, n_customers, n_transactions)
+    columns = {"customer_id": np.char.add("c", customer.astype(str))}
+    for column, prefix, n in [("device_id", "d", n_devices), ("ip_address", "i", n_ips)]:
+        entity = customer * n // n_customers
+        shared = rng.random(n_transactions) < shared_rate
+        entity[shared] = rng.integers(0, n, int(shared.sum()))
+        columns[column] = np.char.add(prefix, entity.astype(str))
+    columns["is_fraud"] = rng.random(n_transactions) < fraud_rate
+    return pd.DataFrame(columns)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Customer / device / IP link graph")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    build = sub.add_parser("build", help="Bulk-build the graph from the raw transaction CSVs")
+    build.add_argument("--data", nargs="+", default=RAW_PATHS)
+    build.add_argument("--output", default=GRAPH_PATH)
+
+    bench = sub.add_parser("bench", help="Build time, memory and lookup speed on synthetic data")
+    bench.add_argument("--entities", type=int, default=3_000_000, help="Total customers + devices + IPs")
+    bench.add_argument("--lookups", type=int, default=100_000)
+    bench.add_argument("--shared-rate", type=float, default=0.01,
+                       help="Share of transactions on a random (shared) device / IP")
+    args = parser.parse_args()
+
+    if args.command == "build":
+        # Cleaned and deduplicated like the other history consumers, so rows repeated across the CSVs count once
+        df = load_history(args.data)
+        start = time.perf_counter()
+        graph = EntityGraph.from_transactions(df)
+        graph.save(args.output)
+        print(f"{len(df)} transactions -> {graph.n_nodes} entities in {graph.n_components()} components "
+              f"({time.perf_counter() - start:.2f}s) -> {args.output}")
+        print("Largest components:")
+        print(graph.largest_components().to_string(index=False))
+        return
+
+    # Half customers, a quarter devices (2 customers each), a quarter IPs; 3 transactions per customer
+    n_customers = args.entities // 2
+    n_devices = args.entities // 4
+    n_ips = args.entities - n_customers - n_devices
+    df = synthetic_transactions(n_customers * 3, n_customers, n_devices, n_ips, args.shared_rate)
+
+    start = time.perf_counter()
+    graph = EntityGraph.from_transactions(df)
+    build_s = time.perf_counter() - start
+    print(f"bulk build: {len(df):,} transactions, {graph.n_nodes:,} entities, "
+          f"{graph.n_components():,} components in {build_s:.2f}s")
+    print(f"largest component: {graph.largest_components(1).iloc[0].to_dict()}")
+    memory = graph.memory_bytes()
+    print(f"index memory: {sum(memory.values()) / 1e6:.0f} MB ({sum(memory.values()) / graph.n_nodes:.0f} bytes/entity; "
+          f"arrays {memory['arrays'] / 1e6:.0f} MB, key dicts {memory['keys'] / 1e6:.0f} MB)")
+
+    rng = np.random.default_rng(0)
+    sample = df.iloc[rng.integers(0, len(df), args.lookups)]
+    start = time.perf_counter()
+    for c, d, i in zip(sample["customer_id"], sample["device_id"], sample["ip_address"]):
+        graph.component(c, d, i)
+    elapsed = time.perf_counter() - start
+    print(f"component lookups: {args.lookups / elapsed:,.0f}/s ({elapsed / args.lookups * 1e6:.1f} us each)")
+
+    new = synthetic_transactions(args.lookups, n_customers * 2, n_devices * 2, n_ips * 2, args.shared_rate, seed=7)
+    start = time.perf_counter()
+    graph.add_transactions(new["customer_id"], new["device_id"], new["ip_address"], new["is_fraud"])
+    elapsed = time.perf_counter() - start
+    print(f"incremental adds: {len(new) / elapsed:,.0f} transactions/s, now {graph.n_nodes:,} entities")
+
+
+if __name__ == "__main__":
+    main()
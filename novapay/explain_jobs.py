@@ -0,0 +1,220 @@
+"""Background SHAP explanation jobs.
+
+Exact TreeSHAP over 500 trees is far slower than the prediction itself, so
+explanations run on a small worker pool. ``ExplanationPool.submit`` returns an
+``ExplanationHandle`` at once; the decision is shown straight away and the
+explanation panel is filled in from ``handle.result()`` when the job is done.
+
+The pool holds at most ``max_queue`` unfinished jobs. Past that ``submit``
+raises ``PoolFull`` (or waits up to ``block_seconds`` for a slot), so a burst
+of declines cannot pile up unbounded SHAP work behind the decisions.
+
+Benchmark:
+    python -m novapay.explain_jobs --jobs 200 --workers 2 --max-queue 16
+"""
+import argparse
+import itertools
+import threading
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from novapay.features import load_labelled_frame
+from novapay.scoring import MODEL_PATH, load_pipeline
+
+try:
+    import shap
+    SHAP_AVAILABLE = True
+except ImportError:
+    SHAP_AVAILABLE = False
+
+
+class PoolFull(Exception):
+    """Raised when the explanation queue is at capacity"""
+
+
+def shap_top_reasons(model, explainer, X_row, feature_names, top_k=8):
+    """Top SHAP reasons for the fraud class (class 1) of a single row"""
+    # Transform input row exactly as the model sees it
+    X_row_trans = model.named_steps["preprocess"].transform(X_row)
+    exp = explainer(X_row_trans)
+
+    # SHAP values and base value for the fraud class
+    shap_vals = exp.values[0, :, 1]
+    base_val = exp.base_values[0, 1]
+    proba = model.predict_proba(X_row)[0, 1]
+
+    idx = np.argsort(np.abs(shap_vals))[::-1][:top_k]
+    return {
+        "fraud_probability": float(proba),
+        "base_value": float(base_val),
+        "top_reasons": [{"feature": feature_names[j], "shap_value": float(shap_vals[j])} for j in idx],
+        # Full fraud-class vector, for the running segment aggregates (novapay.shap_aggregates)
+        "shap_values": shap_vals,
+    }
+
+
+class ExplanationHandle:
+    """A submitted explanation job; poll ``done()`` or wait on ``result()``"""
+
+    def __init__(self, job_id):
+        self.id = job_id
+        self.submitted_at = time.perf_counter()
+        self.started_at = None
+        self.finished_at = None
+        self.future = None
+
+    @property
+    def status(self):
+        if self.future.done():
+            return "failed" if self.future.exception() is not None else "done"
+        return "running" if self.started_at is not None else "queued"
+
+    def done(self):
+        return self.future.done()
+
+    def result(self, timeout=None):
+        """The explanation payload (raises the job's exception if it failed)"""
+        return self.future.result(timeout)
+
+    def add_done_callback(self, fn):
+        """Call fn(handle) from the worker once the job has finished"""
+        self.future.add_done_callback(lambda _: fn(self))
+
+    @property
+    def queue_wait(self):
+        return None if self.started_at is None else self.started_at - self.submitted_at
+
+    @property
+    def compute_time(self):
+        return None if self.finished_at is None else self.finished_at - self.started_at
+
+
+class ExplanationPool:
+    """Bounded worker pool for SHAP explanations with queue-wait / compute metrics"""
+
+    def __init__(self, max_workers=2, max_queue=32, keep_handles=256):
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self.keep_handles = keep_handles
+        self.submitted = 0
+        self.completed = 0
+        self.failed = 0
+        self.rejected = 0
+        self.queue_waits = deque(maxlen=10000)
+        self.compute_times = deque(maxlen=10000)
+        self._slots = threading.BoundedSemaphore(max_queue)
+        self._ids = itertools.count(1)
+        self._handles = OrderedDict()
+        self._lock = threading.Lock()
+        self._pool = ThreadPoolExecutor(max_workers, thread_name_prefix="explain")
+
+    def submit(self, model, explainer, X_row, feature_names, top_k=8, block_seconds=0.0):
+        """Queue one explanation; raises PoolFull when no slot frees up in time"""
+        acquired = (
+            self._slots.acquire(timeout=block_seconds) if block_seconds > 0 else self._slots.acquire(blocking=False)
+        )
+        if not acquired:
+            with self._lock:
+                self.rejected += 1
+            raise PoolFull(f"{self.max_queue} explanations already queued")
+
+        handle = ExplanationHandle(next(self._ids))
+        with self._lock:
+            self.submitted += 1
+            self._handles[handle.id] = handle
+            while len(self._handles) > self.keep_handles:
+                self._handles.popitem(last=False)
+        handle.future = self._pool.submit(self._run, handle, model, explainer, X_row, feature_names, top_k)
+        return handle
+
+    def _run(self, handle, model, explainer, X_row, feature_names, top_k):
+        handle.started_at = time.perf_counter()
+        succeeded = False
+        try:
+            result = shap_top_reasons(model, explainer, X_row, feature_names, top_k)
+            succeeded = True
+            return result
+        finally:
+            handle.finished_at = time.perf_counter()
+            with self._lock:
+                if succeeded:
+                    self.completed += 1
+                else:
+                    self.failed += 1
+                self.queue_waits.append(handle.queue_wait)
+                self.compute_times.append(handle.compute_time)
+            self._slots.release()
+
+    def get(self, job_id):
+        """Look up a recent handle by id (e.g. one stored in session state)"""
+        with self._lock:
+            return self._handles.get(job_id)
+
+    def stats(self):
+        with self._lock:
+            waits = np.array(self.queue_waits) * 1e3
+            computes = np.array(self.compute_times) * 1e3
+            in_flight = self.submitted - self.completed - self.failed
+            return {
+                "submitted": self.submitted,
+                "completed": self.completed,
+                "failed": self.failed,
+                "rejected": self.rejected,
+                "in_flight": in_flight,
+                "queue_wait_p50_ms": float(np.percentile(waits, 50)) if len(waits) else None,
+                "queue_wait_p99_ms": float(np.percentile(waits, 99)) if len(waits) else None,
+                "compute_p50_ms": float(np.percentile(computes, 50)) if len(computes) else None,
+                "compute_p99_ms": float(np.percentile(computes, 99)) if len(computes) else None,
+            }
+
+    def close(self, wait=True):
+        self._pool.shutdown(wait=wait)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load-test background SHAP explanations")
+    parser.add_argument("--model", default=MODEL_PATH)
+    parser.add_argument("--data", default="Data/Nova_CleanedEDA_df.csv")
+    parser.add_argument("--jobs", type=int, default=200)
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--max-queue", type=int, default=16)
+    parser.add_argument("--interval-ms", type=float, default=5.0, help="Gap between submitted declines")
+    args = parser.parse_args()
+
+    if not SHAP_AVAILABLE:
+        parser.error("shap is not installed")
+    model = load_pipeline(args.model)
+    explainer = shap.TreeExplainer(model.named_steps["model"])
+    feature_names = list(model.named_steps["preprocess"].get_feature_names_out())
+    X, _ = load_labelled_frame(args.data)
+
+    pool = ExplanationPool(args.workers, args.max_queue)
+    submit_ms = []
+    handles = []
+    start = time.perf_counter()
+    for i in range(args.jobs):
+        t0 = time.perf_counter()
+        try:
+            handles.append(pool.submit(model, explainer, X.iloc[[i % len(X)]], feature_names))
+        except PoolFull:
+            pass
+        submit_ms.append((time.perf_counter() - t0) * 1e3)
+        time.sleep(args.interval_ms / 1e3)
+    for handle in handles:
+        handle.result()
+    elapsed = time.perf_counter() - start
+    pool.close()
+
+    stats = pool.stats()
+    print(f"{args.jobs} declines, {args.workers} workers, queue limit {args.max_queue}: "
+          f"{stats['completed']} explained, {stats['rejected']} rejected, {stats['failed']} failed in {elapsed:.1f}s")
+    print(f"submit (decision path): p50 {np.percentile(submit_ms, 50):.3f} ms  p99 {np.percentile(submit_ms, 99):.3f} ms")
+    print(f"queue wait: p50 {stats['queue_wait_p50_ms']:.1f} ms  p99 {stats['queue_wait_p99_ms']:.1f} ms")
+    print(f"compute:    p50 {stats['compute_p50_ms']:.1f} ms  p99 {stats['compute_p99_ms']:.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,193 @@
+"""Feature pruning by mean |SHAP| importance.
+
+The deployed pipeline expands 38 input columns into 89 features, many of them
+one-hot levels of ``currency_pair`` and ``home_country`` that the forest
+barely uses. This tool ranks the 89 expanded features by mean |SHAP| on a
+sample of training rows (TreeExplainer on the deployed forest), then retrains
+the notebook 05 pipeline keeping only the top-k features at several levels.
+
+Pruning is per expanded feature: the one-hot encoder is given the kept levels
+as explicit ``categories`` (dropped levels encode as all zeros), numeric
+columns are passed through only if kept, and input columns with nothing left
+are dropped. Each level reports recall / precision / PR AUC on the notebook
+05 holdout, single-row and batch latency, pipeline size and scoring memory.
+
+``--write K`` saves the top-K pipeline with matching
+``random_forest_feature_columns.csv`` (input columns it reads) and
+``rf_shap_feature_names.csv`` (its expanded feature names, for SHAP output);
+deploy all three together.
+
+Usage:
+    python -m novapay.feature_pruning --levels 89 60 40 25 15
+    python -m novapay.feature_pruning --levels 40 --write 40 --output-dir Model/pruned
+"""
+import argparse
+import io
+import os
+import time
+import tracemalloc
+
+import joblib
+import numpy as np
+import pandas as pd
+from sklearn.compose import ColumnTransformer
+from sklearn.preprocessing import OneHotEncoder
+
+from novapay.features import CATEGORICAL_COLUMNS, NUMERIC_COLUMNS, load_labelled_frame, train_holdout_split
+from novapay.refresh import evaluate, new_pipeline
+from novapay.scoring import MODEL_PATH, load_pipeline, score_transactions
+
+try:
+    import shap
+    SHAP_AVAILABLE = True
+except ImportError:
+    SHAP_AVAILABLE = False
+
+
+def expanded_features(preprocess):
+    """[(feature name, input column, one-hot level or None)] in the fitted preprocess output order"""
+    features = []
+    for name, transformer, columns in preprocess.transformers_:
+        if name == "cat":
+            for column, levels in zip(columns, transformer.categories_):
+                features += [(f"cat__{column}_{level}", column, level) for level in levels]
+        elif name == "num":
+            features += [(f"num__{column}", column, None) for column in columns]
+    return features
+
+
+def shap_importance(pipeline, X, n_rows=200, random_state=42):
+    """Mean |SHAP| of the fraud class per expanded feature, highest first"""
+    if not SHAP_AVAILABLE:
+        raise ImportError("shap is required to rank features")
+    sample = X.sample(min(n_rows, len(X)), random_state=random_state)
+    X_trans = pipeline.named_steps["preprocess"].transform(sample)
+    explainer = shap.TreeExplainer(pipeline.named_steps["model"])
+    values = np.asarray(explainer.shap_values(X_trans, check_additivity=False))
+    # (rows, features, classes) in recent shap versions, (classes, rows, features) in older ones
+    fraud = values[:, :, 1] if values.shape[-1] == 2 else values[1]
+    names = [name for name, _, _ in expanded_features(pipeline.named_steps["preprocess"])]
+    return pd.Series(np.abs(fraud).mean(axis=0), index=names).sort_values(ascending=False)
+
+
+def pruned_pipeline(preprocess, kept, n_estimators=500):
+    """Unfitted notebook 05 pipeline reading only the kept expanded features"""
+    kept = set(kept)
+    categorical, levels, numeric = [], [], []
+    for name, column, level in expanded_features(preprocess):
+        if name not in kept:
+            continue
+        if level is None:
+            numeric.append(column)
+        elif column in categorical:
+            levels[categorical.index(column)].append(level)
+        else:
+            categorical.append(column)
+            levels.append([level])
+
+    transformers = []
+    if categorical:
+        transformers.append(("cat", OneHotEncoder(categories=levels, handle_unknown="ignore", sparse_output=False),
+                             categorical))
+    if numeric:
+        transformers.append(("num", "passthrough", numeric))
+    pipeline = new_pipeline(n_estimators)
+    pipeline.steps[0] = ("preprocess", ColumnTransformer(transformers=transformers, remainder="drop"))
+    return pipeline
+
+
+def input_columns(pipeline):
+    """Model-input columns a fitted pipeline actually reads, in MODEL_COLUMNS order"""
+    used = {
+        column
+        for _, transformer, columns in pipeline.named_steps["preprocess"].transformers_
+        if not (isinstance(transformer, str) and transformer == "drop")
+        for column in columns
+    }
+    return [column for column in CATEGORICAL_COLUMNS + NUMERIC_COLUMNS if column in used]
+
+
+def footprint(pipeline, X, single_rows=200):
+    """Latency, size and scoring-memory figures for a fitted pipeline"""
+    buffer = io.BytesIO()
+    joblib.dump(pipeline, buffer)
+
+    timings = []
+    for i in range(single_rows):
+        start = time.perf_counter()
+        score_transactions(pipeline, X.iloc[[i % len(X)]])
+        timings.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    score_transactions(pipeline, X)
+    batch_seconds = time.perf_counter() - start
+
+    tracemalloc.start()
+    score_transactions(pipeline, X)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    timings = np.array(timings) * 1e3
+    return {
+        "single_p50_ms": float(np.percentile(timings, 50)),
+        "single_p99_ms": float(np.percentile(timings, 99)),
+        "batch_rows_per_s": len(X) / batch_seconds,
+        "pipeline_mb": buffer.tell() / 1e6,
+        "scoring_peak_mb": peak / 1e6,
+    }
+
+
+def write_pruned(pipeline, output_dir):
+    """Save a pruned pipeline with its input-column and feature-name CSVs"""
+    os.makedirs(output_dir, exist_ok=True)
+    joblib.dump(pipeline, os.path.join(output_dir, "rf_fraud_pipeline.pkl"))
+    pd.DataFrame({"feature_name": input_columns(pipeline)}).to_csv(
+        os.path.join(output_dir, "random_forest_feature_columns.csv"), index=False)
+    names = pipeline.named_steps["preprocess"].get_feature_names_out()
+    pd.DataFrame({"feature_name": names}).to_csv(os.path.join(output_dir, "rf_shap_feature_names.csv"), index=False)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Rank features by mean |SHAP| and retrain on pruned sets")
+    parser.add_argument("--model", default=MODEL_PATH)
+    parser.add_argument("--data", default="Data/Nova_CleanedEDA_df.csv")
+    parser.add_argument("--levels", type=int, nargs="+", default=[89, 60, 40, 25, 15],
+                        help="Numbers of expanded features to keep")
+    parser.add_argument("--shap-rows", type=int, default=200, help="Training rows explained for the ranking")
+    parser.add_argument("--n-estimators", type=int, default=500)
+    parser.add_argument("--write", type=int, default=None, help="Save the pipeline pruned to this level")
+    parser.add_argument("--output-dir", default="Model/pruned")
+    args = parser.parse_args()
+
+    deployed = load_pipeline(args.model)
+    X, y = load_labelled_frame(args.data)
+    X_train, X_test, y_train, y_test = train_holdout_split(X, y)
+
+    start = time.perf_counter()
+    importance = shap_importance(deployed, X_train, args.shap_rows)
+    print(f"Ranked {len(importance)} features by mean |SHAP| over {args.shap_rows} rows "
+          f"in {time.perf_counter() - start:.1f}s. Top 10:")
+    print(importance.head(10).to_string(float_format=lambda v: f"{v:.4f}"))
+    print(f"Features with mean |SHAP| < 1e-4: {int((importance < 1e-4).sum())}\n")
+
+    rows = [{"features": len(importance), "inputs": len(input_columns(deployed)), "model": "deployed", "fit_s": 0.0,
+             **evaluate(deployed, X_test, y_test), **footprint(deployed, X_test)}]
+    preprocess = deployed.named_steps["preprocess"]
+    for level in sorted(set(args.levels), reverse=True):
+        pipeline = pruned_pipeline(preprocess, importance.index[:level], args.n_estimators)
+        start = time.perf_counter()
+        pipeline.fit(X_train, y_train)
+        fit_seconds = time.perf_counter() - start
+        rows.append({"features": level, "inputs": len(input_columns(pipeline)), "model": f"top {level}",
+                     "fit_s": fit_seconds, **evaluate(pipeline, X_test, y_test), **footprint(pipeline, X_test)})
+        if level == args.write:
+            write_pruned(pipeline, args.output_dir)
+            print(f"Wrote the top-{level} pipeline and its feature CSVs to {args.output_dir}")
+
+    report = pd.DataFrame(rows)
+    pd.set_option("display.width", 250)
+    print(report.to_string(index=False, float_format=lambda v: f"{v:.4f}"))
+
+
+if __name__ == "__main__":
+    main()
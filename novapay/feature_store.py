@@ -0,0 +1,264 @@
+"""Embedded customer/device feature store.
+
+History is bulk-loaded from the cleaned CSV into a local SQLite file and read
+through an in-memory LRU cache. ``enrich`` fills ``account_age_days``,
+``chargeback_history_count``, ``kyc_tier``, ``device_trust_score`` and
+``new_device`` for a whole batch with at most one query per table.
+
+Usage:
+    python -m novapay.feature_store build
+    python -m novapay.feature_store bench --batch-size 1
+"""
+import argparse
+import os
+import pathlib
+import sqlite3
+import threading
+import time
+from collections import OrderedDict, deque
+
+import numpy as np
+import pandas as pd
+
+STORE_PATH = "Data/feature_store.sqlite"
+EPOCH = pd.Timestamp(0, tz="UTC")
+
+CUSTOMER_FIELDS = ["account_opened", "chargeback_history_count", "kyc_tier"]
+DEVICE_FIELDS = ["device_trust_score"]
+
+# SQLite caps the number of bound parameters per statement
+_MAX_PARAMS = 900
+
+
+class LRUCache:
+    """Bounded mapping that evicts the least recently used key"""
+
+    def __init__(self, max_size):
+        self.max_size = max_size
+        self._data = OrderedDict()
+
+    def get(self, key):
+        try:
+            self._data.move_to_end(key)
+            return self._data[key]
+        except KeyError:
+            return None
+
+    def put(self, key, value):
+        self._data[key] = value
+        self._data.move_to_end(key)
+        if len(self._data) > self.max_size:
+            self._data.popitem(last=False)
+
+    def __len__(self):
+        return len(self._data)
+
+
+def build_store(csv_path="Data/Nova_CleanedEDA_df.csv", store_path=STORE_PATH):
+    """Bulk-load the latest customer and device state from a cleaned CSV"""
+    df = pd.read_csv(csv_path, usecols=[
+        "customer_id", "device_id", "timestamp", "kyc_tier", "account_age_days",
+        "chargeback_history_count", "device_trust_score",
+    ])
+    df["timestamp"] = pd.to_datetime(df["timestamp"], utc=True, format="mixed")
+    df = df.sort_values("timestamp")
+
+    # Store the account opening date so the age stays correct as time moves on
+    opened = df["timestamp"] - pd.to_timedelta(df["account_age_days"], unit="D")
+    df["account_opened"] = (opened - EPOCH).dt.days
+
+    customers = df.groupby("customer_id").last()[CUSTOMER_FIELDS]
+    devices = df.groupby("device_id").last()[DEVICE_FIELDS]
+    pairs = df[["customer_id", "device_id"]].drop_duplicates()
+
+    conn = sqlite3.connect(store_path)
+    with conn:
+        conn.executescript("""
+            DROP TABLE IF EXISTS customers;
+            DROP TABLE IF EXISTS devices;
+            DROP TABLE IF EXISTS customer_devices;
+            CREATE TABLE customers (
+                customer_id TEXT PRIMARY KEY,
+                account_opened INTEGER,
+                chargeback_history_count INTEGER,
+                kyc_tier TEXT
+            ) WITHOUT ROWID;
+            CREATE TABLE devices (
+                device_id TEXT PRIMARY KEY,
+                device_trust_score REAL
+            ) WITHOUT ROWID;
+            CREATE TABLE customer_devices (
+                customer_id TEXT,
+                device_id TEXT,
+                PRIMARY KEY (customer_id, device_id)
+            ) WITHOUT ROWID;
+        """)
+        conn.executemany("INSERT INTO customers VALUES (?, ?, ?, ?)", customers.itertuples(name=None))
+        conn.executemany("INSERT INTO devices VALUES (?, ?)", devices.itertuples(name=None))
+        conn.executemany("INSERT INTO customer_devices VALUES (?, ?)", pairs.itertuples(index=False, name=None))
+    conn.close()
+    return len(customers), len(devices), len(pairs)
+
+
+class FeatureStore:
+    """SQLite-backed customer/device history with an LRU front cache"""
+
+    def __init__(self, store_path=STORE_PATH, cache_size=50_000):
+        # Read-only, so a wrong path fails here instead of creating an empty database
+        if not os.path.exists(store_path):
+            raise FileNotFoundError(f"No feature store at {store_path}; run `python -m novapay.feature_store build`")
+        uri = f"{pathlib.Path(store_path).absolute().as_uri()}?mode=ro"
+        self._conn = sqlite3.connect(uri, uri=True, check_same_thread=False)
+        tables = {row[0] for row in self._conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+        missing = {"customers", "devices", "customer_devices"} - tables
+        if missing:
+            self._conn.close()
+            raise ValueError(f"{store_path} is not a feature store (missing tables: {', '.join(sorted(missing))})")
+        self._lock = threading.Lock()
+        self._customers = LRUCache(cache_size)
+        self._devices = LRUCache(cache_size)
+        self._pairs = LRUCache(cache_size)
+        self.hits = 0
+        self.misses = 0
+        self.lookup_seconds = deque(maxlen=10_000)
+
+    def _fetch(self, cache, table, key_columns, value_sql, keys):
+        """Return {key: row or None} for keys, going to SQLite once for all cache misses"""
+        found, missing = {}, []
+        for key in keys:
+            value = cache.get(key)
+            if value is None:
+                missing.append(key)
+            else:
+                found[key] = value
+        self.hits += len(found)
+        self.misses += len(missing)
+
+        width = len(key_columns)
+        for start in range(0, len(missing), _MAX_PARAMS // width):
+            chunk = missing[start:start + _MAX_PARAMS // width]
+            if width == 1:
+                where = f"{key_columns[0]} IN ({','.join('?' * len(chunk))})"
+                params = chunk
+            else:
+                where = f"({', '.join(key_columns)}) IN (VALUES {','.join(['(?, ?)'] * len(chunk))})"
+                params = [part for key in chunk for part in key]
+            rows = self._conn.execute(
+                f"SELECT {', '.join(key_columns)}, {value_sql} FROM {table} WHERE {where}", params
+            ).fetchall()
+            for row in rows:
+                key = row[0] if width == 1 else tuple(row[:width])
+                found[key] = row[width:]
+
+        # Remember misses too, so unknown keys do not hit SQLite every time
+        for key in missing:
+            cache.put(key, found.setdefault(key, ()))
+        return found
+
+    def lookup(self, customer_ids, device_ids, as_of=None):
+        """Batched history lookup; returns a dict of per-row arrays.
+
+        Account fields are NaN/None for unknown customers and
+        ``device_trust_score`` is NaN for unknown devices. ``new_device`` is 1
+        when the customer has never been seen on the device.
+        """
+        as_of = pd.Timestamp.now(tz="UTC") if as_of is None else pd.Timestamp(as_of)
+        if as_of.tzinfo is None:
+            as_of = as_of.tz_localize("UTC")
+        today = (as_of - EPOCH).days
+
+        with self._lock:
+            customers = self._fetch(self._customers, "customers", ["customer_id"],
+                                    ", ".join(CUSTOMER_FIELDS), set(customer_ids))
+            devices = self._fetch(self._devices, "devices", ["device_id"],
+                                  ", ".join(DEVICE_FIELDS), set(device_ids))
+            pairs = self._fetch(self._pairs, "customer_devices", ["customer_id", "device_id"],
+                                "1", set(zip(customer_ids, device_ids)))
+
+        customer_rows = [customers[c] or (np.nan, np.nan, None) for c in customer_ids]
+        opened, chargebacks, kyc = zip(*customer_rows)
+        return {
+            "account_age_days": np.maximum(today - np.array(opened, dtype=float), 0),
+            "chargeback_history_count": np.array(chargebacks, dtype=float),
+            "kyc_tier": np.array(kyc, dtype=object),
+            "device_trust_score": np.array([devices[d][0] if devices[d] else np.nan for d in device_ids]),
+            "new_device": np.array([0 if pairs[key] else 1 for key in zip(customer_ids, device_ids)]),
+        }
+
+    def enrich(self, input_data, as_of=None):
+        """Fill account and device risk fields from history.
+
+        Rows need ``customer_id`` and ``device_id``; fields for unknown keys keep
+        the values already in ``input_data``.
+        """
+        start = time.perf_counter()
+        found = self.lookup(input_data["customer_id"].tolist(), input_data["device_id"].tolist(), as_of)
+
+        known_customer = ~np.isnan(found["account_age_days"])
+        known_device = ~np.isnan(found["device_trust_score"])
+        columns = {"new_device": found["new_device"]}
+        for col in ["account_age_days", "chargeback_history_count", "kyc_tier"]:
+            columns[col] = np.where(known_customer, found[col], input_data[col].to_numpy())
+        columns["device_trust_score"] = np.where(
+            known_device, found["device_trust_score"], input_data["device_trust_score"].to_numpy()
+        )
+        for col in ["account_age_days", "chargeback_history_count"]:
+            columns[col] = columns[col].astype(np.int64)
+
+        df = input_data.assign(**columns)
+        self.lookup_seconds.append(time.perf_counter() - start)
+        return df
+
+    def stats(self):
+        """Cache hit rate and enrichment latency percentiles"""
+        total = self.hits + self.misses
+        latency = np.array(self.lookup_seconds) * 1e3 if self.lookup_seconds else np.zeros(1)
+        return {
+            "lookups": total,
+            "hit_rate": self.hits / total if total else 0.0,
+            "enrich_ms_p50": float(np.percentile(latency, 50)),
+            "enrich_ms_p99": float(np.percentile(latency, 99)),
+            "cached_customers": len(self._customers),
+            "cached_devices": len(self._devices),
+        }
+
+    def close(self):
+        self._conn.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build or benchmark the local feature store")
+    parser.add_argument("command", choices=["build", "bench"])
+    parser.add_argument("--csv", default="Data/Nova_CleanedEDA_df.csv")
+    parser.add_argument("--store", default=STORE_PATH)
+    parser.add_argument("--batch-size", type=int, default=1)
+    parser.add_argument("--requests", type=int, default=20_000)
+    parser.add_argument("--cache-size", type=int, default=50_000)
+    args = parser.parse_args()
+
+    if args.command == "build":
+        start = time.perf_counter()
+        customers, devices, pairs = build_store(args.csv, args.store)
+        print(f"Loaded {customers} customers, {devices} devices, {pairs} customer/device pairs "
+              f"in {time.perf_counter() - start:.2f}s -> {args.store}")
+        return
+
+    history = pd.read_csv(args.csv, usecols=[
+        "customer_id", "device_id", "account_age_days", "chargeback_history_count",
+        "kyc_tier", "device_trust_score", "new_device",
+    ])
+    store = FeatureStore(args.store, cache_size=args.cache_size)
+    rng = np.random.default_rng(42)
+    for _ in range(args.requests // args.batch_size):
+        batch = history.iloc[rng.integers(0, len(history), args.batch_size)]
+        store.enrich(batch)
+    stats = store.stats()
+    store.close()
+
+    print(f"Batch size {args.batch_size}, {args.requests} transactions")
+    for key, value in stats.items():
+        print(f"  {key}: {value:.4f}" if isinstance(value, float) else f"  {key}: {value}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,236 @@
+from functools import lru_cache
+from zoneinfo import ZoneInfo
+
+import pandas as pd
+import numpy as np
+from sklearn.model_selection import train_test_split
+
+# Column layout the deployed pipeline was trained on (see Data/rf_shap_feature_names.csv)
+CATEGORICAL_COLUMNS = [
+    "home_country",
+    "source_currency",
+    "dest_currency",
+    "channel",
+    "ip_country",
+    "kyc_tier",
+    "time_of_day",
+    "currency_pair",
+]
+
+NUMERIC_COLUMNS = [
+    "amount_src",
+    "amount_usd",
+    "fee",
+    "exchange_rate_src_to_dest",
+    "new_device",
+    "location_mismatch",
+    "ip_risk_score",
+    "account_age_days",
+    "device_trust_score",
+    "chargeback_history_count",
+    "risk_score_internal",
+    "txn_velocity_1h",
+    "txn_velocity_24h",
+    "corridor_risk",
+    "day_of_week",
+    "is_weekend",
+    "is_night",
+    "High risk device",
+    "ip_usage_count",
+    "velocity_ratio",
+    "fee_ratio",
+    "amount_velocity_interaction",
+    "device_ip_risk",
+    "new_device_velocity",
+    "amount_usd_capped",
+    "log_amount_usd",
+    "log_fee",
+    "new_device_high_velocity",
+    "young_account_high_amount",
+    "ip_location_risk",
+]
+
+MODEL_COLUMNS = CATEGORICAL_COLUMNS + NUMERIC_COLUMNS
+
+# Columns dropped before training in notebook 05
+ID_COLUMNS = ["transaction_id", "customer_id", "device_id", "ip_address", "timestamp"]
+
+# Notebook 03 caps amount_usd at its 99th percentile over the training data (Data/Nova_CleanedEDA_df.csv).
+# Serving uses the same fixed value, so a row's features never depend on the batch it is scored in.
+AMOUNT_USD_CAP = 9998.9028
+
+
+def compute_derived_features(input_data):
+    """Compute derived features from input data"""
+    df = input_data.copy()
+
+    # Velocity ratio
+    df["velocity_ratio"] = df["txn_velocity_1h"] / (df["txn_velocity_24h"] + 1)
+
+    # Fee ratio
+    df["fee_ratio"] = df["fee"] / (df["amount_usd"] + 1e-6)  # Avoid division by zero
+
+    # Amount velocity interaction
+    df["amount_velocity_interaction"] = df["amount_usd"] * df["velocity_ratio"]
+
+    # Device IP risk
+    df["device_ip_risk"] = df["device_trust_score"] * df["ip_risk_score"]
+
+    # New device velocity
+    df["new_device_velocity"] = df["new_device"] * df["txn_velocity_1h"]
+
+    # High risk device
+    df["High risk device"] = df["new_device"].astype(int) * (1 - df["device_trust_score"])
+
+    # Amount capped at the training-time 99th percentile
+    df["amount_usd_capped"] = df["amount_usd"].clip(upper=AMOUNT_USD_CAP)
+
+    # Log transforms
+    df["log_amount_usd"] = np.log1p(df["amount_usd_capped"].clip(lower=0))
+    df["log_fee"] = np.log1p(df["fee"].clip(lower=0))
+
+    # New device high velocity
+    df["new_device_high_velocity"] = ((df["new_device"] == 1) & (df["txn_velocity_1h"] >= 3)).astype(int)
+
+    # Young account high amount
+    df["young_account_high_amount"] = ((df["account_age_days"] < 30) & (df["amount_usd"] > 500)).astype(int)
+
+    # IP location risk
+    df["ip_location_risk"] = ((df["ip_risk_score"] > 0.7) & (df["location_mismatch"] == 1)).astype(int)
+
+    # IP usage count (set to 1 as default since we don't have historical data)
+    df["ip_usage_count"] = 1
+
+    return df
+
+
+# Hour -> category lookup tables with the notebook 03 definitions
+TIME_OF_DAY_BY_HOUR = np.array(
+    ["late_night"] * 6 + ["morning"] * 6 + ["afternoon"] * 6 + ["evening"] * 6, dtype=object
+)
+IS_NIGHT_BY_HOUR = np.array([1 if 2 <= h <= 8 else 0 for h in range(24)])
+
+SECONDS_PER_HOUR = 3600
+SECONDS_PER_DAY = 86400
+
+
+@lru_cache(maxsize=32)
+def _zone(tz):
+    return ZoneInfo(tz)
+
+
+def derive_time_features(timestamps, source_tz="UTC"):
+    """Derive day_of_week, is_weekend, is_night and time_of_day in one vectorized pass.
+
+    ``timestamps`` may be a scalar, strings, datetimes or a datetime Series.
+    Values with an offset are converted to UTC, the clock the model was trained
+    on; naive values are read as ``source_tz``. Unparseable values give
+    day_of_week -1, zero flags and time_of_day "unknown", which the one-hot
+    encoder ignores.
+    """
+    if np.ndim(timestamps) == 0:
+        return _scalar_time_features(timestamps, source_tz)
+
+    values = _parse_timestamps(pd.Series(timestamps), source_tz)
+
+    # Epoch seconds are UTC whatever the original zone, so hour and weekday are plain arithmetic
+    missing = values.isna().to_numpy()
+    seconds = pd.DatetimeIndex(values).as_unit("s").asi8
+    seconds = np.where(missing, 0, seconds)
+    hour = (seconds // SECONDS_PER_HOUR) % 24
+    day_of_week = (seconds // SECONDS_PER_DAY + 3) % 7  # 1970-01-01 was a Thursday
+
+    day_of_week = np.where(missing, -1, day_of_week)
+    time_of_day = TIME_OF_DAY_BY_HOUR[hour]
+    time_of_day[missing] = "unknown"
+    return {
+        "day_of_week": day_of_week,
+        "is_weekend": ((day_of_week == 5) | (day_of_week == 6)).astype(int),
+        "is_night": np.where(missing, 0, IS_NIGHT_BY_HOUR[hour]),
+        "time_of_day": time_of_day,
+    }
+
+
+def _parse_timestamps(values, source_tz):
+    """Parse to tz-aware UTC, reading naive values as source_tz"""
+    if isinstance(values.dtype, pd.DatetimeTZDtype):
+        return values
+    if pd.api.types.is_datetime64_dtype(values.dtype):
+        return values.dt.tz_localize(_zone(source_tz), ambiguous="NaT", nonexistent="NaT")
+
+    # ISO 8601 parses far faster than format inference; only retry the leftovers
+    parsed = pd.to_datetime(values, errors="coerce", format="ISO8601", utc=True)
+    retry = parsed.isna() & values.notna()
+    if retry.any():
+        parsed[retry] = pd.to_datetime(values[retry], errors="coerce", format="mixed", utc=True)
+
+    if source_tz != "UTC":
+        naive = ~values.astype("string").str.contains(r"(?:Z|[+-]\d{2}:?\d{2})$", na=True)
+        if naive.any():
+            parsed[naive] = (
+                parsed[naive].dt.tz_localize(None)
+                .dt.tz_localize(_zone(source_tz), ambiguous="NaT", nonexistent="NaT")
+                .dt.tz_convert("UTC")
+            )
+    return parsed
+
+
+def _scalar_time_features(timestamp, source_tz):
+    """Single-row fast path with the same definitions as the vectorized one"""
+    try:
+        ts = pd.Timestamp(timestamp)
+    except (ValueError, TypeError):
+        ts = pd.NaT
+    if ts is pd.NaT:
+        return {
+            "day_of_week": np.array([-1]),
+            "is_weekend": np.array([0]),
+            "is_night": np.array([0]),
+            "time_of_day": np.array(["unknown"], dtype=object),
+        }
+    ts = ts.tz_localize(_zone(source_tz)) if ts.tzinfo is None else ts
+    ts = ts.tz_convert("UTC")
+    return {
+        "day_of_week": np.array([ts.dayofweek]),
+        "is_weekend": np.array([int(ts.dayofweek >= 5)]),
+        "is_night": np.array([IS_NIGHT_BY_HOUR[ts.hour]]),
+        "time_of_day": np.array([TIME_OF_DAY_BY_HOUR[ts.hour]], dtype=object),
+    }
+
+
+def add_time_features(df, source_tz="UTC"):
+    """Add the notebook 03 time features from the timestamp column"""
+    for col, values in derive_time_features(df["timestamp"], source_tz).items():
+        df[col] = values
+    return df
+
+
+def prepare_features(cleaned_df):
+    """Time features, currency pair and derived features for cleaned transactions"""
+    df = add_time_features(cleaned_df.copy())
+    df["currency_pair"] = df["source_currency"] + "_" + df["dest_currency"]
+    return compute_derived_features(df)
+
+
+def build_model_frame(cleaned_df):
+    """Turn cleaned transactions (Data/Nova_CleanedEDA_df.csv layout) into model input"""
+    df = prepare_features(cleaned_df)
+
+    # Historical IP usage, as computed over the training history in notebook 03
+    if "ip_address" in df.columns and "transaction_id" in df.columns:
+        df["ip_usage_count"] = df.groupby("ip_address")["transaction_id"].transform("count")
+
+    return df[MODEL_COLUMNS]
+
+
+def load_labelled_frame(path="Data/Nova_CleanedEDA_df.csv"):
+    """Load a cleaned CSV and return model input X and labels y"""
+    df = pd.read_csv(path)
+    X = build_model_frame(df)
+    y = df["is_fraud"].astype(int).to_numpy()
+    return X, y
+
+
+def train_holdout_split(X, y):
+    """Reproduce the notebook 05 train/test split (20% stratified holdout)"""
+    return train_test_split(X, y, test_size=0.2, random_state=42, stratify=y)
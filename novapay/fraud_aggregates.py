@@ -0,0 +1,300 @@
+"""Materialized fraud-rate aggregates per dimension and day.
+
+Notebook 02 recomputes fraud rates by channel, location mismatch, home
+country, KYC tier and new device with a full-table ``groupby`` on every run.
+Here the counts are kept in one small SQLite table, one row per
+(dimension, day, value), holding transactions, labelled transactions and
+frauds. Scored transactions add to ``transactions``; labels add to
+``labelled`` and ``frauds`` in the bucket of the transaction's own day, so a
+chargeback arriving weeks later still lands where it belongs. Fraud rate is
+``frauds / labelled``.
+
+Updates are pre-aggregated in Python and applied with one UPSERT per touched
+row. Reads sum over at most days x values rows, so query time depends on the
+date range, not on how many transactions produced it. ``rebuild`` replaces the
+table from a labelled CSV in one bulk pass.
+
+Usage:
+    python -m novapay.fraud_aggregates rebuild
+    python -m novapay.fraud_aggregates bench --scale 100
+"""
+import argparse
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+from collections import defaultdict
+
+import numpy as np
+import pandas as pd
+
+AGGREGATES_PATH = "Data/fraud_aggregates.sqlite"
+DIMENSIONS = ["channel", "location_mismatch", "home_country", "kyc_tier", "new_device"]
+MISSING = "Unknown"
+
+# Buckets are UTC days since 1970-01-01; coarser periods are derived at read time
+PERIODS = {
+    "day": "date(bucket * 86400, 'unixepoch')",
+    "week": "date((bucket - (bucket + 3) % 7) * 86400, 'unixepoch')",
+    "month": "strftime('%Y-%m', bucket * 86400, 'unixepoch')",
+}
+
+_SCHEMA = """
+    CREATE TABLE IF NOT EXISTS fraud_aggregates (
+        dimension TEXT,
+        bucket INTEGER,
+        value TEXT,
+        transactions INTEGER,
+        labelled INTEGER,
+        frauds INTEGER,
+        PRIMARY KEY (dimension, bucket, value)
+    ) WITHOUT ROWID;
+"""
+
+_UPSERT = """
+    INSERT INTO fraud_aggregates VALUES (?, ?, ?, ?, ?, ?)
+    ON CONFLICT (dimension, bucket, value) DO UPDATE SET
+        transactions = transactions + excluded.transactions,
+        labelled = labelled + excluded.labelled,
+        frauds = frauds + excluded.frauds
+"""
+
+
+def _text(value):
+    """Stored form of a dimension value: 1.0 and 1 both become "1", missing becomes Unknown"""
+    if value is None or (isinstance(value, float) and np.isnan(value)):
+        return MISSING
+    if isinstance(value, (float, np.floating)) and float(value).is_integer():
+        return str(int(value))
+    return str(value)
+
+
+def day_numbers(timestamps):
+    """UTC day numbers of timestamps (scalar or sequence); naive values are read as UTC"""
+    values = pd.to_datetime(pd.Series(np.atleast_1d(timestamps)), utc=True, format="mixed")
+    return (values.dt.tz_localize(None).to_numpy().astype("datetime64[D]").astype(np.int64))
+
+
+def _day(date):
+    return None if date is None else int(day_numbers(pd.Timestamp(date))[0])
+
+
+class FraudAggregates:
+    """Incrementally maintained count / labelled / fraud totals per dimension value and day"""
+
+    def __init__(self, path=AGGREGATES_PATH, dimensions=DIMENSIONS):
+        self.path = path
+        self.dimensions = list(dimensions)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        # WAL lets the analytics page read while the app writes, and makes each small commit cheap
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(_SCHEMA)
+        self._lock = threading.Lock()
+        self.updates = 0
+        self.update_seconds = 0.0
+
+    def _apply(self, frame, timestamps, transactions, labelled, frauds):
+        if timestamps is None:
+            timestamps = frame["timestamp"] if "timestamp" in frame.columns else pd.Timestamp.now(tz="UTC")
+        n = len(frame)
+        days = np.broadcast_to(day_numbers(timestamps), n)
+        counts = [np.broadcast_to(np.asarray(c, dtype=np.int64), n) for c in (transactions, labelled, frauds)]
+
+        deltas = defaultdict(lambda: [0, 0, 0])
+        for dimension in self.dimensions:
+            for i, value in enumerate(frame[dimension].tolist()):
+                delta = deltas[(dimension, int(days[i]), _text(value))]
+                delta[0] += int(counts[0][i])
+                delta[1] += int(counts[1][i])
+                delta[2] += int(counts[2][i])
+
+        start = time.perf_counter()
+        with self._lock, self._conn:
+            self._conn.executemany(_UPSERT, [key + tuple(delta) for key, delta in deltas.items()])
+            self.updates += n
+            self.update_seconds += time.perf_counter() - start
+        return len(deltas)
+
+    def record(self, frame, timestamps=None, is_fraud=None):
+        """Add scored transactions; with ``is_fraud`` they also count as labelled.
+
+        ``timestamps`` defaults to the frame's ``timestamp`` column, else now.
+        Returns the number of aggregate rows touched.
+        """
+        if is_fraud is None:
+            return self._apply(frame, timestamps, 1, 0, 0)
+        return self._apply(frame, timestamps, 1, 1, np.asarray(is_fraud, dtype=np.int64))
+
+    def label(self, frame, is_fraud, timestamps=None):
+        """Add labels for transactions already recorded, in the buckets of their own days"""
+        return self._apply(frame, timestamps, 0, 1, np.asarray(is_fraud, dtype=np.int64))
+
+    def _range(self, start, end):
+        first, last = _day(start), _day(end)
+        return (-2 ** 62 if first is None else first), (2 ** 62 if last is None else last)
+
+    def rates(self, dimension, start=None, end=None):
+        """Transactions, labels, frauds and fraud rate per value of a dimension between two dates"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT value, SUM(transactions), SUM(labelled), SUM(frauds) FROM fraud_aggregates "
+                "WHERE dimension = ? AND bucket BETWEEN ? AND ? GROUP BY value",
+                (dimension, *self._range(start, end)),
+            ).fetchall()
+        frame = pd.DataFrame(rows, columns=["value", "transactions", "labelled", "frauds"])
+        frame["fraud_rate"] = frame["frauds"] / frame["labelled"].where(frame["labelled"] > 0)
+        return frame.sort_values("transactions", ascending=False, ignore_index=True)
+
+    def series(self, dimension, period="month", start=None, end=None):
+        """Per-period totals and fraud rate for every value of a dimension"""
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT {PERIODS[period]} AS period, value, SUM(transactions), SUM(labelled), SUM(frauds) "
+                "FROM fraud_aggregates WHERE dimension = ? AND bucket BETWEEN ? AND ? "
+                "GROUP BY period, value ORDER BY period",
+                (dimension, *self._range(start, end)),
+            ).fetchall()
+        frame = pd.DataFrame(rows, columns=["period", "value", "transactions", "labelled", "frauds"])
+        frame["fraud_rate"] = frame["frauds"] / frame["labelled"].where(frame["labelled"] > 0)
+        return frame
+
+    def totals(self, start=None, end=None):
+        """Overall transactions, labels and frauds between two dates"""
+        frame = self.rates(self.dimensions[0], start, end)
+        return {column: int(frame[column].sum()) for column in ["transactions", "labelled", "frauds"]}
+
+    def date_range(self):
+        """First and last day with any data, as Timestamps (None when empty)"""
+        with self._lock:
+            first, last = self._conn.execute("SELECT MIN(bucket), MAX(bucket) FROM fraud_aggregates").fetchone()
+        if first is None:
+            return None, None
+        return pd.Timestamp(first, unit="D"), pd.Timestamp(last, unit="D")
+
+    def stats(self):
+        with self._lock:
+            rows = self._conn.execute("SELECT COUNT(*) FROM fraud_aggregates").fetchone()[0]
+            return {
+                "aggregate_rows": rows,
+                "file_bytes": os.path.getsize(self.path) if os.path.exists(self.path) else 0,
+                "updates": self.updates,
+                "update_ms_per_row": self.update_seconds / self.updates * 1e3 if self.updates else None,
+            }
+
+    def close(self):
+        self._conn.close()
+
+
+def aggregate_frame(df, dimensions=DIMENSIONS):
+    """Bulk (dimension, bucket, value, transactions, labelled, frauds) rows for labelled transactions"""
+    days = day_numbers(df["timestamp"])
+    is_fraud = df["is_fraud"].astype(np.int64).to_numpy()
+    parts = []
+    for dimension in dimensions:
+        grouped = pd.DataFrame({
+            "bucket": days,
+            "value": [_text(v) for v in df[dimension].tolist()],
+            "frauds": is_fraud,
+        }).groupby(["bucket", "value"], sort=False)["frauds"].agg(["size", "sum"]).reset_index()
+        parts.append(pd.DataFrame({
+            "dimension": dimension,
+            "bucket": grouped["bucket"],
+            "value": grouped["value"],
+            "transactions": grouped["size"],
+            "labelled": grouped["size"],
+            "frauds": grouped["sum"],
+        }))
+    return pd.concat(parts, ignore_index=True)
+
+
+def rebuild(csv_path="Data/Nova_CleanedEDA_df.csv", path=AGGREGATES_PATH, df=None):
+    """Replace the aggregate table with totals from a labelled CSV; returns the row count"""
+    if df is None:
+        df = pd.read_csv(csv_path, usecols=DIMENSIONS + ["timestamp", "is_fraud"])
+    rows = aggregate_frame(df)
+    conn = sqlite3.connect(path)
+    with conn:
+        conn.execute("DROP TABLE IF EXISTS fraud_aggregates")
+        conn.executescript(_SCHEMA)
+        conn.executemany("INSERT INTO fraud_aggregates VALUES (?, ?, ?, ?, ?, ?)",
+                         rows.astype(object).itertuples(index=False, name=None))
+    conn.execute("VACUUM")
+    conn.close()
+    return len(rows)
+
+
+def _query_ms(fn, repeats=20):
+    start = time.perf_counter()
+    for _ in range(repeats):
+        fn()
+    return (time.perf_counter() - start) / repeats * 1e3
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build and benchmark the fraud-rate aggregate table")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    build = sub.add_parser("rebuild", help="Rebuild the aggregates from a labelled CSV")
+    build.add_argument("--data", default="Data/Nova_CleanedEDA_df.csv")
+    build.add_argument("--path", default=AGGREGATES_PATH)
+
+    bench = sub.add_parser("bench", help="Aggregate reads vs full-table groupby as history grows")
+    bench.add_argument("--data", default="Data/Nova_CleanedEDA_df.csv")
+    bench.add_argument("--scale", type=int, default=100, help="Copies of the CSV used as the largest history")
+    args = parser.parse_args()
+
+    if args.command == "rebuild":
+        start = time.perf_counter()
+        n_rows = rebuild(args.data, args.path)
+        print(f"Wrote {n_rows:,} aggregate rows to {args.path} ({os.path.getsize(args.path) / 1e3:.0f} KB) "
+              f"in {time.perf_counter() - start:.2f}s")
+        return
+
+    df = pd.read_csv(args.data, usecols=DIMENSIONS + ["timestamp", "is_fraud"])
+    rows = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for scale in sorted({1, 10, args.scale}):
+            history = pd.concat([df] * scale, ignore_index=True)
+            path = os.path.join(tmp, f"aggregates_{scale}.sqlite")
+            start = time.perf_counter()
+            rebuild(path=path, df=history)
+            rebuild_seconds = time.perf_counter() - start
+
+            aggregates = FraudAggregates(path)
+            rows.append({
+                "transactions": len(history),
+                "rebuild_s": rebuild_seconds,
+                "aggregate_rows": aggregates.stats()["aggregate_rows"],
+                "file_kb": os.path.getsize(path) / 1e3,
+                "groupby_ms": _query_ms(lambda: history.groupby("home_country")["is_fraud"].agg(["size", "mean"]), 5),
+                "rates_ms": _query_ms(lambda: aggregates.rates("home_country")),
+                "rates_90d_ms": _query_ms(lambda: aggregates.rates("home_country", "2025-09-17", "2025-12-16")),
+                "series_ms": _query_ms(lambda: aggregates.series("channel", "month")),
+            })
+            aggregates.close()
+
+        # Incremental path, as the app calls it after each scored transaction
+        aggregates = FraudAggregates(os.path.join(tmp, "aggregates_1.sqlite"))
+        live = df.sample(2000, random_state=42).drop(columns=["is_fraud"])
+        timings = []
+        for i in range(len(live)):
+            row = live.iloc[[i]]
+            start = time.perf_counter()
+            aggregates.record(row, timestamps=pd.Timestamp.now(tz="UTC"))
+            timings.append(time.perf_counter() - start)
+        start = time.perf_counter()
+        aggregates.label(live, df.loc[live.index, "is_fraud"], timestamps=pd.Timestamp.now(tz="UTC"))
+        label_seconds = time.perf_counter() - start
+        aggregates.close()
+
+    pd.set_option("display.width", 200)
+    print(pd.DataFrame(rows).to_string(index=False, float_format=lambda v: f"{v:.2f}"))
+    timings = np.array(timings) * 1e3
+    print(f"\nrecord (1 transaction): p50 {np.percentile(timings, 50):.2f} ms  p99 {np.percentile(timings, 99):.2f} ms")
+    print(f"label (batch of {len(live)}): {label_seconds * 1e3:.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,647 @@
+"""Streaming ingestion: NDJSON transactions in, NDJSON decisions out.
+
+A reader thread follows one source and puts raw lines on a bounded queue:
+
+    file:PATH          tail a file (follows appends and rotation)
+    fifo:PATH          a named pipe (created if missing)
+    tcp:HOST:PORT      a local TCP listener, one JSON object per line
+    unix:PATH          a Unix domain socket listener
+
+When the queue is full the reader blocks, so it stops reading the file, pipe
+or socket and the producer is held back (for sockets through TCP flow
+control). Time spent blocked is reported as back-pressure.
+
+The scorer thread takes micro-batches off the queue and runs them through
+``clean_transactions``, ``StreamState`` (ip_usage_count, velocity when
+missing), ``compute_derived_features`` and the pipeline, as the replay engine
+does. The batch cap adapts: it doubles while
+full batches finish under ``target_batch_ms`` and halves when one runs over,
+and a batch never waits more than ``max_wait_ms`` for rows to arrive. A
+pipeline call has a fixed cost of a few hundred ms on a small box, so under
+load batches grow to amortise it, while a quiet stream is scored as it comes. Decisions go through a second bounded
+queue to a writer thread, so a slow output also backs up to the source.
+Retried messages are caught by ``transaction_id`` (``novapay.dedupe``) and
+answered with a ``skipped`` line instead of being scored twice. Live
+``amount_src`` values are kept as sent; they are not rewritten the way
+notebook 01 rewrote numeric amounts (see ``novapay.cleaning``). Rows with
+out-of-range, mistyped or unknown values are rejected by
+``novapay.validation`` with the failing fields listed.
+
+Usage:
+    python -m novapay.ingest consume --source tcp:127.0.0.1:9009 --output decisions.ndjson
+    python -m novapay.ingest produce --target tcp:127.0.0.1:9009 --rate 2000
+    python -m novapay.ingest bench --source tcp --rate 5000
+"""
+import argparse
+import json
+import os
+import queue
+import socket
+import stat
+import sys
+import tempfile
+import threading
+import time
+from collections import deque
+
+import numpy as np
+import pandas as pd
+
+from novapay.cleaning import clean_transactions
+from novapay.dedupe import STATUS_NAMES, Deduplicator
+from novapay.features import MODEL_COLUMNS
+from novapay.replay import RAW_PATHS, StreamState
+from novapay.scoring import DECISION_THRESHOLD, MODEL_PATH, load_pipeline, score_transactions
+from novapay.validation import TransactionValidator
+
+# Raw fields cleaning and feature derivation need; velocity counts are derived when absent
+REQUIRED_FIELDS = [
+    "timestamp", "customer_id", "home_country", "source_currency", "dest_currency", "channel",
+    "amount_src", "amount_usd", "fee", "exchange_rate_src_to_dest", "new_device", "ip_address",
+    "ip_country", "location_mismatch", "ip_risk_score", "kyc_tier", "account_age_days",
+    "device_trust_score", "chargeback_history_count", "risk_score_internal", "corridor_risk",
+]
+
+_STOP = object()
+
+
+# -- sources ----------------------------------------------------------------
+
+class FileTailSource:
+    """Follow a file like ``tail -F``; stops at end of file when follow is False"""
+
+    def __init__(self, path, from_end=False, follow=True, poll_seconds=0.05):
+        self.path = path
+        self.from_end = from_end
+        self.follow = follow
+        self.poll_seconds = poll_seconds
+        self.position = 0
+
+    def _open(self, stop, from_end):
+        while not os.path.exists(self.path):
+            if stop.wait(self.poll_seconds):
+                return None
+        f = open(self.path, "rb")
+        f.seek(0, os.SEEK_END if from_end else os.SEEK_SET)
+        return f
+
+    def lag_bytes(self):
+        """Bytes written to the file that have not been read yet"""
+        try:
+            return max(os.path.getsize(self.path) - self.position, 0)
+        except OSError:
+            return 0
+
+    def run(self, emit, stop):
+        f = self._open(stop, self.from_end)
+        if f is None:
+            return
+        partial = b""
+        try:
+            while not stop.is_set():
+                line = f.readline()
+                if line:
+                    self.position = f.tell()
+                    if line.endswith(b"\n"):
+                        emit(partial + line)
+                        partial = b""
+                    else:
+                        partial += line  # writer is mid-line; wait for the rest
+                    continue
+                if not self.follow:
+                    break
+                # Rotated or truncated: start again from the top of the new file
+                try:
+                    rotated = os.stat(self.path).st_ino != os.fstat(f.fileno()).st_ino
+                    truncated = os.path.getsize(self.path) < f.tell()
+                except OSError:
+                    rotated, truncated = False, False
+                if rotated or truncated:
+                    f.close()
+                    f = self._open(stop, from_end=False)
+                    if f is None:
+                        return
+                    partial = b""
+                    self.position = 0
+                    continue
+                stop.wait(self.poll_seconds)
+        finally:
+            if partial.strip():
+                emit(partial)
+            f.close()
+
+
+class FifoSource:
+    """Read a named pipe; reopens after each writer disconnects"""
+
+    def __init__(self, path, follow=True):
+        self.path = path
+        self.follow = follow
+        if not os.path.exists(path):
+            os.mkfifo(path)
+        elif not stat.S_ISFIFO(os.stat(path).st_mode):
+            raise ValueError(f"{path} is not a named pipe")
+
+    def run(self, emit, stop):
+        while not stop.is_set():
+            # Blocks until a writer opens the pipe
+            with open(self.path, "rb") as pipe:
+                for line in pipe:
+                    emit(line)
+                    if stop.is_set():
+                        return
+            if not self.follow:
+                return
+            stop.wait(0.05)
+
+
+class SocketSource:
+    """Listen on TCP or a Unix socket; each connection sends NDJSON lines"""
+
+    def __init__(self, address, family=socket.AF_INET):
+        self.address = address
+        self.family = family
+        self.server = socket.socket(family, socket.SOCK_STREAM)
+        if family == socket.AF_UNIX:
+            if os.path.exists(address):
+                os.unlink(address)
+        else:
+            self.server.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.server.bind(address)
+        self.server.listen()
+        self.server.settimeout(0.2)
+
+    def _serve(self, conn, emit, stop):
+        with conn, conn.makefile("rb") as lines:
+            for line in lines:
+                emit(line)
+                if stop.is_set():
+                    return
+
+    def run(self, emit, stop):
+        try:
+            while not stop.is_set():
+                try:
+                    conn, _ = self.server.accept()
+                except socket.timeout:
+                    continue
+                conn.settimeout(None)
+                threading.Thread(target=self._serve, args=(conn, emit, stop), daemon=True).start()
+        finally:
+            self.server.close()
+            if self.family == socket.AF_UNIX and os.path.exists(self.address):
+                os.unlink(self.address)
+
+
+def open_source(spec, follow=True, from_end=False):
+    """Build a source from ``file:``, ``fifo:``, ``tcp:`` or ``unix:`` specs"""
+    kind, _, target = spec.partition(":")
+    if kind == "file":
+        return FileTailSource(target, from_end=from_end, follow=follow)
+    if kind == "fifo":
+        return FifoSource(target, follow=follow)
+    if kind == "tcp":
+        host, _, port = target.rpartition(":")
+        return SocketSource((host or "127.0.0.1", int(port)))
+    if kind == "unix":
+        return SocketSource(target, socket.AF_UNIX)
+    raise ValueError(f"Unknown source {spec!r} (expected file:, fifo:, tcp: or unix:)")
+
+
+# -- consumer ---------------------------------------------------------------
+
+class IngestConsumer:
+    """Bounded reader -> scorer -> writer pipeline with adaptive micro-batches"""
+
+    def __init__(self, model, source, output, queue_size=10000, output_queue_size=10000,
+                 min_batch=1, max_batch=2048, target_batch_ms=500.0, max_wait_ms=20.0,
+                 threshold=DECISION_THRESHOLD, dedupe=None):
+        self.model = model
+        self.source = source
+        self.output = output
+        self.min_batch = min_batch
+        self.max_batch = max_batch
+        self.target_batch_s = target_batch_ms / 1e3
+        self.max_wait_s = max_wait_ms / 1e3
+        self.threshold = threshold
+        self.state = StreamState()
+        self.dedupe = dedupe
+        self.validator = TransactionValidator()
+
+        self.inbox = queue.Queue(queue_size)
+        self.outbox = queue.Queue(output_queue_size)
+        self.stop_event = threading.Event()
+        self._lock = threading.Lock()
+        self._threads = []
+
+        self.batch_size = min_batch
+        self.received = 0
+        self.scored = 0
+        self.errors = 0
+        self.duplicates = 0
+        self.batches = 0
+        self.written = 0
+        self.read_blocked_s = 0.0
+        self.write_blocked_s = 0.0
+        self.started_at = None
+        self.latencies = deque(maxlen=20000)
+        self.batch_sizes = deque(maxlen=1000)
+        self._recent = deque()  # (time, rows written) for the throughput window
+
+    # -- back-pressured queue puts ----------------------------------------
+
+    def _put(self, q, item, counter):
+        try:
+            q.put_nowait(item)
+            return
+        except queue.Full:
+            pass
+        start = time.perf_counter()
+        while not self.stop_event.is_set():
+            try:
+                q.put(item, timeout=0.1)
+                break
+            except queue.Full:
+                continue
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + time.perf_counter() - start)
+
+    def _emit(self, line):
+        with self._lock:
+            self.received += 1
+        self._put(self.inbox, (line, time.perf_counter()), "read_blocked_s")
+
+    # -- threads ----------------------------------------------------------
+
+    def _read(self):
+        try:
+            self.source.run(self._emit, self.stop_event)
+        finally:
+            self.inbox.put(_STOP)
+
+    def _next_batch(self):
+        """Block for one line, then take what arrives within max_wait up to batch_size"""
+        first = self.inbox.get()
+        if first is _STOP:
+            return None, True
+        batch = [first]
+        deadline = time.perf_counter() + self.max_wait_s
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.perf_counter()
+            try:
+                item = self.inbox.get_nowait() if remaining <= 0 else self.inbox.get(timeout=remaining)
+            except queue.Empty:
+                break
+            if item is _STOP:
+                return batch, True
+            batch.append(item)
+        return batch, False
+
+    def _score(self):
+        try:
+            while True:
+                batch, finished = self._next_batch()
+                if batch:
+                    start = time.perf_counter()
+                    lines = self.process([line for line, _ in batch])
+                    self._adapt(len(batch), time.perf_counter() - start)
+                    self._put(self.outbox, (lines, [read_at for _, read_at in batch]), "write_blocked_s")
+                if finished:
+                    break
+        finally:
+            self.outbox.put(_STOP)
+
+    def _adapt(self, n, elapsed):
+        """Grow the batch cap while full batches stay under target_batch_ms, halve it when over"""
+        if elapsed > self.target_batch_s:
+            self.batch_size = max(self.batch_size // 2, self.min_batch)
+        elif n >= self.batch_size:
+            self.batch_size = min(self.batch_size * 2, self.max_batch)
+        with self._lock:
+            self.batches += 1
+            self.batch_sizes.append(n)
+
+    def _write(self):
+        while True:
+            item = self.outbox.get()
+            if item is _STOP:
+                break
+            lines, read_times = item
+            self.output.write("".join(lines))
+            self.output.flush()
+            now = time.perf_counter()
+            with self._lock:
+                self.written += len(lines)
+                self.latencies.extend(now - t for t in read_times)
+                self._recent.append((now, len(lines)))
+
+    # -- processing -------------------------------------------------------
+
+    def process(self, raw_lines):
+        """Score a batch of raw NDJSON lines; returns one output line per input line"""
+        records, positions, out, errors = [], [], [None] * len(raw_lines), set()
+        for i, line in enumerate(raw_lines):
+            try:
+                record = json.loads(line)
+            except ValueError as e:
+                out[i] = self._error_line(None, f"invalid JSON: {e}", i, errors)
+                continue
+            if not isinstance(record, dict):
+                out[i] = self._error_line(None, "expected a JSON object", i, errors)
+                continue
+            missing = [field for field in REQUIRED_FIELDS if field not in record]
+            if missing:
+                out[i] = self._error_line(record.get("transaction_id"), f"missing fields: {missing}", i, errors)
+                continue
+            records.append(record)
+            positions.append(i)
+
+        # Retried messages are answered but not scored, so they cannot inflate velocity or IP counts
+        duplicates = 0
+        if self.dedupe is not None and records:
+            records, positions, duplicates = self._drop_duplicates(records, positions, out)
+
+        if records:
+            try:
+                self._score_records(records, positions, out, errors)
+            except Exception:
+                # Find the offending rows one by one; the rest are still scored
+                for record, i in zip(records, positions):
+                    try:
+                        self._score_records([record], [i], out, errors)
+                    except Exception as e:
+                        out[i] = self._error_line(record.get("transaction_id"), f"{type(e).__name__}: {e}", i, errors)
+
+        # Only rows that got a decision count as seen; a rejected message can be corrected and retried
+        if self.dedupe is not None:
+            self.dedupe.add([str(record["transaction_id"]) for record, i in zip(records, positions)
+                             if i not in errors and record.get("transaction_id") is not None])
+
+        with self._lock:
+            self.errors += len(errors)
+            self.duplicates += duplicates
+            self.scored += len(out) - len(errors) - duplicates
+        return out
+
+    def _drop_duplicates(self, records, positions, out):
+        """Records whose transaction_id has not been seen; records without one are kept"""
+        with_id = [j for j, record in enumerate(records) if record.get("transaction_id") is not None]
+        status = self.dedupe.check([str(records[j]["transaction_id"]) for j in with_id], remember=False)
+        keep = np.ones(len(records), dtype=bool)
+        keep[with_id] = self.dedupe.keep(status)
+        for j, code in zip(with_id, status):
+            if not keep[j]:
+                out[positions[j]] = json.dumps({"transaction_id": records[j]["transaction_id"],
+                                                "skipped": STATUS_NAMES[code]}) + "\n"
+        kept = np.flatnonzero(keep)
+        return [records[j] for j in kept], [positions[j] for j in kept], len(records) - len(kept)
+
+    def _score_records(self, records, positions, out, errors):
+        raw = pd.DataFrame.from_records(records)
+        checked = self.validator.validate(raw)
+        for row, message in checked.messages().items():
+            out[positions[row]] = self._error_line(records[row].get("transaction_id"), f"invalid fields: {message}",
+                                                   positions[row], errors)
+        if not checked.valid.any():
+            return
+        cleaned = clean_transactions(checked.data[checked.valid])
+        # Velocity and IP counts are stored only once the batch has been scored; a failed batch is retried row by row
+        pending = self.state.pending()
+        features = self.state.apply(cleaned, pending)
+        result = score_transactions(self.model, features[MODEL_COLUMNS], self.threshold)
+        result.insert(0, "transaction_id", raw.loc[result.index, "transaction_id"].to_numpy()
+                      if "transaction_id" in raw.columns else None)
+
+        scored = result.to_json(orient="records", lines=True).splitlines()
+        for row, line in zip(result.index, scored):
+            out[positions[row]] = line + "\n"
+        # Cleaning drops rows without a usable timestamp or amount
+        for row in raw.index[checked.valid].difference(result.index):
+            out[positions[row]] = self._error_line(records[row].get("transaction_id"), "dropped by cleaning",
+                                                   positions[row], errors)
+        self.state.commit(pending)
+
+    @staticmethod
+    def _error_line(transaction_id, message, position, errors):
+        errors.add(position)
+        return json.dumps({"transaction_id": transaction_id, "error": message}) + "\n"
+
+    # -- lifecycle --------------------------------------------------------
+
+    def start(self):
+        self.started_at = time.perf_counter()
+        for target, name in [(self._read, "ingest-read"), (self._score, "ingest-score"), (self._write, "ingest-write")]:
+            thread = threading.Thread(target=target, name=name, daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        return self
+
+    def stop(self, timeout=10.0):
+        """Stop reading; lines already queued are still scored and written"""
+        self.stop_event.set()
+        reader = self._threads[0]
+        reader.join(1.0)
+        if reader.is_alive():
+            # Reader is stuck waiting for a writer (e.g. a pipe open); end the batch loop anyway
+            self.inbox.put(_STOP)
+        self.join(timeout)
+
+    def join(self, timeout=None):
+        for thread in self._threads:
+            thread.join(timeout)
+
+    def stats(self):
+        now = time.perf_counter()
+        with self._lock:
+            while self._recent and now - self._recent[0][0] > 5.0:
+                self._recent.popleft()
+            latencies = np.array(self.latencies) * 1e3
+            elapsed = now - self.started_at if self.started_at else 0.0
+            stats = {
+                "received": self.received,
+                "scored": self.scored,
+                "errors": self.errors,
+                "duplicates": self.duplicates,
+                "written": self.written,
+                "in_queue": self.inbox.qsize(),
+                "out_queue": self.outbox.qsize(),
+                "batches": self.batches,
+                "batch_size_next": self.batch_size,
+                "batch_size_p50": float(np.median(self.batch_sizes)) if self.batch_sizes else None,
+                "throughput_per_s": self.written / elapsed if elapsed else 0.0,
+                "recent_throughput_per_s": sum(n for _, n in self._recent) / 5.0,
+                "lag_p50_ms": float(np.percentile(latencies, 50)) if len(latencies) else None,
+                "lag_p99_ms": float(np.percentile(latencies, 99)) if len(latencies) else None,
+                "read_blocked_s": self.read_blocked_s,
+                "write_blocked_s": self.write_blocked_s,
+            }
+        if isinstance(self.source, FileTailSource):
+            stats["source_lag_bytes"] = self.source.lag_bytes()
+        return stats
+
+
+def format_stats(stats):
+    lag = "n/a" if stats["lag_p50_ms"] is None else f"{stats['lag_p50_ms']:.1f}/{stats['lag_p99_ms']:.1f} ms"
+    return (f"read {stats['received']} scored {stats['scored']} errors {stats['errors']} "
+            f"duplicates {stats['duplicates']} | "
+            f"queue {stats['in_queue']}/{stats['out_queue']} | batch~{stats['batch_size_p50']} | "
+            f"{stats['recent_throughput_per_s']:.0f} txn/s | lag p50/p99 {lag} | "
+            f"back-pressure {stats['read_blocked_s']:.2f}s")
+
+
+# -- stand-in producer ------------------------------------------------------
+
+def ndjson_lines(paths=RAW_PATHS, limit=None):
+    """Raw transactions as NDJSON lines, in timestamp order"""
+    raw = pd.concat([pd.read_csv(path) for path in paths], ignore_index=True)
+    order = pd.to_datetime(raw["timestamp"], errors="coerce", utc=True, format="mixed").argsort(kind="stable")
+    raw = raw.iloc[order]
+    if limit is not None:
+        raw = raw.iloc[:limit]
+    return [line + "\n" for line in raw.to_json(orient="records", lines=True).splitlines()]
+
+
+def _open_target(spec):
+    """File-like object for writing to a file, pipe or socket spec"""
+    kind, _, target = spec.partition(":")
+    if kind in ("file", "fifo"):
+        if kind == "fifo" and not os.path.exists(target):
+            os.mkfifo(target)
+        return open(target, "a" if kind == "file" else "w", buffering=1), None
+    if kind in ("tcp", "unix"):
+        if kind == "tcp":
+            host, _, port = target.rpartition(":")
+            conn = socket.create_connection((host or "127.0.0.1", int(port)), timeout=10)
+        else:
+            conn = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            conn.connect(target)
+        conn.settimeout(None)
+        return conn.makefile("w", buffering=1), conn
+    raise ValueError(f"Unknown target {spec!r}")
+
+
+def produce(spec, lines, rate=None, chunk=64):
+    """Send lines to a target at ``rate`` lines per second (as fast as possible if None)"""
+    writer, conn = _open_target(spec)
+    start = time.perf_counter()
+    try:
+        for offset in range(0, len(lines), chunk):
+            writer.write("".join(lines[offset:offset + chunk]))
+            writer.flush()
+            if rate:
+                wait = (offset + chunk) / rate - (time.perf_counter() - start)
+                if wait > 0:
+                    time.sleep(wait)
+    finally:
+        writer.close()
+        if conn is not None:
+            conn.close()
+    return time.perf_counter() - start
+
+
+# -- CLI --------------------------------------------------------------------
+
+def _add_consumer_args(parser):
+    parser.add_argument("--model", default=MODEL_PATH)
+    parser.add_argument("--queue-size", type=int, default=10000)
+    parser.add_argument("--max-batch", type=int, default=2048)
+    parser.add_argument("--target-batch-ms", type=float, default=500.0)
+    parser.add_argument("--max-wait-ms", type=float, default=20.0)
+    parser.add_argument("--dedupe-capacity", type=int, default=250_000,
+                        help="Expected transaction IDs per 45-minute dedupe partition (0 turns dedupe off)")
+    parser.add_argument("--keep-probable-duplicates", action="store_true",
+                        help="Score IDs only the Bloom filter has seen instead of skipping them")
+
+
+def _consumer(args, source, output):
+    dedupe = None
+    if args.dedupe_capacity > 0:
+        dedupe = Deduplicator(args.dedupe_capacity, drop_probable=not args.keep_probable_duplicates)
+    return IngestConsumer(load_pipeline(args.model), source, output, queue_size=args.queue_size,
+                          output_queue_size=args.queue_size, max_batch=args.max_batch,
+                          target_batch_ms=args.target_batch_ms, max_wait_ms=args.max_wait_ms, dedupe=dedupe)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Stream NDJSON transactions through the scorer")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    consume = sub.add_parser("consume", help="Run the consumer until interrupted")
+    consume.add_argument("--source", required=True, help="file:PATH, fifo:PATH, tcp:HOST:PORT or unix:PATH")
+    consume.add_argument("--output", default="-", help="Decisions NDJSON file ('-' for stdout)")
+    consume.add_argument("--from-end", action="store_true", help="Tail a file from its current end")
+    consume.add_argument("--no-follow", action="store_true", help="Exit at end of file / pipe")
+    consume.add_argument("--report-seconds", type=float, default=5.0)
+    _add_consumer_args(consume)
+
+    prod = sub.add_parser("produce", help="Stand-in producer replaying the raw CSVs")
+    prod.add_argument("--target", required=True)
+    prod.add_argument("--rate", type=float, default=None, help="Lines per second (default: max speed)")
+    prod.add_argument("--limit", type=int, default=None)
+    prod.add_argument("--data", nargs="+", default=RAW_PATHS)
+
+    bench = sub.add_parser("bench", help="Producer and consumer in one process")
+    bench.add_argument("--source", choices=["tcp", "unix", "fifo", "file"], default="tcp")
+    bench.add_argument("--rate", type=float, default=None)
+    bench.add_argument("--repeat", type=int, default=1, help="Send the raw history this many times")
+    _add_consumer_args(bench)
+    args = parser.parse_args()
+
+    if args.command == "produce":
+        lines = ndjson_lines(args.data, args.limit)
+        elapsed = produce(args.target, lines, args.rate)
+        print(f"sent {len(lines)} transactions in {elapsed:.2f}s ({len(lines) / elapsed:.0f}/s)", file=sys.stderr)
+        return
+
+    if args.command == "consume":
+        source = open_source(args.source, follow=not args.no_follow, from_end=args.from_end)
+        output = sys.stdout if args.output == "-" else open(args.output, "a")
+        consumer = _consumer(args, source, output).start()
+        try:
+            while any(thread.is_alive() for thread in consumer._threads):
+                consumer.join(args.report_seconds)
+                print(format_stats(consumer.stats()), file=sys.stderr)
+        except KeyboardInterrupt:
+            consumer.stop()
+        print(format_stats(consumer.stats()), file=sys.stderr)
+        return
+
+    lines = ndjson_lines() * args.repeat
+    with tempfile.TemporaryDirectory() as tmp:
+        spec = {
+            "tcp": "tcp:127.0.0.1:0",
+            "unix": f"unix:{os.path.join(tmp, 'ingest.sock')}",
+            "fifo": f"fifo:{os.path.join(tmp, 'ingest.fifo')}",
+            "file": f"file:{os.path.join(tmp, 'ingest.ndjson')}",
+        }[args.source]
+        source = open_source(spec, follow=False)
+        if args.source == "tcp":
+            spec = f"tcp:127.0.0.1:{source.server.getsockname()[1]}"
+        output = open(os.path.join(tmp, "decisions.ndjson"), "w")
+        if args.source == "file":
+            produce(spec, lines)  # the tail source stops at end of file in the bench
+        consumer = _consumer(args, source, output).start()
+
+        start = time.perf_counter()
+        producer = threading.Thread(target=produce, args=(spec, [] if args.source == "file" else lines, args.rate),
+                                    daemon=True)
+        producer.start()
+        while consumer.written < len(lines):
+            time.sleep(1.0)
+            print(format_stats(consumer.stats()))
+        elapsed = time.perf_counter() - start
+        producer.join()
+        consumer.stop()
+        output.close()
+
+    stats = consumer.stats()
+    print(f"\n{len(lines)} transactions over {args.source}: {elapsed:.2f}s end to end "
+          f"({len(lines) / elapsed:.0f} txn/s), {stats['errors']} errors, {stats['duplicates']} duplicates skipped, "
+          f"{stats['batches']} batches "
+          f"(median {stats['batch_size_p50']:.0f} rows)")
+    print(f"lag read -> written: p50 {stats['lag_p50_ms']:.1f} ms  p99 {stats['lag_p99_ms']:.1f} ms; "
+          f"reader blocked on a full queue for {stats['read_blocked_s']:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,186 @@
+"""Incremental model refresh: grow the forest on recent labels, retire the oldest trees.
+
+A full retrain re-fits the notebook 05 pipeline, all 500 trees, on the whole
+history. A refresh keeps the fitted ``ColumnTransformer`` and the forest,
+fits ``fraction * n_estimators`` new trees on recent labelled transactions
+with ``warm_start`` and drops the same number of the oldest trees, so the
+forest keeps its size. ``estimators_`` stays in age order (new trees are
+appended), so repeated refreshes always retire the oldest generation.
+
+The refreshed pipeline is written as a new version under ``Model/versions``,
+where the registry picks it up.
+
+Usage:
+    python -m novapay.refresh refresh --recent-days 180 --fraction 0.2
+    python -m novapay.refresh compare --fraction 0.2
+"""
+import argparse
+import copy
+import os
+import time
+from datetime import datetime, timezone
+
+import joblib
+import numpy as np
+import pandas as pd
+from sklearn.compose import ColumnTransformer
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.metrics import average_precision_score, roc_auc_score
+from sklearn.pipeline import Pipeline
+from sklearn.preprocessing import OneHotEncoder
+
+from novapay.features import CATEGORICAL_COLUMNS, NUMERIC_COLUMNS, build_model_frame
+from novapay.registry import MODEL_DIR, MODEL_FILE
+from novapay.scoring import DECISION_THRESHOLD, MODEL_PATH, load_pipeline, score_transactions
+
+
+def new_pipeline(n_estimators=500, random_state=42):
+    """Unfitted notebook 05 pipeline: one-hot + passthrough, class-weighted random forest"""
+    preprocess = ColumnTransformer(
+        transformers=[
+            ("cat", OneHotEncoder(handle_unknown="ignore", sparse_output=False), CATEGORICAL_COLUMNS),
+            ("num", "passthrough", NUMERIC_COLUMNS),
+        ],
+        remainder="drop",
+    )
+    model = RandomForestClassifier(
+        n_estimators=n_estimators,
+        class_weight={0: 1.0, 1: 3},
+        random_state=random_state,
+        n_jobs=-1,
+    )
+    return Pipeline(steps=[("preprocess", preprocess), ("model", model)])
+
+
+def load_time_ordered(path="Data/Nova_CleanedEDA_df.csv"):
+    """Model input, labels and timestamps of a cleaned CSV, oldest first"""
+    df = pd.read_csv(path)
+    df["timestamp"] = pd.to_datetime(df["timestamp"], utc=True, format="mixed")
+    df = df.sort_values("timestamp", kind="stable").reset_index(drop=True)
+    return build_model_frame(df), df["is_fraud"].astype(int).to_numpy(), df["timestamp"]
+
+
+def refresh_forest(pipeline, X_recent, y_recent, fraction=0.2, random_state=None):
+    """Copy of ``pipeline`` with ``fraction`` of its trees refitted on recent data.
+
+    The fitted pipeline passed in is not modified.
+    """
+    if len(np.unique(y_recent)) < 2:
+        raise ValueError("Recent data needs both legitimate and fraud labels")
+    preprocess = pipeline.named_steps["preprocess"]
+    forest = pipeline.named_steps["model"]
+    n_trees = len(forest.estimators_)
+    n_new = max(1, int(round(fraction * n_trees)))
+
+    # Shallow copy with its own tree list; the existing trees are shared, not copied
+    refreshed = copy.copy(forest)
+    refreshed.estimators_ = list(forest.estimators_)
+    if random_state is not None:
+        refreshed.set_params(random_state=random_state)
+
+    start = time.perf_counter()
+    refreshed.set_params(warm_start=True, n_estimators=n_trees + n_new)
+    refreshed.fit(preprocess.transform(X_recent), y_recent)
+    fit_seconds = time.perf_counter() - start
+
+    # Oldest trees are first in estimators_
+    refreshed.estimators_ = refreshed.estimators_[n_new:]
+    refreshed.set_params(warm_start=False, n_estimators=len(refreshed.estimators_))
+
+    info = {"trees_added": n_new, "trees_retired": n_new, "recent_rows": len(X_recent), "fit_seconds": fit_seconds}
+    return Pipeline(steps=[("preprocess", preprocess), ("model", refreshed)]), info
+
+
+def evaluate(pipeline, X, y, threshold=DECISION_THRESHOLD):
+    """Recall, precision, ROC AUC and PR AUC on labelled rows"""
+    proba = score_transactions(pipeline, X, threshold, matrix="sparse")["fraud_probability"].to_numpy()
+    declined = proba > threshold
+    tp = int((declined & (y == 1)).sum())
+    return {
+        "recall": tp / max(int(y.sum()), 1),
+        "precision": tp / max(int(declined.sum()), 1),
+        "roc_auc": roc_auc_score(y, proba),
+        "pr_auc": average_precision_score(y, proba),
+    }
+
+
+def save_version(pipeline, model_dir=MODEL_DIR, version=None):
+    """Write the pipeline as a new registry version; returns its path"""
+    version = version or datetime.now(timezone.utc).strftime("%Y-%m-%d-%H%M%S-refresh")
+    directory = os.path.join(model_dir, "versions", version)
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, MODEL_FILE)
+    # Write then rename so the registry never loads a half-written file
+    joblib.dump(pipeline, path + ".tmp")
+    os.replace(path + ".tmp", path)
+    return path
+
+
+def compare(X, y, timestamps, base_share=0.6, recent_share=0.2, fraction=0.2, n_estimators=500):
+    """Time-ordered experiment: stale base model vs refreshed vs full retrain, scored on the newest rows"""
+    n = len(X)
+    base_end = int(n * base_share)
+    recent_end = int(n * (base_share + recent_share))
+    X_base, y_base = X.iloc[:base_end], y[:base_end]
+    X_recent, y_recent = X.iloc[base_end:recent_end], y[base_end:recent_end]
+    X_test, y_test = X.iloc[recent_end:], y[recent_end:]
+
+    rows = []
+    base = new_pipeline(n_estimators)
+    start = time.perf_counter()
+    base.fit(X_base, y_base)
+    rows.append({"model": "base (stale)", "train_rows": len(X_base), "fit_seconds": time.perf_counter() - start,
+                 **evaluate(base, X_test, y_test)})
+
+    refreshed, info = refresh_forest(base, X_recent, y_recent, fraction)
+    rows.append({"model": f"refresh ({info['trees_added']} trees)", "train_rows": len(X_recent),
+                 "fit_seconds": info["fit_seconds"], **evaluate(refreshed, X_test, y_test)})
+
+    full = new_pipeline(n_estimators)
+    start = time.perf_counter()
+    full.fit(X.iloc[:recent_end], y[:recent_end])
+    rows.append({"model": "full retrain", "train_rows": recent_end, "fit_seconds": time.perf_counter() - start,
+                 **evaluate(full, X_test, y_test)})
+
+    period = f"{timestamps.iloc[recent_end].date()} to {timestamps.iloc[-1].date()}"
+    return pd.DataFrame(rows), period
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Refresh the forest on recent labelled transactions")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    refresh = sub.add_parser("refresh", help="Refresh the deployed model and save it as a new version")
+    refresh.add_argument("--model", default=MODEL_PATH)
+    refresh.add_argument("--data", default="Data/Nova_CleanedEDA_df.csv")
+    refresh.add_argument("--recent-days", type=int, default=180, help="Label window, counted back from the newest row")
+    refresh.add_argument("--fraction", type=float, default=0.2, help="Share of trees to replace")
+    refresh.add_argument("--model-dir", default=MODEL_DIR)
+    refresh.add_argument("--version", default=None)
+
+    comp = sub.add_parser("compare", help="Training time and metrics: refresh vs full retrain")
+    comp.add_argument("--data", default="Data/Nova_CleanedEDA_df.csv")
+    comp.add_argument("--fraction", type=float, default=0.2)
+    comp.add_argument("--n-estimators", type=int, default=500)
+    args = parser.parse_args()
+
+    X, y, timestamps = load_time_ordered(args.data)
+
+    if args.command == "refresh":
+        recent = (timestamps >= timestamps.iloc[-1] - pd.Timedelta(days=args.recent_days)).to_numpy()
+        pipeline, info = refresh_forest(load_pipeline(args.model), X[recent], y[recent], args.fraction)
+        path = save_version(pipeline, args.model_dir, args.version)
+        print(f"Replaced {info['trees_added']} trees using {info['recent_rows']} transactions from the last "
+              f"{args.recent_days} days ({int(y[recent].sum())} frauds) in {info['fit_seconds']:.1f}s -> {path}")
+        return
+
+    report, period = compare(X, y, timestamps, fraction=args.fraction, n_estimators=args.n_estimators)
+    pd.set_option("display.width", 200)
+    print(f"Oldest 60% -> base model, next 20% -> refresh data, newest 20% ({period}) -> evaluation")
+    print(report.to_string(index=False, float_format=lambda v: f"{v:.4f}"))
+    full_seconds = report["fit_seconds"].iloc[-1]
+    print(f"\nRefresh took {report['fit_seconds'].iloc[1] / full_seconds:.0%} of the full-retrain time.")
+
+
+if __name__ == "__main__":
+    main()
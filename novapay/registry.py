@@ -0,0 +1,500 @@
+"""Model registry with background hot reload.
+
+The registry watches a versioned model directory::
+
+    Model/
+        rf_fraud_pipeline.pkl            # used when there are no versions
+        versions/
+            2026-10-01/rf_fraud_pipeline.pkl
+            2026-10-19/rf_fraud_pipeline.pkl   # latest name wins
+
+A background thread polls for a newer version, loads it, builds its SHAP
+TreeExplainer and warms both with a dummy prediction, then swaps it in with a
+single reference assignment. Callers take ``registry.current()`` once per
+request, so in-flight requests finish on the bundle they started with.
+
+Segment models live next to the global one, one directory per segment::
+
+    Model/segments/
+        home_country=US/rf_fraud_pipeline.pkl
+        channel=ATM/rf_fraud_pipeline.pkl
+
+``SegmentedRegistry`` routes each transaction to the first segment in
+``SEGMENT_DIMENSIONS`` order that has a model, and otherwise to the global
+model. Segment bundles are loaded on first use and kept in an LRU bounded by
+the size of their tree arrays (forest plus explainer). Replacing a segment's
+file reloads it on the next request. Segment models must take the same input
+columns as the global one.
+
+Usage:
+    python -m novapay.registry --watch
+    python -m novapay.registry --bench-segments --cache-mb 120
+"""
+import argparse
+import os
+import shutil
+import tempfile
+import threading
+import time
+from collections import OrderedDict, deque
+from dataclasses import dataclass
+
+import joblib
+import numpy as np
+import pandas as pd
+
+from novapay.features import MODEL_COLUMNS, build_model_frame
+from novapay.scoring import score_transactions
+
+try:
+    import shap
+    SHAP_AVAILABLE = True
+except ImportError:
+    SHAP_AVAILABLE = False
+
+MODEL_DIR = "Model"
+MODEL_FILE = "rf_fraud_pipeline.pkl"
+SEGMENTS_DIR = os.path.join(MODEL_DIR, "segments")
+
+# Routing priority: a transaction goes to the first of these with a segment model
+SEGMENT_DIMENSIONS = ["home_country", "channel"]
+DEFAULT_CACHE_BYTES = 256 * 1024 ** 2
+
+# A representative transaction used to warm a freshly loaded model
+WARMUP_ROW = {
+    "home_country": "US", "source_currency": "USD", "dest_currency": "CAD", "channel": "WEB",
+    "ip_country": "US", "kyc_tier": "STANDARD", "time_of_day": "afternoon", "currency_pair": "USD_CAD",
+    "amount_src": 100.0, "amount_usd": 100.0, "fee": 2.0, "exchange_rate_src_to_dest": 1.35,
+    "new_device": 0, "location_mismatch": 0, "ip_risk_score": 0.3, "account_age_days": 100,
+    "device_trust_score": 0.7, "chargeback_history_count": 0, "risk_score_internal": 0.3,
+    "txn_velocity_1h": 0, "txn_velocity_24h": 0, "corridor_risk": 0.0, "day_of_week": 2,
+    "is_weekend": 0, "is_night": 0, "High risk device": 0.0, "ip_usage_count": 1,
+    "velocity_ratio": 0.0, "fee_ratio": 0.02, "amount_velocity_interaction": 0.0,
+    "device_ip_risk": 0.21, "new_device_velocity": 0, "amount_usd_capped": 100.0,
+    "log_amount_usd": 4.615, "log_fee": 1.099, "new_device_high_velocity": 0,
+    "young_account_high_amount": 0, "ip_location_risk": 0,
+}
+
+
+def warmup_frame():
+    return pd.DataFrame([WARMUP_ROW])[MODEL_COLUMNS]
+
+
+@dataclass(frozen=True)
+class ModelBundle:
+    """A loaded pipeline and its explainer, tagged with the version they came from"""
+
+    version: str
+    path: str
+    pipeline: object
+    explainer: object
+    loaded_at: float
+    load_seconds: float
+    warm_seconds: float
+
+
+def load_bundle(version, path, with_explainer=True):
+    """Load, explain and warm one model version"""
+    start = time.perf_counter()
+    pipeline = joblib.load(path)
+    explainer = None
+    if with_explainer and SHAP_AVAILABLE:
+        explainer = shap.TreeExplainer(pipeline.named_steps["model"])
+    loaded = time.perf_counter()
+
+    # First calls pay for lazy initialisation; do that before serving traffic
+    row = warmup_frame()
+    pipeline.predict_proba(row)
+    if explainer is not None:
+        explainer(pipeline.named_steps["preprocess"].transform(row))
+    warmed = time.perf_counter()
+
+    return ModelBundle(
+        version=version,
+        path=path,
+        pipeline=pipeline,
+        explainer=explainer,
+        loaded_at=time.time(),
+        load_seconds=loaded - start,
+        warm_seconds=warmed - loaded,
+    )
+
+
+def available_versions(model_dir=MODEL_DIR, settle_seconds=1.0):
+    """Return [(version, path), ...] of complete models, newest first"""
+    versions_dir = os.path.join(model_dir, "versions")
+    candidates = []
+    if os.path.isdir(versions_dir):
+        for name in os.listdir(versions_dir):
+            path = os.path.join(versions_dir, name, MODEL_FILE)
+            if os.path.isfile(path):
+                candidates.append((name, path))
+    if not candidates:
+        path = os.path.join(model_dir, MODEL_FILE)
+        if not os.path.isfile(path):
+            return []
+        stat = os.stat(path)
+        candidates.append((f"base-{int(stat.st_mtime)}-{stat.st_size}", path))
+
+    # Skip files that may still be being written
+    now = time.time()
+    ready = [(v, p) for v, p in candidates if now - os.path.getmtime(p) >= settle_seconds]
+    return sorted(ready, reverse=True)
+
+
+class ModelRegistry:
+    """Serve the current model bundle and hot-swap newer versions in the background"""
+
+    def __init__(self, model_dir=MODEL_DIR, poll_seconds=5.0, with_explainer=True):
+        self.model_dir = model_dir
+        self.poll_seconds = poll_seconds
+        self.with_explainer = with_explainer
+        self.reloads = []
+        self.last_error = None
+        self._bundle = None
+        self._failed = set()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def current(self):
+        """The bundle to use for one request (hold on to it until the request ends)"""
+        return self._bundle
+
+    def score(self, input_data, **kwargs):
+        """score_transactions() on the current bundle, tagging each row with its model version"""
+        bundle = self.current()
+        if bundle is None:
+            raise RuntimeError(f"No model available in {self.model_dir}")
+        result = score_transactions(bundle.pipeline, input_data, **kwargs)
+        result["model_version"] = bundle.version
+        return result
+
+    def refresh(self):
+        """Serve the newest loadable version if it differs from the current one"""
+        with self._lock:
+            for version, path in available_versions(self.model_dir):
+                if version in self._failed:
+                    continue
+                if self._bundle is not None and self._bundle.version == version:
+                    return False
+                try:
+                    bundle = load_bundle(version, path, self.with_explainer)
+                except Exception as e:
+                    # Never retry a broken version; fall back to the next newest
+                    self._failed.add(version)
+                    self.last_error = f"{version}: {e}"
+                    continue
+
+                previous = self._bundle
+                self._bundle = bundle  # atomic swap
+                self.reloads.append({
+                    "version": version,
+                    "previous_version": previous.version if previous else None,
+                    "load_seconds": bundle.load_seconds,
+                    "warm_seconds": bundle.warm_seconds,
+                    "swapped_at": bundle.loaded_at,
+                })
+                return True
+            return False
+
+    def start(self):
+        """Load the current version now and keep watching in a daemon thread"""
+        self.refresh()
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._watch, name="model-registry", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _watch(self):
+        while not self._stop.wait(self.poll_seconds):
+            self.refresh()
+
+    def status(self):
+        bundle = self._bundle
+        return {
+            "version": bundle.version if bundle else None,
+            "loaded_at": bundle.loaded_at if bundle else None,
+            "load_seconds": bundle.load_seconds if bundle else None,
+            "warm_seconds": bundle.warm_seconds if bundle else None,
+            "reloads": len(self.reloads),
+            "last_error": self.last_error,
+        }
+
+
+def bundle_bytes(bundle):
+    """Bytes held by a bundle's tree arrays (forest plus explainer); file size for other models"""
+    estimators = getattr(bundle.pipeline.named_steps["model"], "estimators_", None)
+    if estimators is None:
+        return os.path.getsize(bundle.path)
+    total = 0
+    for estimator in estimators:
+        state = estimator.tree_.__getstate__()
+        total += state["nodes"].nbytes + state["values"].nbytes
+    if bundle.explainer is not None:
+        for tree in bundle.explainer.model.trees:
+            total += sum(v.nbytes for v in vars(tree).values() if isinstance(v, np.ndarray))
+    return total
+
+
+def available_segments(segments_dir=SEGMENTS_DIR, settle_seconds=1.0):
+    """Return {"dimension=value": (version, path)} for the segment models on disk"""
+    segments = {}
+    if not os.path.isdir(segments_dir):
+        return segments
+    now = time.time()
+    for name in os.listdir(segments_dir):
+        path = os.path.join(segments_dir, name, MODEL_FILE)
+        if "=" not in name or not os.path.isfile(path):
+            continue
+        stat = os.stat(path)
+        if now - stat.st_mtime >= settle_seconds:
+            segments[name] = (f"{name}-{int(stat.st_mtime)}-{stat.st_size}", path)
+    return segments
+
+
+class SegmentedRegistry:
+    """Route transactions to per-segment models, loaded lazily into a memory-bounded LRU"""
+
+    def __init__(self, fallback, segments_dir=SEGMENTS_DIR, dimensions=SEGMENT_DIMENSIONS,
+                 max_bytes=DEFAULT_CACHE_BYTES, poll_seconds=5.0, with_explainer=True):
+        self.fallback = fallback  # ModelRegistry serving the global model
+        self.segments_dir = segments_dir
+        self.dimensions = list(dimensions)
+        self.max_bytes = max_bytes
+        self.poll_seconds = poll_seconds
+        self.with_explainer = with_explainer
+        self.hits = 0
+        self.loads = 0
+        self.evictions = 0
+        self.fallbacks = 0
+        self.load_seconds = deque(maxlen=1000)
+        self.last_error = None
+        self._cache = OrderedDict()  # segment -> (bundle, bytes), least recently used first
+        self._cache_bytes = 0
+        self._segments = {}
+        self._scanned_at = None
+        self._failed = set()
+        self._loading = {}
+        self._lock = threading.Lock()
+
+    def segments(self):
+        """Segment models on disk, rescanned at most every ``poll_seconds``"""
+        now = time.monotonic()
+        if self._scanned_at is None or now - self._scanned_at >= self.poll_seconds:
+            self._segments = available_segments(self.segments_dir)
+            self._scanned_at = now
+        return self._segments
+
+    def route(self, transaction):
+        """Segment name for one transaction (a dict or row), or None for the global model"""
+        segments = self.segments()
+        for dimension in self.dimensions:
+            name = f"{dimension}={transaction.get(dimension)}"
+            if name in segments:
+                return name
+        return None
+
+    def route_frame(self, df):
+        """Segment name per row of a DataFrame (None where the global model applies)"""
+        segments = self.segments()
+        names = np.full(len(df), None, dtype=object)
+        for dimension in self.dimensions:
+            if dimension not in df.columns:
+                continue
+            values = df[dimension].astype(str)
+            candidates = (dimension + "=" + values).to_numpy(dtype=object)
+            hit = pd.isna(names) & np.isin(candidates, list(segments))
+            names[hit] = candidates[hit]
+        return names
+
+    def _load(self, name):
+        """Cached bundle of a segment, loading it on a miss; None when it cannot be loaded"""
+        entry = self.segments().get(name)
+        if entry is None:
+            return None
+        version, path = entry
+        with self._lock:
+            cached = self._cache.get(name)
+            if cached is not None and cached[0].version == version:
+                self._cache.move_to_end(name)
+                self.hits += 1
+                return cached[0]
+            if version in self._failed:
+                return None
+            loading = self._loading.setdefault(name, threading.Lock())
+
+        # One load per segment at a time; later callers wait for it and then hit the cache
+        with loading:
+            with self._lock:
+                cached = self._cache.get(name)
+                if cached is not None and cached[0].version == version:
+                    self._cache.move_to_end(name)
+                    self.hits += 1
+                    return cached[0]
+            try:
+                bundle = load_bundle(version, path, self.with_explainer)
+            except Exception as e:
+                with self._lock:
+                    self._failed.add(version)
+                    self.last_error = f"{version}: {e}"
+                return None
+            size = bundle_bytes(bundle)
+            with self._lock:
+                previous = self._cache.pop(name, None)
+                if previous is not None:
+                    self._cache_bytes -= previous[1]
+                self._cache[name] = (bundle, size)
+                self._cache_bytes += size
+                self.loads += 1
+                self.load_seconds.append(bundle.load_seconds + bundle.warm_seconds)
+                self._evict(keep=name)
+        return bundle
+
+    def _evict(self, keep):
+        """Drop least recently used bundles until the cache fits (the newest always stays)"""
+        while self._cache_bytes > self.max_bytes and len(self._cache) > 1:
+            name, (_, size) = next(iter(self._cache.items()))
+            if name == keep:
+                break
+            del self._cache[name]
+            self._cache_bytes -= size
+            self.evictions += 1
+
+    def bundle_for(self, transaction, fallback=None):
+        """Bundle to use for one transaction: its segment model, else ``fallback`` or the global model"""
+        name = self.route(transaction)
+        bundle = self._load(name) if name is not None else None
+        if bundle is None:
+            with self._lock:
+                self.fallbacks += 1
+            bundle = fallback if fallback is not None else self.fallback.current()
+        return bundle
+
+    def score(self, input_data, **kwargs):
+        """score_transactions() per segment, tagging each row with the model version that scored it"""
+        names = self.route_frame(input_data)
+        keys = np.where(pd.isna(names), "", names).astype(str)
+        fallback = self.fallback.current()
+        parts = []
+        for name in np.unique(keys):
+            rows = np.flatnonzero(keys == name)
+            bundle = self._load(name) if name else None
+            if bundle is None:
+                with self._lock:
+                    self.fallbacks += len(rows)
+                bundle = fallback
+            if bundle is None:
+                raise RuntimeError(f"No model available for segment {name or 'global'}")
+            result = score_transactions(bundle.pipeline, input_data.iloc[rows], **kwargs)
+            result["model_version"] = bundle.version
+            result.index = rows
+            parts.append(result)
+        result = pd.concat(parts).sort_index()
+        result.index = input_data.index
+        return result
+
+    def stats(self):
+        with self._lock:
+            requests = self.hits + self.loads
+            load_ms = np.array(self.load_seconds) * 1e3
+            return {
+                "segments": len(self._segments),
+                "loaded": list(self._cache),
+                "cache_mb": self._cache_bytes / 1e6,
+                "max_mb": self.max_bytes / 1e6,
+                "hits": self.hits,
+                "loads": self.loads,
+                "evictions": self.evictions,
+                "fallbacks": self.fallbacks,
+                "hit_rate": self.hits / requests if requests else None,
+                "load_ms_p50": float(np.median(load_ms)) if len(load_ms) else None,
+                "failed": len(self._failed),
+                "last_error": self.last_error,
+            }
+
+
+def bench_segments(args):
+    """Stream labelled history through a segmented registry whose cache holds only some segments"""
+    history = pd.read_csv(args.data).iloc[:args.rows]
+    X = build_model_frame(history)
+    registry = ModelRegistry(args.model_dir).start()
+    with tempfile.TemporaryDirectory() as tmp:
+        # Copies of the global model stand in for trained segment models: routing and caching are what is measured
+        source = registry.current().path
+        for name in args.segments:
+            os.makedirs(os.path.join(tmp, name))
+            shutil.copyfile(source, os.path.join(tmp, name, MODEL_FILE))
+            os.utime(os.path.join(tmp, name, MODEL_FILE), (time.time() - 60, time.time() - 60))
+        segmented = SegmentedRegistry(registry, tmp, max_bytes=args.cache_mb * 1e6)
+
+        latencies = {"hit": [], "load": [], "global": []}
+        for i in range(len(X)):
+            row = X.iloc[i:i + 1]
+            loads = segmented.loads
+            start = time.perf_counter()
+            bundle = segmented.bundle_for(row.iloc[0])
+            bundle.pipeline.predict_proba(row)
+            elapsed = (time.perf_counter() - start) * 1e3
+            kind = "load" if segmented.loads > loads else "global" if bundle is registry.current() else "hit"
+            latencies[kind].append(elapsed)
+
+        stats = segmented.stats()
+        routed = pd.Series(segmented.route_frame(X)).fillna("global").value_counts()
+        print(f"{len(X):,} transactions over {len(args.segments)} segment models, cache {args.cache_mb:.0f} MB")
+        print("routed: " + ", ".join(f"{name} {count:,}" for name, count in routed.items()))
+        print(f"loads {stats['loads']}  hits {stats['hits']:,}  evictions {stats['evictions']}  "
+              f"fallbacks {stats['fallbacks']:,}  hit rate {stats['hit_rate']:.2%}  "
+              f"load+warm p50 {stats['load_ms_p50']:.0f} ms")
+        print(f"resident: {', '.join(stats['loaded'])} ({stats['cache_mb']:.1f} MB)")
+        for kind, values in latencies.items():
+            if values:
+                print(f"{kind:>6}: {len(values):,} requests, p50 {np.median(values):.1f} ms, "
+                      f"p99 {np.percentile(values, 99):.1f} ms")
+    registry.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load the latest model version and report reload times")
+    parser.add_argument("--model-dir", default=MODEL_DIR)
+    parser.add_argument("--poll-seconds", type=float, default=5.0)
+    parser.add_argument("--watch", action="store_true", help="Keep running and report every swap")
+    parser.add_argument("--bench-segments", action="store_true",
+                        help="Benchmark lazy segment loading and LRU eviction instead")
+    parser.add_argument("--segments", nargs="+",
+                        default=["home_country=US", "home_country=CA", "channel=ATM", "channel=WEB"])
+    parser.add_argument("--cache-mb", type=float, default=DEFAULT_CACHE_BYTES / 1e6)
+    parser.add_argument("--data", default="Data/Nova_CleanedEDA_df.csv")
+    parser.add_argument("--rows", type=int, default=2000)
+    args = parser.parse_args()
+
+    if args.bench_segments:
+        bench_segments(args)
+        return
+
+    registry = ModelRegistry(args.model_dir, args.poll_seconds).start()
+    seen, last_error = 0, None
+    while True:
+        for reload in registry.reloads[seen:]:
+            print(
+                f"Serving {reload['version']} (was {reload['previous_version']}): "
+                f"load {reload['load_seconds']:.2f}s, warm {reload['warm_seconds']:.2f}s"
+            )
+        seen = len(registry.reloads)
+        if registry.last_error != last_error:
+            last_error = registry.last_error
+            print(f"Reload failed: {last_error}")
+        if not args.watch:
+            break
+        time.sleep(args.poll_seconds)
+    registry.stop()
+
+
+if __name__ == "__main__":
+    main()
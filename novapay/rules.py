@@ -0,0 +1,203 @@
+"""Rules-based baseline and fallback scorer.
+
+Rules are plain data: a name, a weight and a list of ``[column, op, value]``
+conditions that must all hold. ``RuleEngine`` compiles them once into NumPy
+comparisons; evaluating a batch is one boolean mask per condition, ANDed per
+rule, and a noisy-OR of the weights of the rules that fired::
+
+    score = 1 - prod(1 - weight) over fired rules
+
+The score is treated like a fraud probability: above ``DECISION_THRESHOLD``
+declines and the usual risk levels apply, so rule results have the same shape
+as ``score_transactions`` output. The app falls back to this engine when no
+model is available. Rules can also be loaded from a JSON file with the same
+layout as ``DEFAULT_RULES``.
+
+Benchmark / baseline comparison:
+    python -m novapay.rules --rows 5000000
+"""
+import argparse
+import json
+import time
+
+import numpy as np
+import pandas as pd
+
+from novapay.features import load_labelled_frame, train_holdout_split
+from novapay.scoring import DECISION_THRESHOLD, MODEL_PATH, load_pipeline, risk_levels, score_transactions
+
+RULES_VERSION = "rules-baseline"
+
+DEFAULT_RULES = [
+    {"name": "new_device_high_velocity", "weight": 0.6,
+     "description": "New device with 3+ transactions in the last hour",
+     "when": [["new_device_high_velocity", "==", 1]]},
+    {"name": "chargeback_history", "weight": 0.6,
+     "description": "Two or more previous chargebacks",
+     "when": [["chargeback_history_count", ">=", 2]]},
+    {"name": "internal_risk", "weight": 0.6,
+     "description": "Internal risk score above 0.8",
+     "when": [["risk_score_internal", ">", 0.8]]},
+    {"name": "ip_location_risk", "weight": 0.4,
+     "description": "Risky IP and location mismatch",
+     "when": [["ip_location_risk", "==", 1]]},
+    {"name": "young_account_high_amount", "weight": 0.35,
+     "description": "Account younger than 30 days sending more than $500",
+     "when": [["young_account_high_amount", "==", 1]]},
+    {"name": "velocity_burst", "weight": 0.35,
+     "description": "3+ transactions in the last hour",
+     "when": [["txn_velocity_1h", ">=", 3]]},
+    {"name": "low_device_trust", "weight": 0.3,
+     "description": "Device trust score below 0.3",
+     "when": [["device_trust_score", "<", 0.3]]},
+    {"name": "daily_velocity", "weight": 0.3,
+     "description": "8+ transactions in the last 24 hours",
+     "when": [["txn_velocity_24h", ">=", 8]]},
+    {"name": "high_ip_risk", "weight": 0.2,
+     "description": "IP risk score above 0.8",
+     "when": [["ip_risk_score", ">", 0.8]]},
+]
+
+OPERATORS = {
+    ">": np.greater,
+    ">=": np.greater_equal,
+    "<": np.less,
+    "<=": np.less_equal,
+    "==": np.equal,
+    "!=": np.not_equal,
+    "in": np.isin,
+}
+
+
+def load_rules(path):
+    """Read a JSON list of rules in the DEFAULT_RULES layout"""
+    with open(path) as f:
+        return json.load(f)
+
+
+class RuleEngine:
+    """Compile declarative rules into vectorized mask evaluation"""
+
+    def __init__(self, rules=DEFAULT_RULES, threshold=DECISION_THRESHOLD):
+        self.rules = rules
+        self.threshold = threshold
+        self.names = [rule["name"] for rule in rules]
+
+        weights = np.array([rule["weight"] for rule in rules], dtype=float)
+        if ((weights < 0) | (weights >= 1)).any():
+            raise ValueError("Rule weights must be in [0, 1)")
+        self.log_keep = np.log1p(-weights)
+
+        # Each condition becomes (column position, comparison, constant)
+        self.columns = []
+        self.compiled = []
+        for rule in rules:
+            if not rule.get("when"):
+                raise ValueError(f"Rule {rule['name']!r}: 'when' needs at least one condition")
+            conditions = []
+            for column, op, value in rule["when"]:
+                if op not in OPERATORS:
+                    raise ValueError(f"Rule {rule['name']!r}: unknown operator {op!r}")
+                if column not in self.columns:
+                    self.columns.append(column)
+                conditions.append((self.columns.index(column), OPERATORS[op], value))
+            self.compiled.append(conditions)
+
+    def fired(self, arrays):
+        """Boolean (n_rules, n_rows) matrix from one array per column in self.columns"""
+        n = len(arrays[0])
+        fired = np.empty((len(self.compiled), n), dtype=bool)
+        for i, conditions in enumerate(self.compiled):
+            position, compare, value = conditions[0]
+            mask = compare(arrays[position], value)
+            for position, compare, value in conditions[1:]:
+                mask &= compare(arrays[position], value)
+            fired[i] = mask
+        return fired
+
+    def score_arrays(self, arrays):
+        """Noisy-OR rule score per row"""
+        fired = self.fired(arrays)
+        return -np.expm1(self.log_keep @ fired), fired
+
+    def column_arrays(self, data):
+        return [data[column].to_numpy() for column in self.columns]
+
+    def score(self, input_data):
+        """score_transactions()-shaped results plus the rules that fired"""
+        score, fired = self.score_arrays(self.column_arrays(input_data))
+        names = np.array(self.names, dtype=object)
+        return pd.DataFrame({
+            "fraud_probability": score,
+            "decision": np.where(score > self.threshold, "DECLINE", "ALLOW"),
+            "risk_level": risk_levels(score),
+            "rules_fired": [", ".join(names[row]) for row in fired.T],
+        }, index=input_data.index)
+
+    def describe(self, names):
+        """Descriptions for a list of fired rule names"""
+        by_name = {rule["name"]: rule.get("description", rule["name"]) for rule in self.rules}
+        return [by_name[name] for name in names]
+
+
+def compare_with_model(engine, model, X, y):
+    """Recall / precision / decline rate of the rules and the model on the same rows"""
+    rows = []
+    for label, result in [("rules baseline", engine.score(X)), ("model", score_transactions(model, X))]:
+        declined = (result["decision"] == "DECLINE").to_numpy()
+        tp = int((declined & (y == 1)).sum())
+        rows.append({
+            "scorer": label,
+            "recall": tp / max(int(y.sum()), 1),
+            "precision": tp / max(int(declined.sum()), 1),
+            "decline_rate": declined.mean(),
+        })
+    report = pd.DataFrame(rows)
+    baseline = report.loc[0, "recall"]
+    report["recall_vs_baseline"] = report["recall"] / baseline - 1 if baseline else np.nan
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Rules baseline throughput and comparison with the model")
+    parser.add_argument("--model", default=MODEL_PATH)
+    parser.add_argument("--data", default="Data/Nova_CleanedEDA_df.csv")
+    parser.add_argument("--rules", default=None, help="JSON rules file (default: built-in rules)")
+    parser.add_argument("--rows", type=int, default=5_000_000)
+    args = parser.parse_args()
+
+    engine = RuleEngine(load_rules(args.rules) if args.rules else DEFAULT_RULES)
+    X, y = load_labelled_frame(args.data)
+
+    # Throughput on raw column arrays, tiled up to the requested row count
+    reps = -(-args.rows // len(X))
+    arrays = [np.tile(a, reps)[:args.rows] for a in engine.column_arrays(X)]
+    engine.score_arrays([a[:1000] for a in arrays])  # warm up
+    start = time.perf_counter()
+    engine.score_arrays(arrays)
+    elapsed = time.perf_counter() - start
+    print(f"{len(engine.rules)} rules over {args.rows:,} rows: {elapsed:.3f}s ({args.rows / elapsed:,.0f} rows/s)")
+
+    timings = []
+    row = X.iloc[[0]]
+    for _ in range(1000):
+        start = time.perf_counter()
+        engine.score(row)
+        timings.append(time.perf_counter() - start)
+    timings = np.array(timings) * 1e3
+    print(f"single transaction via score(): p50 {np.percentile(timings, 50):.3f} ms  "
+          f"p99 {np.percentile(timings, 99):.3f} ms\n")
+
+    _, X_test, _, y_test = train_holdout_split(X, y)
+    try:
+        model = load_pipeline(args.model)
+    except FileNotFoundError:
+        print(f"No model at {args.model}; skipping the side-by-side comparison.")
+        return
+    report = compare_with_model(engine, model, X_test, y_test)
+    print("Holdout split:")
+    print(report.to_string(index=False, float_format=lambda v: f"{v:.4f}"))
+
+
+if __name__ == "__main__":
+    main()
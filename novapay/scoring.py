@@ -0,0 +1,54 @@
+"""Scoring API shared by the Streamlit app and batch tools"""
+import joblib
+import numpy as np
+import pandas as pd
+
+from novapay.batch_scoring import batch_predict_proba
+from novapay.early_exit import DEFAULT_CHUNK_SIZE, predict_early_exit
+
+MODEL_PATH = "Model/rf_fraud_pipeline.pkl"
+
+# model.predict declines when the fraud probability is above 0.5
+DECISION_THRESHOLD = 0.5
+HIGH_RISK_CUTOFF = 0.7
+MEDIUM_RISK_CUTOFF = 0.3
+
+
+def load_pipeline(path=MODEL_PATH):
+    """Load a fitted preprocessing + random forest pipeline"""
+    return joblib.load(path)
+
+
+def risk_levels(fraud_prob):
+    """Map fraud probabilities to HIGH / MEDIUM / LOW"""
+    fraud_prob = np.asarray(fraud_prob)
+    return np.select(
+        [fraud_prob > HIGH_RISK_CUTOFF, fraud_prob > MEDIUM_RISK_CUTOFF],
+        ["HIGH", "MEDIUM"],
+        default="LOW",
+    )
+
+
+def score_transactions(model, input_data, threshold=DECISION_THRESHOLD, early_exit=False,
+                       chunk_size=DEFAULT_CHUNK_SIZE, delta=None, matrix="dense", chunk_rows=None):
+    """Score model-ready rows and return one result row per transaction.
+
+    With ``early_exit=True`` trees are evaluated in chunks and each row stops
+    once its decision is settled (see novapay.early_exit); the result then also
+    carries ``probability_lower``, ``probability_upper`` and ``trees_evaluated``.
+    ``matrix="float32"`` or ``"sparse"`` lowers peak memory for large batches
+    (see novapay.batch_scoring).
+    """
+    if early_exit:
+        result = pd.DataFrame(predict_early_exit(model, input_data, threshold, chunk_size, delta))
+    else:
+        fraud_prob = batch_predict_proba(model, input_data, matrix, chunk_rows)
+        result = pd.DataFrame({
+            "fraud_probability": fraud_prob,
+            "decision": (fraud_prob > threshold).astype(int),
+        })
+
+    result["decision"] = np.where(result["decision"] == 1, "DECLINE", "ALLOW")
+    result["risk_level"] = risk_levels(result["fraud_probability"])
+    result.index = input_data.index
+    return result
@@ -0,0 +1,270 @@
+"""Shadow scoring of challenger models.
+
+After the primary decision has been returned, ``ShadowScorer.submit`` hands
+the same input to a thread or process pool where every challenger scores it.
+Results go to an append-only agreement log (CSV). Submission never blocks:
+when ``max_pending`` jobs are already queued the job is dropped and counted.
+Workers run at the lowest CPU priority (``nice``), so on a busy host the
+scheduler always prefers the primary request path over shadow work.
+
+Challengers can be full pipelines (scored on the raw model input) or bare
+estimators (scored on the primary pipeline's transformed matrix). Pass the
+serving pipeline's ``preprocess`` step to ``submit`` so bare estimators see the
+transform of the model version that made the decision.
+
+Benchmark:
+    python -m novapay.shadow --challenger Model/challengers/gb_pipeline.pkl
+"""
+import argparse
+import csv
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+import joblib
+import numpy as np
+from sklearn.pipeline import Pipeline
+
+from novapay.features import load_labelled_frame, train_holdout_split
+from novapay.scoring import DECISION_THRESHOLD, MODEL_PATH, load_pipeline, score_transactions
+
+CHALLENGER_DIR = "Model/challengers"
+AGREEMENT_LOG = "Data/shadow_agreement_log.csv"
+LOG_FIELDS = [
+    "logged_at", "transaction_key", "model_version", "challenger",
+    "primary_probability", "challenger_probability", "primary_decision",
+    "challenger_decision", "agree", "challenger_ms",
+]
+
+SHADOW_NICENESS = 19
+
+# Challengers loaded once per worker process
+_WORKER_CHALLENGERS = None
+
+
+def _lower_priority(niceness):
+    """Drop the calling worker thread/process to the given niceness (best effort)"""
+    try:
+        # On Linux every thread has its own scheduling priority
+        tid = threading.get_native_id()
+        os.setpriority(os.PRIO_PROCESS, tid, max(os.getpriority(os.PRIO_PROCESS, tid), niceness))
+    except (AttributeError, OSError):
+        pass
+
+
+def _score_challengers(challengers, preprocess, input_data):
+    """Fraud probability and scoring time for every challenger"""
+    X_trans = None
+    scores = {}
+    for name, challenger in challengers.items():
+        start = time.perf_counter()
+        if isinstance(challenger, Pipeline):
+            proba = challenger.predict_proba(input_data)[:, 1]
+        else:
+            if X_trans is None:
+                if preprocess is None:
+                    raise ValueError(f"challenger {name} needs the primary preprocess step")
+                X_trans = preprocess.transform(input_data)
+            proba = challenger.predict_proba(X_trans)[:, 1]
+        scores[name] = (proba, (time.perf_counter() - start) * 1e3)
+    return scores
+
+
+def _init_worker(challenger_paths, primary_path, niceness):
+    global _WORKER_CHALLENGERS
+    _lower_priority(niceness)
+    _WORKER_CHALLENGERS = (
+        {name: joblib.load(path) for name, path in challenger_paths.items()},
+        joblib.load(primary_path).named_steps["preprocess"] if primary_path else None,
+    )
+
+
+def _score_in_worker(input_data, preprocess=None):
+    challengers, default_preprocess = _WORKER_CHALLENGERS
+    return _score_challengers(challengers, preprocess if preprocess is not None else default_preprocess, input_data)
+
+
+def load_challengers(challenger_dir=CHALLENGER_DIR):
+    """{name: path} for every pickled challenger in a directory"""
+    if not os.path.isdir(challenger_dir):
+        return {}
+    return {
+        os.path.splitext(name)[0]: os.path.join(challenger_dir, name)
+        for name in sorted(os.listdir(challenger_dir))
+        if name.endswith(".pkl")
+    }
+
+
+class ShadowScorer:
+    """Score challengers off the request path and log agreement with the primary"""
+
+    def __init__(self, challenger_paths, primary_path=None, executor="thread", max_workers=1,
+                 max_pending=256, log_path=AGREEMENT_LOG, threshold=DECISION_THRESHOLD,
+                 niceness=SHADOW_NICENESS):
+        self.threshold = threshold
+        self.log_path = log_path
+        self.max_pending = max_pending
+        self.submitted = 0
+        self.dropped = 0
+        self.completed = 0
+        self.failed = 0
+        self._pending = 0
+        self._agree = {}
+        self._counts = {}
+        self._lock = threading.Lock()
+
+        if executor == "process":
+            self._challengers = None
+            self._preprocess = None
+            self._pool = ProcessPoolExecutor(
+                max_workers, initializer=_init_worker, initargs=(challenger_paths, primary_path, niceness)
+            )
+        else:
+            self._challengers = {name: joblib.load(path) for name, path in challenger_paths.items()}
+            needs_primary = not all(isinstance(c, Pipeline) for c in self._challengers.values())
+            # Default transform for submits without one; the app always passes the serving bundle's
+            self._preprocess = (joblib.load(primary_path).named_steps["preprocess"]
+                                if needs_primary and primary_path else None)
+            self._pool = ThreadPoolExecutor(
+                max_workers, thread_name_prefix="shadow", initializer=_lower_priority, initargs=(niceness,)
+            )
+
+    def submit(self, input_data, primary_result, transaction_keys=None, model_version=None, preprocess=None):
+        """Queue challenger scoring for rows already decided by the primary model.
+
+        ``preprocess`` is the fitted preprocess step of the pipeline that made
+        the decision. Without it, bare estimators use the one loaded from
+        ``primary_path``.
+        """
+        with self._lock:
+            if self._pending >= self.max_pending:
+                self.dropped += 1
+                return False
+            self._pending += 1
+            self.submitted += 1
+
+        if self._challengers is None:
+            future = self._pool.submit(_score_in_worker, input_data, preprocess)
+        else:
+            future = self._pool.submit(_score_challengers, self._challengers,
+                                       preprocess if preprocess is not None else self._preprocess, input_data)
+
+        keys = list(transaction_keys) if transaction_keys is not None else list(map(str, input_data.index))
+        primary_proba = np.asarray(primary_result["fraud_probability"], dtype=float)
+        future.add_done_callback(lambda f: self._record(f, keys, primary_proba, model_version))
+        return True
+
+    def _record(self, future, keys, primary_proba, model_version):
+        try:
+            self._write(future.result(), keys, primary_proba, model_version)
+        except Exception:
+            with self._lock:
+                self.failed += 1
+        else:
+            with self._lock:
+                self.completed += 1
+        finally:
+            # Always release the slot, or a failed write would shrink the queue for good
+            with self._lock:
+                self._pending -= 1
+
+    def _write(self, scores, keys, primary_proba, model_version):
+        """Update agreement counts and append one log row per challenger and transaction"""
+        primary_decision = primary_proba > self.threshold
+        now = time.time()
+        rows = []
+        for name, (proba, elapsed_ms) in scores.items():
+            decision = proba > self.threshold
+            agree = decision == primary_decision
+            for i, key in enumerate(keys):
+                rows.append([
+                    f"{now:.3f}", key, model_version, name,
+                    f"{primary_proba[i]:.6f}", f"{proba[i]:.6f}",
+                    int(primary_decision[i]), int(decision[i]), int(agree[i]), f"{elapsed_ms:.3f}",
+                ])
+            with self._lock:
+                self._agree[name] = self._agree.get(name, 0) + int(agree.sum())
+                self._counts[name] = self._counts.get(name, 0) + len(agree)
+
+        if self.log_path:
+            with self._lock:
+                new_file = not os.path.exists(self.log_path)
+                with open(self.log_path, "a", newline="") as f:
+                    writer = csv.writer(f)
+                    if new_file:
+                        writer.writerow(LOG_FIELDS)
+                    writer.writerows(rows)
+
+    def agreement(self):
+        """Decision agreement rate per challenger so far"""
+        with self._lock:
+            return {name: self._agree[name] / self._counts[name] for name in self._counts}
+
+    def stats(self):
+        with self._lock:
+            return {
+                "submitted": self.submitted,
+                "completed": self.completed,
+                "dropped": self.dropped,
+                "failed": self.failed,
+                "pending": self._pending,
+            }
+
+    def close(self, wait=True):
+        self._pool.shutdown(wait=wait)
+
+
+def _latency_run(model, X, n_requests, shadow=None):
+    timings = []
+    for i in range(n_requests):
+        row = X.iloc[[i % len(X)]]
+        start = time.perf_counter()
+        result = score_transactions(model, row)
+        timings.append(time.perf_counter() - start)
+        if shadow is not None:
+            shadow.submit(row, result, preprocess=model.named_steps["preprocess"])
+    return np.array(timings) * 1e3
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark primary latency with and without shadow scoring")
+    parser.add_argument("--model", default=MODEL_PATH)
+    parser.add_argument("--data", default="Data/Nova_CleanedEDA_df.csv")
+    parser.add_argument("--challenger", nargs="*", default=None,
+                        help="Challenger pickles (default: everything in Model/challengers)")
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--log", default=None, help="Agreement log path (default: no log file)")
+    args = parser.parse_args()
+
+    model = load_pipeline(args.model)
+    X, y = load_labelled_frame(args.data)
+    _, X_test, _, _ = train_holdout_split(X, y)
+    challengers = (
+        {os.path.splitext(os.path.basename(p))[0]: p for p in args.challenger}
+        if args.challenger else load_challengers()
+    )
+    if not challengers:
+        parser.error("no challenger models given and none found in Model/challengers")
+
+    _latency_run(model, X_test, 20)  # warm up
+    runs = {"no shadow": None}
+    for executor in ("thread", "process"):
+        runs[f"shadow ({executor} pool)"] = ShadowScorer(
+            challengers, args.model, executor=executor, log_path=args.log
+        )
+
+    print(f"{args.requests} single-row requests, challengers: {', '.join(challengers)}")
+    for label, shadow in runs.items():
+        timings = _latency_run(model, X_test, args.requests, shadow)
+        line = f"{label:>22}: p50 {np.percentile(timings, 50):7.2f} ms  p99 {np.percentile(timings, 99):7.2f} ms"
+        if shadow is not None:
+            shadow.close()
+            stats = shadow.stats()
+            agreement = ", ".join(f"{k} {v:.2%}" for k, v in shadow.agreement().items())
+            line += f"  completed {stats['completed']} dropped {stats['dropped']}  agreement: {agreement}"
+        print(line)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,326 @@
+"""Streaming SHAP importance aggregates by segment.
+
+Notebook 05 only has a one-off ``shap.summary_plot`` over the holdout. Here
+each explained transaction adds its fraud-class SHAP vector to running sums
+for its channel, corridor (``currency_pair``) and decision, in the bucket of
+its UTC day. An update costs O(features) per dimension, and memory is fixed at
+``keep_days x dimensions x (max_values + 1) x features`` sums however much
+traffic is seen. Values past ``max_values`` in a dimension share an
+``__other__`` slot, and days older than ``keep_days`` are dropped.
+
+Mean |SHAP| and mean signed SHAP for any segment and day window are the sums
+divided by the count, so the dashboard page reads them without recomputing
+any SHAP values. The app saves its aggregator to ``STATE_PATH`` at most once a
+minute and picks the saved state up again after a restart.
+
+Benchmark:
+    python -m novapay.shap_aggregates --rows 400
+"""
+import argparse
+import json
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+import pandas as pd
+
+from novapay.features import load_labelled_frame, train_holdout_split
+from novapay.scoring import MODEL_PATH, load_pipeline, score_transactions
+
+try:
+    import shap
+    SHAP_AVAILABLE = True
+except ImportError:
+    SHAP_AVAILABLE = False
+
+DIMENSIONS = ["channel", "currency_pair", "decision"]
+STATE_PATH = "Data/shap_aggregates.npz"
+SAVE_SECONDS = 60
+OTHER = "__other__"
+
+
+def utc_day(offset_days=0):
+    """Today's UTC date as YYYY-MM-DD, shifted by offset_days"""
+    return (datetime.now(timezone.utc) + timedelta(days=offset_days)).strftime("%Y-%m-%d")
+
+
+class ShapAggregator:
+    """Running mean |SHAP| / mean SHAP per feature for every segment value, bucketed by day"""
+
+    def __init__(self, feature_names, dimensions=DIMENSIONS, max_values=64, keep_days=7):
+        self.feature_names = list(feature_names)
+        self.dimensions = list(dimensions)
+        self.max_values = max_values
+        self.keep_days = keep_days
+        self.values = {d: [] for d in self.dimensions}
+        self.days = {}
+        self.seen = 0
+        self._slots = {d: {} for d in self.dimensions}
+        self._lock = threading.Lock()
+
+    def _slot(self, dimension, value):
+        slots = self._slots[dimension]
+        value = OTHER if value is None or (isinstance(value, float) and np.isnan(value)) else str(value)
+        slot = slots.get(value)
+        if slot is None:
+            if len(slots) >= self.max_values:
+                return self.max_values
+            slot = slots[value] = len(slots)
+            self.values[dimension].append(value)
+        return slot
+
+    def _bucket(self, day):
+        bucket = self.days.get(day)
+        if bucket is None:
+            shape = (len(self.dimensions), self.max_values + 1)
+            bucket = {
+                "count": np.zeros(shape, dtype=np.int64),
+                "abs": np.zeros(shape + (len(self.feature_names),)),
+                "signed": np.zeros(shape + (len(self.feature_names),)),
+            }
+            self.days[day] = bucket
+            for old in sorted(self.days)[:-self.keep_days]:
+                del self.days[old]
+        return bucket
+
+    def update(self, shap_values, segments, day=None):
+        """Add explained rows.
+
+        ``shap_values`` is one fraud-class SHAP vector or a (rows, features)
+        matrix; ``segments`` maps each dimension to one value or one per row.
+        """
+        shap_values = np.atleast_2d(np.asarray(shap_values, dtype=float))
+        n = len(shap_values)
+        absolute = np.abs(shap_values)
+        day = day or utc_day()
+        with self._lock:
+            bucket = self._bucket(day)
+            for i, dimension in enumerate(self.dimensions):
+                values = segments[dimension]
+                if np.ndim(values) == 0:
+                    values = [values] * n
+                if n == 1:
+                    slot = self._slot(dimension, values[0])
+                    bucket["count"][i, slot] += 1
+                    bucket["abs"][i, slot] += absolute[0]
+                    bucket["signed"][i, slot] += shap_values[0]
+                    continue
+                slots = np.fromiter((self._slot(dimension, v) for v in values), dtype=np.intp, count=n)
+                np.add.at(bucket["count"][i], slots, 1)
+                np.add.at(bucket["abs"][i], slots, absolute)
+                np.add.at(bucket["signed"][i], slots, shap_values)
+            self.seen += n
+
+    def _window(self, days):
+        """Sums over the most recent ``days`` UTC days, today included"""
+        first = utc_day(1 - days)
+        shape = (len(self.dimensions), self.max_values + 1)
+        count = np.zeros(shape, dtype=np.int64)
+        absolute = np.zeros(shape + (len(self.feature_names),))
+        signed = np.zeros_like(absolute)
+        with self._lock:
+            for day, bucket in self.days.items():
+                if day >= first:
+                    count += bucket["count"]
+                    absolute += bucket["abs"]
+                    signed += bucket["signed"]
+        return count, absolute, signed
+
+    def _segment(self, dimension, value, days):
+        count, absolute, signed = self._window(days)
+        if dimension is None:
+            # Every row has exactly one value per dimension, so any dimension sums to all traffic
+            return count[0].sum(), absolute[0].sum(axis=0), signed[0].sum(axis=0)
+        i = self.dimensions.index(dimension)
+        slot = self.max_values if value == OTHER else self._slots[dimension].get(str(value))
+        if slot is None:
+            return 0, np.zeros(len(self.feature_names)), np.zeros(len(self.feature_names))
+        return count[i, slot], absolute[i, slot], signed[i, slot]
+
+    def count(self, dimension=None, value=None, days=1):
+        """Explained transactions in a segment (all traffic when dimension is None)"""
+        return int(self._segment(dimension, value, days)[0])
+
+    def drivers(self, dimension=None, value=None, days=1, top_k=None):
+        """Mean |SHAP| and mean SHAP per feature for one segment, strongest first"""
+        n, absolute, signed = self._segment(dimension, value, days)
+        n = max(int(n), 1)
+        frame = pd.DataFrame({
+            "feature": self.feature_names,
+            "mean_abs_shap": absolute / n,
+            "mean_shap": signed / n,
+        }).sort_values("mean_abs_shap", ascending=False, ignore_index=True)
+        return frame if top_k is None else frame.head(top_k)
+
+    def segments(self, dimension, days=1):
+        """Explained-transaction count per value of a dimension"""
+        count, _, _ = self._window(days)
+        i = self.dimensions.index(dimension)
+        labels = list(self.values[dimension]) + [OTHER]
+        slots = list(range(len(self.values[dimension]))) + [self.max_values]
+        frame = pd.DataFrame({"value": labels, "explained": count[i, slots]})
+        frame = frame[frame["explained"] > 0]
+        return frame.sort_values("explained", ascending=False, ignore_index=True)
+
+    def compare(self, dimension, days=1, top_k=10, metric="mean_abs_shap"):
+        """Segment values x the top_k overall features, for side-by-side comparison"""
+        count, absolute, signed = self._window(days)
+        i = self.dimensions.index(dimension)
+        sums = absolute if metric == "mean_abs_shap" else signed
+        top = np.argsort(absolute[0].sum(axis=0))[::-1][:top_k]
+        table = self.segments(dimension, days)
+        rows = []
+        for value in table["value"]:
+            slot = self.max_values if value == OTHER else self._slots[dimension][value]
+            rows.append(sums[i, slot, top] / count[i, slot])
+        return pd.DataFrame(rows, index=table["value"].to_list(), columns=[self.feature_names[j] for j in top])
+
+    def reset(self):
+        with self._lock:
+            self.days = {}
+            self.seen = 0
+
+    def memory_bytes(self):
+        """Bytes held by the day buckets"""
+        with self._lock:
+            return sum(array.nbytes for bucket in self.days.values() for array in bucket.values())
+
+    def stats(self):
+        with self._lock:
+            return {
+                "seen": self.seen,
+                "days": sorted(self.days),
+                "values": {d: len(v) for d, v in self.values.items()},
+            }
+
+    def save(self, path=STATE_PATH):
+        """Persist the day buckets (a few hundred KB per day)"""
+        with self._lock:
+            meta = {
+                "feature_names": self.feature_names,
+                "dimensions": self.dimensions,
+                "max_values": self.max_values,
+                "keep_days": self.keep_days,
+                "values": self.values,
+                "seen": self.seen,
+                "days": sorted(self.days),
+            }
+            arrays = {f"{key}__{day}": array for day, bucket in self.days.items() for key, array in bucket.items()}
+            np.savez(path, meta=json.dumps(meta), **arrays)
+
+    @classmethod
+    def load(cls, path=STATE_PATH):
+        with np.load(path) as data:
+            meta = json.loads(str(data["meta"]))
+            aggregator = cls(meta["feature_names"], meta["dimensions"], meta["max_values"], meta["keep_days"])
+            for dimension, values in meta["values"].items():
+                for value in values:
+                    aggregator._slot(dimension, value)
+            for day in meta["days"]:
+                aggregator.days[day] = {key: data[f"{key}__{day}"].copy() for key in ("count", "abs", "signed")}
+            aggregator.seen = meta["seen"]
+        return aggregator
+
+
+_shared = {}
+_shared_lock = threading.Lock()
+_last_save = 0.0
+
+
+def shared_aggregator(feature_names, path=STATE_PATH):
+    """One aggregator per feature list and process, shared by the app and the drivers page.
+
+    A model with a different feature list gets its own aggregator rather than
+    adding its SHAP vectors to sums laid out for another. Each starts from the
+    saved state at ``path`` when it exists and has the same features.
+    """
+    key = tuple(feature_names)
+    with _shared_lock:
+        if key not in _shared:
+            aggregator = None
+            try:
+                aggregator = ShapAggregator.load(path)
+                if aggregator.feature_names != list(key):
+                    aggregator = None
+            except FileNotFoundError:
+                pass
+            _shared[key] = aggregator if aggregator is not None else ShapAggregator(key)
+        return _shared[key]
+
+
+def save_periodically(aggregator, path=STATE_PATH, every_seconds=SAVE_SECONDS):
+    """Save to path unless a save happened in the last every_seconds; True when saved"""
+    global _last_save
+    with _shared_lock:
+        now = time.monotonic()
+        if now - _last_save < every_seconds:
+            return False
+        _last_save = now
+    aggregator.save(path)
+    return True
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Stream holdout SHAP values into segment aggregates")
+    parser.add_argument("--model", default=MODEL_PATH)
+    parser.add_argument("--data", default="Data/Nova_CleanedEDA_df.csv")
+    parser.add_argument("--rows", type=int, default=400, help="Holdout rows to explain")
+    parser.add_argument("--save", default=None, help="Optional path for the resulting state (.npz)")
+    args = parser.parse_args()
+
+    if not SHAP_AVAILABLE:
+        parser.error("shap is not installed")
+    model = load_pipeline(args.model)
+    feature_names = list(model.named_steps["preprocess"].get_feature_names_out())
+    X, y = load_labelled_frame(args.data)
+    _, X_test, _, _ = train_holdout_split(X, y)
+    rows = X_test.iloc[:args.rows]
+
+    start = time.perf_counter()
+    explainer = shap.TreeExplainer(model.named_steps["model"])
+    values = np.asarray(explainer.shap_values(model.named_steps["preprocess"].transform(rows), check_additivity=False))
+    fraud = values[:, :, 1] if values.shape[-1] == 2 else values[1]
+    explain_seconds = time.perf_counter() - start
+    decisions = score_transactions(model, rows)["decision"].to_numpy()
+    channels = rows["channel"].to_numpy()
+    corridors = rows["currency_pair"].to_numpy()
+
+    # One update per explained transaction, as the app calls it
+    aggregator = ShapAggregator(feature_names)
+    timings = []
+    for i in range(len(rows)):
+        start = time.perf_counter()
+        aggregator.update(fraud[i], {"channel": channels[i], "currency_pair": corridors[i],
+                                     "decision": decisions[i]})
+        timings.append(time.perf_counter() - start)
+    timings = np.array(timings) * 1e6
+
+    start = time.perf_counter()
+    for _ in range(1000):
+        aggregator.drivers("decision", "DECLINE")
+    query_us = (time.perf_counter() - start) * 1e3
+
+    # The streamed means must match a direct recomputation over the stored matrix
+    declined = decisions == "DECLINE"
+    if declined.any():
+        direct = np.abs(fraud[declined]).mean(axis=0)
+        streamed = aggregator.drivers("decision", "DECLINE").set_index("feature")["mean_abs_shap"]
+        assert np.allclose(streamed[feature_names].to_numpy(), direct)
+
+    print(f"Explained {len(rows)} holdout rows in {explain_seconds:.1f}s "
+          f"({explain_seconds / len(rows) * 1e3:.0f} ms/row)")
+    print(f"update: p50 {np.percentile(timings, 50):.1f} us  p99 {np.percentile(timings, 99):.1f} us per row")
+    print(f"drivers query: {query_us:.1f} us   state: {aggregator.memory_bytes() / 1e3:.0f} KB for one day\n")
+
+    pd.set_option("display.width", 200)
+    print(f"Top drivers of declines ({aggregator.count('decision', 'DECLINE')} declined):")
+    print(aggregator.drivers("decision", "DECLINE", top_k=8).to_string(index=False, float_format=lambda v: f"{v:.4f}"))
+    print("\nMean |SHAP| by channel:")
+    print(aggregator.compare("channel", top_k=5).to_string(float_format=lambda v: f"{v:.4f}"))
+    if args.save:
+        aggregator.save(args.save)
+
+
+if __name__ == "__main__":
+    main()
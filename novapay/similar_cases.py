@@ -0,0 +1,190 @@
+"""Similar-case lookup over labelled transactions.
+
+Labelled cases are stored as the pipeline's 89 preprocessed features, scaled
+so every column has unit spread (otherwise ``amount_usd`` would swamp the
+one-hot columns), in a ``BallTree``. New labelled cases go to a small buffer
+that is searched by brute force next to the tree; once the buffer passes
+``rebuild_at`` rows the tree is rebuilt with it.
+
+Usage:
+    python -m novapay.similar_cases build
+    python -m novapay.similar_cases bench --k 5
+"""
+import argparse
+import time
+
+import joblib
+import numpy as np
+import pandas as pd
+from sklearn.neighbors import BallTree
+
+from novapay.batch_scoring import transform_float32
+from novapay.features import build_model_frame
+from novapay.scoring import MODEL_PATH, load_pipeline
+
+INDEX_PATH = "Model/similar_cases_index.pkl"
+CASE_COLUMNS = [
+    "transaction_id", "timestamp", "home_country", "channel", "source_currency", "dest_currency",
+    "amount_usd", "ip_risk_score", "device_trust_score", "txn_velocity_1h", "is_fraud",
+]
+
+
+class SimilarCaseIndex:
+    """Nearest labelled cases to a transaction in preprocessed feature space"""
+
+    def __init__(self, preprocess, vectors, cases, leaf_size=40, rebuild_at=2000, scale=None):
+        self.preprocess = preprocess
+        self.leaf_size = leaf_size
+        self.rebuild_at = rebuild_at
+
+        if scale is None:
+            # Unit spread per column; constant columns keep scale 1
+            scale = vectors.std(axis=0)
+            scale = np.where(scale > 0, scale, 1.0)
+            vectors = vectors / scale
+        self.scale = np.asarray(scale, dtype=np.float32)
+        self._build(vectors, cases.reset_index(drop=True))
+
+    def _build(self, scaled, cases):
+        self.vectors = np.ascontiguousarray(scaled, dtype=np.float32)
+        self.cases = cases
+        self.tree = BallTree(self.vectors, leaf_size=self.leaf_size)
+        self.buffer = np.empty((0, self.vectors.shape[1]), dtype=np.float32)
+        self.buffer_cases = cases.iloc[:0]
+        self._all_cases = cases
+
+    @classmethod
+    def from_labelled(cls, preprocess, cleaned_df, frauds_only=True, **kwargs):
+        """Index the labelled transactions of a cleaned CSV frame"""
+        df = cleaned_df[cleaned_df["is_fraud"] == 1] if frauds_only else cleaned_df
+        # Feature derivation (ip_usage_count) needs the full history
+        X = build_model_frame(cleaned_df).loc[df.index]
+        vectors = transform_float32(preprocess, X)
+        return cls(preprocess, vectors, df[CASE_COLUMNS], **kwargs)
+
+    def __len__(self):
+        return len(self.vectors) + len(self.buffer)
+
+    def transform(self, X):
+        """Scaled feature vectors for model-ready rows"""
+        return transform_float32(self.preprocess, X) / self.scale
+
+    def add_cases(self, X, cases):
+        """Add newly labelled cases; the tree is rebuilt once the buffer is large"""
+        self.buffer = np.vstack([self.buffer, self.transform(X)])
+        self.buffer_cases = pd.concat([self.buffer_cases, cases[CASE_COLUMNS]], ignore_index=True)
+        self._all_cases = pd.concat([self.cases, self.buffer_cases], ignore_index=True)
+        if len(self.buffer) >= self.rebuild_at:
+            self._build(np.vstack([self.vectors, self.buffer]), self._all_cases)
+
+    def query_vectors(self, scaled, k=5):
+        """(distances, positions) of the k nearest cases; positions past the tree index the buffer"""
+        k_tree = min(k, len(self.vectors))
+        distances, positions = self.tree.query(scaled, k=k_tree)
+        if len(self.buffer) == 0:
+            return distances, positions
+
+        buffer_distances = np.sqrt(((scaled[:, None, :] - self.buffer[None, :, :]) ** 2).sum(axis=2))
+        distances = np.hstack([distances, buffer_distances])
+        buffer_positions = len(self.vectors) + np.arange(len(self.buffer))
+        positions = np.hstack([positions, np.broadcast_to(buffer_positions, buffer_distances.shape)])
+        order = np.argsort(distances, axis=1, kind="stable")[:, :k]
+        return np.take_along_axis(distances, order, 1), np.take_along_axis(positions, order, 1)
+
+    def query(self, X, k=5):
+        """Top-k similar cases for each row of X, one DataFrame per row"""
+        return self._cases_for(*self.query_vectors(self.transform(X), k))
+
+    def query_transformed(self, X_trans, k=5):
+        """Same as query() for rows already passed through the pipeline's preprocess step"""
+        scaled = np.asarray(X_trans.toarray() if hasattr(X_trans, "toarray") else X_trans, dtype=np.float32)
+        return self._cases_for(*self.query_vectors(scaled / self.scale, k))
+
+    def _cases_for(self, distances, positions):
+        results = []
+        for row_distances, row_positions in zip(distances, positions):
+            similar = self._all_cases.iloc[row_positions].reset_index(drop=True)
+            similar.insert(0, "distance", row_distances)
+            results.append(similar)
+        return results
+
+    def save(self, path=INDEX_PATH):
+        """Store the scaled vectors and cases; the tree is rebuilt on load"""
+        joblib.dump({
+            "preprocess": self.preprocess,
+            "scale": self.scale,
+            "vectors": np.vstack([self.vectors, self.buffer]),
+            "cases": self._all_cases,
+            "leaf_size": self.leaf_size,
+            "rebuild_at": self.rebuild_at,
+        }, path)
+
+    @classmethod
+    def load(cls, path=INDEX_PATH):
+        state = joblib.load(path)
+        return cls(state["preprocess"], state["vectors"], state["cases"], state["leaf_size"],
+                   state["rebuild_at"], scale=state["scale"])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Nearest-neighbour index over labelled cases")
+    parser.add_argument("command", choices=["build", "bench"])
+    parser.add_argument("--model", default=MODEL_PATH)
+    parser.add_argument("--data", default="Data/Nova_CleanedEDA_df.csv")
+    parser.add_argument("--index", default=INDEX_PATH)
+    parser.add_argument("--all-cases", action="store_true", help="Index legitimate cases too, not just frauds")
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--queries", type=int, default=500)
+    args = parser.parse_args()
+
+    if args.command == "build":
+        model = load_pipeline(args.model)
+        start = time.perf_counter()
+        index = SimilarCaseIndex.from_labelled(model.named_steps["preprocess"], pd.read_csv(args.data),
+                                               frauds_only=not args.all_cases)
+        index.save(args.index)
+        print(f"Indexed {len(index)} cases ({index.vectors.shape[1]} features) in "
+              f"{time.perf_counter() - start:.2f}s -> {args.index}")
+        return
+
+    index = SimilarCaseIndex.load(args.index)
+    df = pd.read_csv(args.data)
+    X = build_model_frame(df)
+    rng = np.random.default_rng(42)
+    rows = rng.integers(0, len(X), args.queries)
+
+    transformed = [index.preprocess.transform(X.iloc[[i]]) for i in rows]
+
+    def report_latency():
+        end_to_end, lookup = [], []
+        for i, X_trans in zip(rows, transformed):
+            start = time.perf_counter()
+            index.query(X.iloc[[i]], args.k)
+            end_to_end.append(time.perf_counter() - start)
+            start = time.perf_counter()
+            index.query_transformed(X_trans, args.k)
+            lookup.append(time.perf_counter() - start)
+        for label, timings in [("from raw row", end_to_end), ("from transformed row", lookup)]:
+            timings = np.array(timings) * 1e3
+            print(f"{len(index)} cases, top-{args.k} {label:>20}: p50 {np.percentile(timings, 50):.2f} ms  "
+                  f"p99 {np.percentile(timings, 99):.2f} ms")
+
+    report_latency()
+
+    # Exactness against brute force over the same scaled vectors
+    scaled = index.transform(X.iloc[rows])
+    distances, _ = index.query_vectors(scaled, args.k)
+    brute = np.sqrt(((scaled[:, None, :] - index.vectors[None, :, :]) ** 2).sum(axis=2))
+    brute = np.sort(brute, axis=1)[:, :args.k]
+    print(f"matches brute force: {np.allclose(distances, brute, atol=1e-3)}")
+
+    # Incremental updates: buffer a batch of new cases, then query again
+    new = rng.integers(0, len(X), 500)
+    start = time.perf_counter()
+    index.add_cases(X.iloc[new], df.iloc[new])
+    print(f"added 500 cases in {(time.perf_counter() - start) * 1e3:.1f} ms (buffered: {len(index.buffer)})")
+    report_latency()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,204 @@
+"""Precomputed holdout score index for threshold what-if analysis.
+
+The holdout split is scored once and stored sorted by fraud probability with
+cumulative true-positive, false-positive and fraud-amount counts. Any decision
+threshold then maps to recall, precision, decline rate and cost with one
+binary search, so the what-if page never calls the model. The index records
+the model file it was built from, and ``stale_reason`` reports when the
+registry has moved on to another model since.
+
+Usage:
+    python -m novapay.thresholds build
+    python -m novapay.thresholds query --threshold 0.4 --false-decline-cost 25
+"""
+import argparse
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+from novapay.features import load_labelled_frame, train_holdout_split
+from novapay.registry import MODEL_DIR, available_versions
+from novapay.scoring import (
+    DECISION_THRESHOLD, HIGH_RISK_CUTOFF, MEDIUM_RISK_CUTOFF, MODEL_PATH, load_pipeline, score_transactions,
+)
+
+INDEX_PATH = "Model/holdout_score_index.npz"
+
+# Cost of declining a legitimate transaction (support contact, lost customer)
+FALSE_DECLINE_COST = 25.0
+
+
+class ThresholdIndex:
+    """Holdout probabilities sorted descending with cumulative outcome counts"""
+
+    def __init__(self, probabilities, labels, amounts, meta=None):
+        probabilities = np.asarray(probabilities, dtype=float)
+        order = np.argsort(-probabilities, kind="stable")
+        self.probabilities = probabilities[order]
+        labels = np.asarray(labels, dtype=np.int64)[order]
+        amounts = np.asarray(amounts, dtype=float)[order]
+        self.n = len(labels)
+        self.frauds = int(labels.sum())
+        self.fraud_amount = float((amounts * labels).sum())
+        self.meta = meta or {}
+
+        # cum_*[k] = outcome totals when the k highest-scored transactions are declined
+        self.cum_tp = np.concatenate([[0], np.cumsum(labels)])
+        self.cum_fp = np.concatenate([[0], np.cumsum(1 - labels)])
+        self.cum_fraud_amount = np.concatenate([[0.0], np.cumsum(amounts * labels)])
+        self._ascending = self.probabilities[::-1]
+
+    @classmethod
+    def from_model(cls, model, X, y, model_path=None):
+        """Score a labelled holdout frame once and index it"""
+        proba = score_transactions(model, X, matrix="sparse")["fraud_probability"].to_numpy()
+        meta = {"model_path": model_path, "rows": len(X)}
+        return cls(proba, np.asarray(y), X["amount_usd"].to_numpy(), meta)
+
+    def declined(self, threshold):
+        """Number of holdout transactions with probability above the threshold"""
+        return self.n - np.searchsorted(self._ascending, threshold, side="right")
+
+    def at(self, threshold, false_decline_cost=FALSE_DECLINE_COST, missed_fraud_cost=0.0):
+        """Metrics when declining every transaction scored above ``threshold``"""
+        k = self.declined(threshold)
+        tp = int(self.cum_tp[k])
+        fp = int(self.cum_fp[k])
+        fn = self.frauds - tp
+        missed_amount = self.fraud_amount - float(self.cum_fraud_amount[k])
+        return {
+            "threshold": float(threshold),
+            "declined": int(k),
+            "tp": tp,
+            "fp": fp,
+            "fn": fn,
+            "tn": self.n - self.frauds - fp,
+            "recall": tp / self.frauds if self.frauds else 0.0,
+            "precision": tp / k if k else 1.0,
+            "decline_rate": k / self.n,
+            "false_decline_rate": fp / (self.n - self.frauds) if self.n > self.frauds else 0.0,
+            "missed_fraud_usd": missed_amount,
+            "cost": missed_amount + fn * missed_fraud_cost + fp * false_decline_cost,
+        }
+
+    def curve(self, thresholds=None, false_decline_cost=FALSE_DECLINE_COST, missed_fraud_cost=0.0):
+        """Metrics for many thresholds at once (vectorized)"""
+        thresholds = np.linspace(0, 1, 101) if thresholds is None else np.asarray(thresholds, dtype=float)
+        k = self.declined(thresholds)
+        tp = self.cum_tp[k]
+        fp = self.cum_fp[k]
+        fn = self.frauds - tp
+        missed_amount = self.fraud_amount - self.cum_fraud_amount[k]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            precision = np.where(k > 0, tp / np.maximum(k, 1), 1.0)
+        return pd.DataFrame({
+            "threshold": thresholds,
+            "recall": tp / self.frauds if self.frauds else 0.0,
+            "precision": precision,
+            "decline_rate": k / self.n,
+            "cost": missed_amount + fn * missed_fraud_cost + fp * false_decline_cost,
+        })
+
+    def best_threshold(self, false_decline_cost=FALSE_DECLINE_COST, missed_fraud_cost=0.0):
+        """Threshold with the lowest cost on the holdout"""
+        # Only thresholds at distinct scores change the outcome
+        candidates = np.concatenate([[0.0], np.unique(self.probabilities)])
+        curve = self.curve(candidates, false_decline_cost, missed_fraud_cost)
+        return float(curve.loc[curve["cost"].idxmin(), "threshold"])
+
+    def risk_bands(self, medium_cutoff=MEDIUM_RISK_CUTOFF, high_cutoff=HIGH_RISK_CUTOFF):
+        """Share of holdout transactions and fraud rate in each risk level"""
+        k_medium = self.declined(medium_cutoff)
+        k_high = self.declined(high_cutoff)
+        rows = []
+        for level, lo, hi in [("HIGH", 0, k_high), ("MEDIUM", k_high, k_medium), ("LOW", k_medium, self.n)]:
+            count = hi - lo
+            frauds = int(self.cum_tp[hi] - self.cum_tp[lo])
+            rows.append({
+                "risk_level": level,
+                "transactions": int(count),
+                "share": count / self.n,
+                "frauds": frauds,
+                "fraud_rate": frauds / count if count else 0.0,
+            })
+        return pd.DataFrame(rows)
+
+    def stale_reason(self, model_dir=MODEL_DIR):
+        """Why the index no longer describes the model the registry serves, or None"""
+        versions = available_versions(model_dir, settle_seconds=0)
+        if not versions:
+            return None
+        version, path = versions[0]
+        built_from = self.meta.get("model_path")
+        if built_from is None or "model_mtime" not in self.meta:
+            return "it does not record which model it was built from"
+        if os.path.abspath(built_from) != os.path.abspath(path):
+            return f"it was built from {built_from}, but the registry serves {version}"
+        if os.path.getmtime(path) != self.meta["model_mtime"]:
+            return f"{path} has changed since it was built"
+        return None
+
+    def save(self, path=INDEX_PATH):
+        labels = np.diff(self.cum_tp).astype(np.int8)
+        amounts = np.diff(self.cum_fraud_amount)
+        np.savez_compressed(path, probabilities=self.probabilities, labels=labels,
+                            fraud_amounts=amounts, meta=json.dumps(self.meta))
+
+    @classmethod
+    def load(cls, path=INDEX_PATH):
+        with np.load(path) as data:
+            # Only fraud amounts are needed for the cost, so legit rows are stored as 0
+            return cls(data["probabilities"], data["labels"], data["fraud_amounts"], json.loads(str(data["meta"])))
+
+
+def build_index(model_path=None, data_path="Data/Nova_CleanedEDA_df.csv", output=INDEX_PATH):
+    """Score the notebook 05 holdout split and store its index (default: the model the registry serves)"""
+    if model_path is None:
+        versions = available_versions(settle_seconds=0)
+        model_path = versions[0][1] if versions else MODEL_PATH
+    model = load_pipeline(model_path)
+    X, y = load_labelled_frame(data_path)
+    _, X_test, _, y_test = train_holdout_split(X, y)
+    index = ThresholdIndex.from_model(model, X_test, y_test, model_path)
+    index.meta["model_mtime"] = os.path.getmtime(model_path)
+    index.save(output)
+    return index
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Holdout score index for threshold what-if analysis")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    build = sub.add_parser("build", help="Score the holdout split and store the index")
+    build.add_argument("--model", default=None, help="Pipeline to index (default: the newest registry version)")
+    build.add_argument("--data", default="Data/Nova_CleanedEDA_df.csv")
+    build.add_argument("--output", default=INDEX_PATH)
+
+    query = sub.add_parser("query", help="Metrics at a threshold")
+    query.add_argument("--index", default=INDEX_PATH)
+    query.add_argument("--threshold", type=float, default=DECISION_THRESHOLD)
+    query.add_argument("--false-decline-cost", type=float, default=FALSE_DECLINE_COST)
+    query.add_argument("--missed-fraud-cost", type=float, default=0.0,
+                       help="Fixed cost per missed fraud on top of the fraud amount")
+    args = parser.parse_args()
+
+    if args.command == "build":
+        index = build_index(args.model, args.data, args.output)
+        print(f"Indexed {index.n} holdout transactions ({index.frauds} frauds) -> {args.output}")
+        return
+
+    index = ThresholdIndex.load(args.index)
+    stale = index.stale_reason()
+    if stale:
+        print(f"Warning: the index may be out of date ({stale}); rerun `build`.\n")
+    for key, value in index.at(args.threshold, args.false_decline_cost, args.missed_fraud_cost).items():
+        print(f"{key:>20}: {value:.4f}" if isinstance(value, float) else f"{key:>20}: {value}")
+    best = index.best_threshold(args.false_decline_cost, args.missed_fraud_cost)
+    print(f"\nLowest-cost threshold on the holdout: {best:.3f}")
+    print(index.risk_bands().to_string(index=False, float_format=lambda v: f"{v:.4f}"))
+
+
+if __name__ == "__main__":
+    main()
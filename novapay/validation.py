@@ -0,0 +1,339 @@
+"""Schema validation and normalization for raw transaction batches.
+
+``clean_transactions`` repairs what it can and clips the rest, so it never
+says what was wrong with a row. ``TransactionValidator`` compiles a schema
+once: types, ranges, category sets and known spelling variants. It then
+checks a whole batch column by column with numpy masks. Each column gives a
+normalized array plus an int8 error code per row. The result holds the
+normalized frame, a validity mask and a (rows x fields) code matrix;
+``report`` expands only the failing cells into one row per error.
+
+Categories are checked on their distinct values. ``pd.factorize`` maps a
+million rows onto a few dozen spellings, each spelling is looked up once, and
+the answer is broadcast back through the codes. Numbers and timestamps go
+through one vectorized parse, and the slower fallback (comma stripping, mixed
+timestamp formats) only sees the values that failed it.
+
+Usage:
+    python -m novapay.validation check --data Data/nova_pay_transcations.csv
+    python -m novapay.validation bench --rows 1000000
+"""
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+from novapay.cleaning import CHANNEL_VARIANTS, COUNTRY_VARIANTS, KYC_VARIANTS
+
+# Error codes stored per (row, field); 0 means the value is valid
+OK = 0
+MISSING = 1
+TYPE = 2
+RANGE = 3
+CATEGORY = 4
+ERROR_NAMES = ["ok", "missing", "type", "range", "category"]
+
+COUNTRIES = ["US", "UK", "CA", "Unknown"]
+SOURCE_CURRENCIES = ["USD", "CAD", "GBP"]
+DEST_CURRENCIES = ["USD", "CAD", "GBP", "EUR", "CNY", "MXN", "INR", "NGN", "PHP"]
+SCORE = {"type": "number", "min": 0.0, "max": 1.0}
+COUNT = {"type": "integer", "min": 0}
+
+# Optional fields are either filled the way notebook 01 fills them or left missing for cleaning to fill
+SCHEMA = {
+    "transaction_id": {"type": "text", "required": False},
+    "timestamp": {"type": "timestamp"},
+    "customer_id": {"type": "text"},
+    "home_country": {"type": "category", "values": COUNTRIES, "variants": COUNTRY_VARIANTS, "fill": "Unknown"},
+    "source_currency": {"type": "category", "values": SOURCE_CURRENCIES},
+    "dest_currency": {"type": "category", "values": DEST_CURRENCIES},
+    "channel": {"type": "category", "values": ["WEB", "MOBILE", "ATM", "Unknown"], "variants": CHANNEL_VARIANTS,
+                "fill": "Unknown"},
+    "amount_src": {"type": "number", "min": 0.0},
+    "amount_usd": {"type": "number", "min": 0.0, "required": False},
+    "fee": {"type": "number", "min": 0.0, "required": False},
+    "exchange_rate_src_to_dest": {"type": "number", "min": 0.0, "positive": True},
+    "device_id": {"type": "text", "required": False},
+    "new_device": {"type": "flag"},
+    "ip_address": {"type": "text", "required": False},
+    "ip_country": {"type": "category", "values": COUNTRIES, "variants": COUNTRY_VARIANTS, "fill": "Unknown"},
+    "location_mismatch": {"type": "flag"},
+    "ip_risk_score": SCORE,
+    "kyc_tier": {"type": "category", "values": ["STANDARD", "ENHANCED", "LOW", "Not_Verified"],
+                 "variants": KYC_VARIANTS, "fill": "Not_Verified"},
+    "account_age_days": COUNT,
+    "device_trust_score": dict(SCORE, required=False),
+    "chargeback_history_count": COUNT,
+    "risk_score_internal": SCORE,
+    "txn_velocity_1h": dict(COUNT, required=False),
+    "txn_velocity_24h": dict(COUNT, required=False),
+    "corridor_risk": SCORE,
+}
+
+FLAG_VALUES = {"true": 1, "1": 1, "1.0": 1, "yes": 1, "false": 0, "0": 0, "0.0": 0, "no": 0}
+MISSING_KEYS = {"", "nan", "none", "null"}
+
+
+def _missing(present, spec):
+    """MISSING where a required value is absent"""
+    if spec.get("required", True) and "fill" not in spec:
+        return np.where(present, OK, MISSING).astype(np.int8)
+    return np.zeros(len(present), dtype=np.int8)
+
+
+def check_text(series, spec):
+    present = series.notna().to_numpy()
+    return series, _missing(present, spec)
+
+
+def check_number(series, spec):
+    """Parse numbers (thousands separators allowed) and apply min/max"""
+    present = series.notna().to_numpy()
+    if pd.api.types.is_numeric_dtype(series) and series.dtype != bool:
+        values = series.to_numpy(dtype=float, copy=True)
+    else:
+        values = pd.to_numeric(series, errors="coerce").to_numpy(dtype=float, copy=True)
+        retry = present & np.isnan(values)
+        if retry.any():
+            text = series[retry].astype("string").str.replace(",", "").str.strip()
+            values[retry] = pd.to_numeric(text, errors="coerce").to_numpy(dtype=float)
+    codes = _missing(present, spec)
+    parsed = ~np.isnan(values)
+    codes[present & ~parsed] = TYPE
+    if spec["type"] == "integer":
+        codes[parsed & (values != np.round(values))] = TYPE
+    bad = np.zeros(len(values), dtype=bool)
+    with np.errstate(invalid="ignore"):
+        if "min" in spec:
+            bad |= values < spec["min"]
+        if "max" in spec:
+            bad |= values > spec["max"]
+        if spec.get("positive"):
+            bad |= values <= 0
+    codes[parsed & bad & (codes == OK)] = RANGE
+    values[codes != OK] = np.nan
+    if spec["type"] == "integer" and parsed.all() and not codes.any():
+        return values.astype(np.int64), codes
+    return values, codes
+
+
+def check_timestamp(series, spec):
+    """Parse ISO-8601 timestamps, falling back to mixed formats for the rest"""
+    present = series.notna().to_numpy()
+    if isinstance(series.dtype, pd.DatetimeTZDtype):
+        values = series
+    else:
+        values = pd.to_datetime(series, errors="coerce", utc=True, format="ISO8601")
+        retry = present & values.isna().to_numpy()
+        if retry.any():
+            # Failing strings are usually a few repeated placeholders, so each distinct one is parsed once
+            keys, uniques = pd.factorize(series[retry])
+            values = values.copy()
+            values[retry] = pd.to_datetime(pd.Series(uniques), errors="coerce", utc=True, format="mixed").array.take(keys)
+    codes = _missing(present, spec)
+    codes[present & values.isna().to_numpy()] = TYPE
+    return values, codes
+
+
+def _lookup(series, resolve, dtype):
+    """Resolve each distinct value once and broadcast (value, code) back to every row"""
+    keys, uniques = pd.factorize(series, use_na_sentinel=True)
+    resolved = [resolve(value) for value in uniques] + [resolve(None)]
+    values = pd.array([value for value, _ in resolved], dtype=dtype)
+    codes = np.array([code for _, code in resolved], dtype=np.int8)
+    return values.take(keys), codes[keys]
+
+
+def check_category(series, spec):
+    """Map spelling variants to the canonical value and reject anything outside the set"""
+    canonical = {value.lower(): value for value in spec["values"]}
+    canonical.update({k: v for k, v in spec.get("variants", {}).items() if not pd.isna(v)})
+    missing_keys = MISSING_KEYS | {k for k, v in spec.get("variants", {}).items() if pd.isna(v)}
+    absent = (spec["fill"], OK) if "fill" in spec else (np.nan, MISSING if spec.get("required", True) else OK)
+
+    def resolve(value):
+        key = None if value is None else str(value).strip().lower()
+        if key is None or key in missing_keys:
+            return absent
+        if key in canonical:
+            return canonical[key], OK
+        return np.nan, CATEGORY
+
+    return _lookup(series, resolve, "str")
+
+
+def check_flag(series, spec):
+    """Booleans, 0/1 or true/false strings as 0/1 integers"""
+    def resolve(value):
+        if value is None:
+            return np.nan, MISSING if spec.get("required", True) else OK
+        key = str(value).strip().lower()
+        return (FLAG_VALUES[key], OK) if key in FLAG_VALUES else (np.nan, TYPE)
+
+    if series.dtype == bool:
+        return series.to_numpy(dtype=np.int64), np.zeros(len(series), dtype=np.int8)
+    values, codes = _lookup(series, resolve, float)
+    values = values.to_numpy()
+    return (values if np.isnan(values).any() else values.astype(np.int64)), codes
+
+
+CHECKS = {
+    "text": check_text,
+    "number": check_number,
+    "integer": check_number,
+    "timestamp": check_timestamp,
+    "category": check_category,
+    "flag": check_flag,
+}
+
+
+class ValidationResult:
+    """Normalized batch plus an error code per (row, field)"""
+
+    def __init__(self, data, codes, fields, raw):
+        self.data = data
+        self.codes = codes
+        self.fields = fields
+        self._raw = raw
+        self.valid = ~codes.any(axis=1)
+
+    @property
+    def n_invalid(self):
+        return int(len(self.valid) - self.valid.sum())
+
+    def summary(self):
+        """Error counts per field and error type"""
+        counts = np.stack([(self.codes == code).sum(axis=0) for code in range(1, len(ERROR_NAMES))], axis=1)
+        table = pd.DataFrame(counts, index=self.fields, columns=ERROR_NAMES[1:])
+        return table[table.sum(axis=1) > 0]
+
+    def report(self):
+        """One row per failing cell: row label, field, error and the raw value"""
+        rows, cols = np.nonzero(self.codes)
+        fields = np.array(self.fields, dtype=object)
+        values = np.empty(len(rows), dtype=object)
+        for j in np.unique(cols):
+            mask = cols == j
+            name = self.fields[j]
+            values[mask] = self._raw[name].iloc[rows[mask]].to_numpy(dtype=object) if name in self._raw.columns else None
+        return pd.DataFrame({
+            "row": self.data.index.to_numpy()[rows],
+            "field": fields[cols],
+            "error": np.array(ERROR_NAMES, dtype=object)[self.codes[rows, cols]],
+            "value": values,
+        })
+
+    def messages(self):
+        """'field: error' list per invalid row, indexed by row label"""
+        report = self.report()
+        return (report["field"] + ": " + report["error"]).groupby(report["row"], sort=False).agg(", ".join)
+
+
+class TransactionValidator:
+    """Checks and normalizes raw transaction batches against a compiled schema"""
+
+    def __init__(self, schema=None):
+        self.schema = SCHEMA if schema is None else schema
+        self.fields = list(self.schema)
+        self._checks = [(name, CHECKS[spec["type"]], spec) for name, spec in self.schema.items()]
+
+    def validate(self, df):
+        """Validate a DataFrame; columns outside the schema pass through untouched"""
+        codes = np.zeros((len(df), len(self.fields)), dtype=np.int8)
+        data = df.copy(deep=False)
+        for j, (name, check, spec) in enumerate(self._checks):
+            series = df[name] if name in df.columns else pd.Series(None, index=df.index, dtype=object)
+            values, codes[:, j] = check(series, spec)
+            data[name] = values
+        return ValidationResult(data, codes, self.fields, df)
+
+    def validate_records(self, records):
+        """Validate a list of dicts (API or NDJSON payloads)"""
+        return self.validate(pd.DataFrame.from_records(records))
+
+
+def corrupt(df, rate, seed=42):
+    """Copy of raw transactions with a ``rate`` share of rows given one bad value each"""
+    rng = np.random.default_rng(seed)
+    df = df.copy()
+    rows = np.flatnonzero(rng.random(len(df)) < rate)
+    kind = rng.integers(0, 4, len(rows))
+    for k, column, value in [(0, "ip_risk_score", 1.7), (1, "channel", "FAX"), (2, "account_age_days", "abc"),
+                             (3, "customer_id", None)]:
+        target = rows[kind == k]
+        df[column] = df[column].astype(object)
+        df.iloc[target, df.columns.get_loc(column)] = value
+    return df, rows
+
+
+def notebook_normalize(df):
+    """Row-at-a-time category fixes as notebook 01 does them, for the benchmark"""
+    out = {}
+    for column, variants in [("home_country", COUNTRY_VARIANTS), ("ip_country", COUNTRY_VARIANTS),
+                             ("channel", CHANNEL_VARIANTS), ("kyc_tier", KYC_VARIANTS)]:
+        out[column] = df[column].apply(lambda v: variants.get(str(v).strip().lower(), v))
+    return out
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Validate raw transactions and benchmark the validator")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    check = sub.add_parser("check", help="Validate a raw CSV and print the error summary")
+    check.add_argument("--data", default="Data/nova_pay_transcations.csv")
+    check.add_argument("--show", type=int, default=10, help="Failing cells to print")
+
+    bench = sub.add_parser("bench", help="Validate a large batch with injected errors")
+    bench.add_argument("--data", nargs="+", default=["Data/nova_pay_transcations.csv",
+                                                     "Data/nova_pay_fraud_boost.csv"])
+    bench.add_argument("--rows", type=int, default=1_000_000)
+    bench.add_argument("--error-rate", type=float, default=0.01)
+    args = parser.parse_args()
+
+    validator = TransactionValidator()
+    if args.command == "check":
+        raw = pd.read_csv(args.data)
+        start = time.perf_counter()
+        result = validator.validate(raw)
+        elapsed = time.perf_counter() - start
+        print(f"{len(raw):,} rows in {elapsed * 1e3:.0f} ms: {result.n_invalid:,} invalid")
+        print(result.summary().to_string())
+        print(result.report().head(args.show).to_string(index=False))
+        return
+
+    history = pd.concat([pd.read_csv(path) for path in args.data], ignore_index=True)
+    rng = np.random.default_rng(0)
+    batch = history.iloc[rng.integers(0, len(history), args.rows)].reset_index(drop=True)
+    batch, corrupted = corrupt(batch, args.error_rate)
+
+    start = time.perf_counter()
+    result = validator.validate(batch)
+    validate_seconds = time.perf_counter() - start
+    start = time.perf_counter()
+    report = result.report()
+    report_seconds = time.perf_counter() - start
+
+    caught = np.isin(corrupted, report["row"].to_numpy()).mean()
+    print(f"validated {args.rows:,} rows in {validate_seconds:.2f}s ({args.rows / validate_seconds:,.0f} rows/s); "
+          f"report of {len(report):,} failing cells in {report_seconds * 1e3:.0f} ms")
+    print(f"{result.n_invalid:,} invalid rows; injected errors caught: {caught:.2%} of {len(corrupted):,}; "
+          f"error codes {result.codes.nbytes / 1e6:.0f} MB")
+    print(result.summary().to_string())
+
+    sample = batch.iloc[:100_000]
+    start = time.perf_counter()
+    notebook = notebook_normalize(sample)
+    apply_seconds = (time.perf_counter() - start) * args.rows / len(sample)
+    start = time.perf_counter()
+    vectorized = {c: check_category(sample[c], SCHEMA[c]) for c in notebook}
+    category_seconds = (time.perf_counter() - start) * args.rows / len(sample)
+    # Compare rows both accept: the notebook leaves 'unknown' missing and passes unknown values through
+    agree = np.mean([(notebook[c].to_numpy() == values.to_numpy())[notebook[c].notna().to_numpy() & (codes == OK)].mean()
+                     for c, (values, codes) in vectorized.items()])
+    print(f"category normalization, 4 columns at {args.rows:,} rows: row-wise .apply {apply_seconds:.2f}s "
+          f"vs factorized lookup {category_seconds:.2f}s (agree on {agree:.2%} of values)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+import streamlit as st
+
+from novapay.drift import MIN_SAMPLES, PSI_MODERATE, PSI_SIGNIFICANT, shared_monitor
+
+st.set_page_config(
+    page_title="Drift Monitor",
+    page_icon="📈",
+    layout="wide",
+)
+
+STATUS_COLORS = {"significant": "#D32F2F", "moderate": "#F57C00", "stable": "#388E3C",
+                 "warming up": "#9E9E9E", "no data": "#9E9E9E"}
+
+
+def color_status(value):
+    return f"color: {STATUS_COLORS.get(value, '#000000')}; font-weight: bold"
+
+
+def main():
+    st.markdown("## 📈 Input Drift Monitor")
+    st.markdown(
+        f"Live transactions scored in this app compared against the training data. "
+        f"PSI above {PSI_MODERATE} is moderate drift, above {PSI_SIGNIFICANT} significant."
+    )
+
+    try:
+        monitor = shared_monitor()
+    except Exception as e:
+        st.error(f"Error loading training reference: {str(e)}")
+        return
+
+    report = monitor.report()
+    col1, col2, col3 = st.columns(3)
+    col1.metric("Transactions Seen", f"{monitor.seen:,}")
+    col2.metric("Significant Drift", int((report["status"] == "significant").sum()))
+    col3.metric("Moderate Drift", int((report["status"] == "moderate").sum()))
+
+    if monitor.seen == 0:
+        st.info("No transactions scored yet. Run a prediction on the main page to start monitoring.")
+    elif monitor.seen < MIN_SAMPLES:
+        st.info(f"Drift status is shown once {MIN_SAMPLES} transactions have been scored.")
+
+    st.markdown("### 📋 Drift by Feature")
+    st.dataframe(
+        report.style.format({"psi": "{:.4f}", "ks": "{:.4f}"}, na_rep="–").map(color_status, subset=["status"]),
+        use_container_width=True,
+        hide_index=True,
+    )
+
+    st.markdown("### 🔍 Distribution Detail")
+    feature = st.selectbox("Feature", report["feature"].tolist())
+    st.bar_chart(monitor.distribution(feature).set_index("bin"), stack=False)
+
+    if st.button("Reset Live Window"):
+        monitor.reset()
+        st.rerun()
+
+
+main()
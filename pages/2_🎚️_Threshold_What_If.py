@@ -0,0 +1,105 @@
+import os
+
+import streamlit as st
+
+from novapay.scoring import DECISION_THRESHOLD, HIGH_RISK_CUTOFF, MEDIUM_RISK_CUTOFF
+from novapay.thresholds import FALSE_DECLINE_COST, INDEX_PATH, ThresholdIndex, build_index
+
+st.set_page_config(
+    page_title="Threshold What-If",
+    page_icon="🎚️",
+    layout="wide",
+)
+
+
+@st.cache_resource
+def load_threshold_index():
+    """Load the precomputed holdout score index"""
+    if not os.path.exists(INDEX_PATH):
+        return None
+    return ThresholdIndex.load(INDEX_PATH)
+
+
+def rebuild_index():
+    """Score the holdout set with the served model, then reload the page"""
+    with st.spinner("Scoring the holdout set..."):
+        try:
+            build_index()
+        except Exception as e:
+            st.error(f"Error building index: {str(e)}")
+            return
+    load_threshold_index.clear()
+    st.rerun()
+
+
+def main():
+    st.markdown("## 🎚️ Threshold What-If")
+    st.markdown(
+        "Recall, precision, decline rate and cost on the holdout set for any decision threshold. "
+        "Every number comes from a precomputed score index, so no model calls are made."
+    )
+
+    index = load_threshold_index()
+    if index is None:
+        st.info(f"No holdout score index found at `{INDEX_PATH}`.")
+        if st.button("Build Index"):
+            rebuild_index()
+        return
+
+    # The index is cached, but the registry may have moved to a new model since
+    stale = index.stale_reason()
+    if stale:
+        st.warning(f"⚠️ The holdout score index may be out of date: {stale}. "
+                   "Rebuild it to see numbers for the model being served.")
+        if st.button("Rebuild Index"):
+            rebuild_index()
+
+    with st.sidebar:
+        st.markdown("### 💵 Costs")
+        false_decline_cost = st.number_input("Cost per False Decline (USD)", min_value=0.0,
+                                             value=FALSE_DECLINE_COST, step=5.0)
+        missed_fraud_cost = st.number_input("Extra Cost per Missed Fraud (USD)", min_value=0.0,
+                                            value=0.0, step=10.0,
+                                            help="Added on top of the missed fraud amount")
+
+    threshold = st.slider("Decline Threshold", min_value=0.0, max_value=1.0,
+                          value=DECISION_THRESHOLD, step=0.01)
+    current = index.at(DECISION_THRESHOLD, false_decline_cost, missed_fraud_cost)
+    chosen = index.at(threshold, false_decline_cost, missed_fraud_cost)
+
+    col1, col2, col3, col4 = st.columns(4)
+    col1.metric("Recall", f"{chosen['recall']:.1%}", f"{chosen['recall'] - current['recall']:+.1%}")
+    col2.metric("Precision", f"{chosen['precision']:.1%}", f"{chosen['precision'] - current['precision']:+.1%}")
+    col3.metric("Decline Rate", f"{chosen['decline_rate']:.2%}",
+                f"{chosen['decline_rate'] - current['decline_rate']:+.2%}", delta_color="inverse")
+    col4.metric("Cost (USD)", f"{chosen['cost']:,.0f}", f"{chosen['cost'] - current['cost']:+,.0f}",
+                delta_color="inverse")
+    st.caption(
+        f"Compared with the deployed threshold of {DECISION_THRESHOLD}. "
+        f"{chosen['tp']} frauds caught, {chosen['fn']} missed, {chosen['fp']} legitimate transactions declined "
+        f"out of {index.n:,} holdout transactions."
+    )
+
+    best = index.best_threshold(false_decline_cost, missed_fraud_cost)
+    st.markdown(f"**Lowest-cost threshold on the holdout:** {best:.3f}")
+
+    curve = index.curve(false_decline_cost=false_decline_cost, missed_fraud_cost=missed_fraud_cost)
+    col1, col2 = st.columns(2)
+    with col1:
+        st.markdown("### 📈 Recall, Precision & Decline Rate")
+        st.line_chart(curve.set_index("threshold")[["recall", "precision", "decline_rate"]])
+    with col2:
+        st.markdown("### 💵 Cost")
+        st.line_chart(curve.set_index("threshold")[["cost"]])
+
+    st.markdown("### 🚦 Risk Levels")
+    medium_cutoff, high_cutoff = st.slider("Medium / High Risk Cutoffs", min_value=0.0, max_value=1.0,
+                                           value=(MEDIUM_RISK_CUTOFF, HIGH_RISK_CUTOFF), step=0.01)
+    st.dataframe(
+        index.risk_bands(medium_cutoff, high_cutoff).style.format({"share": "{:.2%}", "fraud_rate": "{:.2%}"}),
+        use_container_width=True,
+        hide_index=True,
+    )
+
+
+main()
@@ -0,0 +1,69 @@
+import pandas as pd
+import streamlit as st
+
+from novapay.shap_aggregates import shared_aggregator
+
+st.set_page_config(
+    page_title="Risk Drivers",
+    page_icon="🧭",
+    layout="wide",
+)
+
+SEGMENT_LABELS = {"channel": "Channel", "currency_pair": "Corridor", "decision": "Decision"}
+WINDOWS = {"Today": 1, "Last 7 days": 7}
+
+
+@st.cache_data
+def load_feature_names():
+    """Load the feature names used by the model"""
+    return pd.read_csv("Data/rf_shap_feature_names.csv")["feature_name"].tolist()
+
+
+def main():
+    st.markdown("## 🧭 Risk Drivers")
+    st.markdown(
+        "Mean |SHAP| and mean signed SHAP of the fraud class for every transaction explained in this app, "
+        "kept as running totals per channel, corridor and decision. No SHAP values are recomputed here."
+    )
+
+    try:
+        aggregator = shared_aggregator(load_feature_names())
+    except Exception as e:
+        st.error(f"Error loading SHAP aggregates: {str(e)}")
+        return
+
+    window = st.radio("Window", list(WINDOWS), horizontal=True)
+    days = WINDOWS[window]
+    total = aggregator.count(days=days)
+    col1, col2 = st.columns(2)
+    col1.metric("Transactions Explained", f"{total:,}")
+    col2.metric("Declines Explained", f"{aggregator.count('decision', 'DECLINE', days):,}")
+
+    if total == 0:
+        st.info("No explained transactions in this window. Declined transactions are explained on the main page.")
+        return
+
+    col1, col2 = st.columns(2)
+    dimension = col1.selectbox("Segment By", list(SEGMENT_LABELS), format_func=SEGMENT_LABELS.get)
+    segments = aggregator.segments(dimension, days)
+    labels = {value: f"{value} ({count:,})" for value, count in zip(segments["value"], segments["explained"])}
+    value = col2.selectbox(SEGMENT_LABELS[dimension], list(labels), format_func=labels.get)
+
+    st.markdown("### 🔝 Top Drivers")
+    top_k = st.slider("Features Shown", min_value=5, max_value=30, value=10)
+    drivers = aggregator.drivers(dimension, value, days, top_k=top_k)
+    st.bar_chart(drivers.set_index("feature")[["mean_abs_shap", "mean_shap"]], horizontal=True, stack=False)
+    st.dataframe(
+        drivers.style.format({"mean_abs_shap": "{:.4f}", "mean_shap": "{:+.4f}"}),
+        use_container_width=True,
+        hide_index=True,
+    )
+
+    st.markdown(f"### 📊 Mean |SHAP| by {SEGMENT_LABELS[dimension]}")
+    st.dataframe(
+        aggregator.compare(dimension, days, top_k=8).style.format("{:.4f}"),
+        use_container_width=True,
+    )
+
+
+main()
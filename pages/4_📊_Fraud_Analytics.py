@@ -0,0 +1,93 @@
+import os
+import time
+
+import streamlit as st
+
+from novapay.fraud_aggregates import AGGREGATES_PATH, DIMENSIONS, PERIODS, FraudAggregates, rebuild
+
+st.set_page_config(
+    page_title="Fraud Analytics",
+    page_icon="📊",
+    layout="wide",
+)
+
+DIMENSION_LABELS = {
+    "channel": "Channel",
+    "location_mismatch": "Location Mismatch",
+    "home_country": "Home Country",
+    "kyc_tier": "KYC Tier",
+    "new_device": "New Device",
+}
+
+
+@st.cache_resource
+def load_fraud_aggregates():
+    """Open the fraud-rate aggregate table"""
+    if not os.path.exists(AGGREGATES_PATH):
+        return None
+    return FraudAggregates(AGGREGATES_PATH)
+
+
+def main():
+    st.markdown("## 📊 Fraud Analytics")
+    st.markdown(
+        "Fraud rates by channel, location mismatch, home country, KYC tier and new device. "
+        "Counts are kept per day as transactions are scored and labelled, so nothing here scans the history."
+    )
+
+    aggregates = load_fraud_aggregates()
+    if aggregates is None:
+        st.info(f"No fraud aggregates found at `{AGGREGATES_PATH}`.")
+        if st.button("Build From History"):
+            with st.spinner("Aggregating the labelled history..."):
+                try:
+                    rebuild()
+                except Exception as e:
+                    st.error(f"Error building aggregates: {str(e)}")
+                    return
+            load_fraud_aggregates.clear()
+            st.rerun()
+        return
+
+    first, last = aggregates.date_range()
+    if first is None:
+        st.info("The aggregate table is empty.")
+        return
+
+    col1, col2, col3 = st.columns(3)
+    dimension = col1.selectbox("Dimension", DIMENSIONS, format_func=DIMENSION_LABELS.get)
+    period = col2.selectbox("Period", list(PERIODS), index=2, format_func=str.title)
+    dates = col3.date_input("Date Range", value=(first.date(), last.date()),
+                            min_value=first.date(), max_value=last.date())
+    if len(dates) != 2:
+        st.info("Pick the end of the date range.")
+        return
+    start, end = dates
+
+    query_start = time.perf_counter()
+    totals = aggregates.totals(start, end)
+    rates = aggregates.rates(dimension, start, end)
+    series = aggregates.series(dimension, period, start, end)
+    query_ms = (time.perf_counter() - query_start) * 1e3
+
+    col1, col2, col3, col4 = st.columns(4)
+    col1.metric("Transactions", f"{totals['transactions']:,}")
+    col2.metric("Labelled", f"{totals['labelled']:,}")
+    col3.metric("Frauds", f"{totals['frauds']:,}")
+    col4.metric("Fraud Rate", f"{totals['frauds'] / totals['labelled']:.2%}" if totals["labelled"] else "–")
+
+    st.markdown(f"### 📋 Fraud Rate by {DIMENSION_LABELS[dimension]}")
+    st.dataframe(
+        rates.style.format({"fraud_rate": "{:.2%}", "transactions": "{:,}", "labelled": "{:,}", "frauds": "{:,}"},
+                           na_rep="–"),
+        use_container_width=True,
+        hide_index=True,
+    )
+    st.bar_chart(rates.set_index("value")[["fraud_rate"]])
+
+    st.markdown(f"### 📈 Fraud Rate per {period.title()}")
+    st.line_chart(series.pivot(index="period", columns="value", values="fraud_rate"))
+    st.caption(f"Queried in {query_ms:.1f} ms from {aggregates.stats()['aggregate_rows']:,} aggregate rows.")
+
+
+main()
@@ -0,0 +1,55 @@
+import os
+from datetime import datetime, timezone
+
+import pandas as pd
+
+from novapay.audit import MAGIC, AuditWriter, encode_record, read_audit_log
+
+
+def ts(text):
+    return pd.Timestamp(text, tz="UTC").timestamp()
+
+
+def write_log_file(directory, first_write, timestamps):
+    """A log file named for its first write holding records with the given decision times"""
+    stamp = datetime.fromtimestamp(ts(first_write), timezone.utc).strftime("%Y%m%dT%H%M%S%f")
+    path = os.path.join(directory, f"audit-{stamp}-000000.bin")
+    with open(path, "wb") as f:
+        f.write(MAGIC)
+        for t in timestamps:
+            f.write(encode_record({
+                "timestamp": ts(t), "transaction_id": t, "model_version": "test",
+                "fraud_probability": 0.1, "decision": "ALLOW", "risk_level": "LOW",
+            }))
+
+
+def logged_ids(directory, since=None, until=None):
+    return read_audit_log(str(directory), since=since, until=until)["transaction_id"].tolist()
+
+
+def test_since_and_until_frame_records_across_files(tmp_path):
+    # Decisions are stamped before they are queued, so a file can start after its oldest record
+    write_log_file(tmp_path, "2026-10-19 10:00:00", ["2026-10-19 09:59:59", "2026-10-19 10:30:00"])
+    write_log_file(tmp_path, "2026-10-19 11:00:00", ["2026-10-19 10:59:50", "2026-10-19 11:00:10"])
+
+    assert len(logged_ids(tmp_path)) == 4
+    assert logged_ids(tmp_path, until="2026-10-19 10:59:55") == ["2026-10-19 09:59:59", "2026-10-19 10:30:00",
+                                                                  "2026-10-19 10:59:50"]
+    assert logged_ids(tmp_path, since="2026-10-19 10:30:00", until="2026-10-19 11:00:00") == [
+        "2026-10-19 10:30:00", "2026-10-19 10:59:50"]
+    assert logged_ids(tmp_path, since="2026-10-19 11:00:05") == ["2026-10-19 11:00:10"]
+    assert logged_ids(tmp_path, since="2026-10-19 12:00:00") == []
+
+
+def test_writer_records_read_back_with_their_decision_time(tmp_path):
+    writer = AuditWriter(str(tmp_path), fsync="never", flush_seconds=0.01)
+    for i, t in enumerate(["2026-10-19 09:00:00", "2026-10-19 09:30:00", "2026-10-19 10:00:00"]):
+        writer.log({"timestamp": ts(t), "transaction_id": f"t{i}", "model_version": "test",
+                    "fraud_probability": 0.9, "decision": "DECLINE", "risk_level": "HIGH",
+                    "reasons": [("num__ip_risk_score", 0.25)]})
+    writer.close()
+
+    df = read_audit_log(str(tmp_path), since="2026-10-19 09:15:00", until="2026-10-19 10:00:00")
+    assert df["transaction_id"].tolist() == ["t1"]
+    assert df["timestamp"].iloc[0] == pd.Timestamp("2026-10-19 09:30:00", tz="UTC")
+    assert df["reasons"].iloc[0][0][0] == "num__ip_risk_score"
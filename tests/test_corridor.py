@@ -0,0 +1,45 @@
+import numpy as np
+import pytest
+
+from novapay.corridor import CorridorIndex
+
+
+def make_index(prior_strength=50):
+    # 10 frauds in 1,000 transactions: a global rate of 1%
+    return CorridorIndex(["USD_EUR", "USD_NGN"], [0.0, 0.5], [100, 900], [10, 0], prior_strength)
+
+
+def test_fraud_rate_shrinks_towards_the_global_rate():
+    index = make_index()
+    assert index.global_rate == pytest.approx(0.01)
+    assert index.fraud_rate("USD_EUR") == pytest.approx((10 + 50 * 0.01) / (100 + 50))
+    assert index.fraud_rate("USD_NGN") == pytest.approx(50 * 0.01 / (900 + 50))
+    assert index.fraud_rate("GBP_INR") == pytest.approx(0.01)
+
+
+def test_zero_prior_strength_gives_the_raw_rate():
+    assert make_index(prior_strength=0).fraud_rate("USD_EUR") == pytest.approx(0.1)
+
+
+def test_update_adds_outcomes_and_new_pairs():
+    index = make_index()
+    index.update(["GBP_INR"] * 4, [1, 1, 0, 0])
+    index.update("USD_EUR", 1)
+
+    assert index.lookup("GBP_INR")["transactions"] == 4
+    assert index.global_rate == pytest.approx(13 / 1005)
+    assert index.fraud_rate("GBP_INR") == pytest.approx((2 + 50 * 13 / 1005) / (4 + 50))
+    assert index.fraud_rate("USD_EUR") == pytest.approx((11 + 50 * 13 / 1005) / (101 + 50))
+
+    # New pairs have outcomes but no published risk until one is set
+    assert index.risk("GBP_INR") == 0.0
+    assert np.array_equal(index.join(["USD_NGN", "GBP_INR", "EUR_USD"], default=-1.0), [0.5, -1.0, -1.0])
+    index.publish("GBP_INR", 0.3)
+    assert index.join(["GBP_INR"]).tolist() == [0.3]
+
+
+def test_table_uses_the_same_smoothing():
+    index = make_index()
+    table = index.table().set_index("currency_pair")
+    for pair in index.pairs:
+        assert table.loc[pair, "fraud_rate"] == pytest.approx(index.fraud_rate(pair))
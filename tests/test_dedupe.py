@@ -0,0 +1,38 @@
+import numpy as np
+
+from novapay.dedupe import DUPLICATE, NEW, PROBABLE_DUPLICATE, Deduplicator
+
+NOW = 1_800_000_000.0
+
+
+def make_deduplicator(**kwargs):
+    return Deduplicator(capacity=10_000, exact_seconds=900.0, **kwargs)
+
+
+def test_repeats_within_a_batch_and_the_exact_window_are_duplicates():
+    dedupe = make_deduplicator()
+    assert dedupe.check(["a", "b", "a"], NOW).tolist() == [NEW, NEW, DUPLICATE]
+    assert dedupe.check(["a", "c"], NOW + 60).tolist() == [DUPLICATE, NEW]
+    assert dedupe.stats()["duplicates"] == 2
+
+
+def test_late_retries_are_probable_duplicates_until_the_horizon():
+    dedupe = make_deduplicator()
+    dedupe.check(["a"], NOW)
+    assert dedupe.check(["a"], NOW + 3600).tolist() == [PROBABLE_DUPLICATE]
+    assert dedupe.check(["a"], NOW + dedupe.horizon_seconds + 3600).tolist() == [NEW]
+
+
+def test_check_without_remember_lets_a_rejected_message_be_retried():
+    dedupe = make_deduplicator()
+    assert dedupe.check(["x"], NOW, remember=False).tolist() == [NEW]
+    assert dedupe.check(["x"], NOW + 1, remember=False).tolist() == [NEW]
+
+    dedupe.add(["x"], NOW + 1)
+    assert dedupe.check(["x"], NOW + 2).tolist() == [DUPLICATE]
+
+
+def test_keep_drops_probable_duplicates_only_when_asked():
+    status = np.array([NEW, DUPLICATE, PROBABLE_DUPLICATE], dtype=np.int8)
+    assert make_deduplicator().keep(status).tolist() == [True, False, False]
+    assert make_deduplicator(drop_probable=False).keep(status).tolist() == [True, False, True]
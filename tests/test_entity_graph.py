@@ -0,0 +1,50 @@
+import numpy as np
+import pandas as pd
+
+from novapay.entity_graph import EntityGraph, synthetic_transactions
+
+
+def test_shared_device_links_customers_into_one_component():
+    graph = EntityGraph(capacity=2)
+    graph.add_transactions(["c1", "c2", "c3"], ["d1", "d1", "d2"], ["ip1", "ip2", None], [0, 1, 0])
+
+    assert graph.component("c1") == {"customers": 2, "devices": 1, "ips": 2, "transactions": 2, "frauds": 1}
+    assert graph.component("c3") == {"customers": 1, "devices": 1, "ips": 0, "transactions": 1, "frauds": 0}
+    assert graph.n_components() == 2
+
+    # Linking c3 to ip1 merges the two components
+    graph.add_transactions(["c3"], ["d2"], ["ip1"])
+    assert graph.component("c2")["customers"] == 3
+    assert graph.n_components() == 1
+
+
+def test_find_compresses_paths_to_the_root():
+    graph = EntityGraph()
+    nodes = [graph._node("customer", f"c{i}") for i in range(4)]
+    graph.parent[nodes[1]], graph.parent[nodes[2]], graph.parent[nodes[3]] = nodes[0], nodes[1], nodes[2]
+
+    assert graph.find(nodes[3]) == nodes[0]
+    assert graph.parent[nodes[3]] == nodes[1]
+
+
+def test_bulk_build_matches_incremental_links(tmp_path):
+    df = synthetic_transactions(2_000, 600, 300, 300, shared_rate=0.05, seed=3)
+    bulk = EntityGraph.from_transactions(df)
+    incremental = EntityGraph()
+    incremental.add_transactions(df["customer_id"], df["device_id"], df["ip_address"], df["is_fraud"])
+
+    assert bulk.n_components() == incremental.n_components()
+    customers = df["customer_id"].unique()[:200]
+    assert bulk.lookup(customers, [None] * len(customers)).equals(
+        incremental.lookup(customers, [None] * len(customers)))
+
+    bulk.save(tmp_path / "graph.npz")
+    loaded = EntityGraph.load(tmp_path / "graph.npz")
+    assert loaded.component(customers[0]) == bulk.component(customers[0])
+
+
+def test_missing_ip_links_nothing():
+    df = pd.DataFrame({"customer_id": ["c1", "c2"], "device_id": ["d1", "d2"], "ip_address": [np.nan, np.nan]})
+    graph = EntityGraph.from_transactions(df)
+    assert graph.n_components() == 2
+    assert graph.component("c1")["ips"] == 0
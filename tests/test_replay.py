@@ -0,0 +1,54 @@
+import pandas as pd
+
+from novapay.replay import StreamState
+
+T0 = pd.Timestamp("2026-10-19 10:00", tz="UTC")
+
+
+def test_pending_ip_counts_are_stored_only_on_commit():
+    state = StreamState()
+    state.ip_usage(["10.0.0.1"])
+
+    pending = state.pending()
+    assert state.ip_usage(["10.0.0.1", "10.0.0.2", "10.0.0.1"], pending).tolist() == [2, 1, 3]
+    assert dict(state.ip_counts) == {"10.0.0.1": 1}
+
+    state.commit(pending)
+    assert state.ip_usage(["10.0.0.1", "10.0.0.2"]).tolist() == [4, 2]
+
+
+def test_discarded_pending_batch_is_not_counted_twice():
+    state = StreamState()
+    state.ip_usage(["10.0.0.1"])
+
+    # A failed batch is retried: the first attempt's counts are thrown away
+    state.ip_usage(["10.0.0.1", "10.0.0.1"], state.pending())
+    retry = state.pending()
+    assert state.ip_usage(["10.0.0.1", "10.0.0.1"], retry).tolist() == [2, 3]
+    state.commit(retry)
+    assert state.ip_counts["10.0.0.1"] == 3
+
+
+def test_pending_velocity_leaves_customer_history_untouched():
+    state = StreamState()
+    state.velocity(["c1"], [T0])
+
+    pending = state.pending()
+    v1h, v24h = state.velocity(["c1", "c1", "c2"],
+                               [T0 + pd.Timedelta(minutes=30), T0 + pd.Timedelta(hours=2), T0], pending)
+    assert v1h.tolist() == [1, 0, 0]
+    assert v24h.tolist() == [1, 2, 0]
+    assert list(state.customer_times["c1"]) == [T0]
+    assert "c2" not in state.customer_times
+
+    state.commit(pending)
+    assert len(state.customer_times["c1"]) == 3
+    assert len(state.customer_times["c2"]) == 1
+
+
+def test_velocity_window_drops_transactions_older_than_a_day():
+    state = StreamState()
+    state.velocity(["c1", "c1"], [T0, T0 + pd.Timedelta(hours=1)])
+    v1h, v24h = state.velocity(["c1"], [T0 + pd.Timedelta(hours=24, minutes=30)])
+    assert v1h.tolist() == [0]
+    assert v24h.tolist() == [1]